@@ -0,0 +1,2144 @@
+"""
+Benchmark & load test lokal untuk bot key.
+
+Semua backend eksternal (GitHub, Work.ink) diganti server tiruan di 127.0.0.1,
+dan Discord diganti ctx tiruan, jadi benchmark bisa jalan tanpa token asli.
+
+Jalankan : python benchmark.py [skenario ...]
+Output   : JSON ke stdout
+"""
+import asyncio
+import base64
+import contextlib
+import importlib
+import io
+import os
+import hashlib
+import json
+import multiprocessing
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from itertools import islice
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import discord
+from aiohttp import web
+
+import database
+import dispatcher
+import keep_alive
+import keygen
+import metrics
+import profiler
+import workink
+from database import Database, blob_sha
+from dispatcher import Dispatcher
+from keytable import KeyTable
+from ratelimit import RateLimiter
+
+# ═══════════════════════════════════════════════════════════
+# FAKE GITHUB API
+# ═══════════════════════════════════════════════════════════
+def git_sha(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+class FakeGitHub:
+    """
+    Tiruan GitHub API dengan latency buatan
+
+    Contents API (GET file/folder, PUT file) dan Git Data API (ref, commit,
+    tree, blob) secukupnya untuk Database. Semua state ada di memory, jadi
+    bisa dipakai bersama beberapa proses bot sekaligus.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.files = {}    # path -> isi (teks) di commit HEAD
+        self.trees = {}    # sha tree -> {path: isi}
+        self.blobs = {}    # sha blob -> isi
+        self.commit_objs = {}  # sha commit -> {"tree": sha, "parents": [...]}
+        self.head = None
+        self.commits = 0
+        self.conflicts = 0
+        self.not_modified = 0  # Response 304 untuk conditional GET ref
+        self.down = False  # True: semua request dibalas 503
+        self.requests = 0
+        self.bytes_uploaded = 0
+        self.lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._handle(self, "GET")
+
+            def do_PUT(self):
+                fake._handle(self, "PUT")
+
+            def do_POST(self):
+                fake._handle(self, "POST")
+
+            def do_PATCH(self):
+                fake._handle(self, "PATCH")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def _reply(handler, status: int, body, headers: dict = None):
+        raw = json.dumps(body).encode() if body is not None else b""
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(raw)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(raw)
+
+    def _handle(self, handler, method: str):
+        time.sleep(self.delay)
+        path = handler.path.split("?", 1)[0]
+        payload = None
+        if method != "GET":
+            length = int(handler.headers.get("Content-Length", 0))
+            raw = handler.rfile.read(length)
+            payload = json.loads(raw) if raw else {}
+
+        with self.lock:
+            self.requests += 1
+            if payload is not None:
+                self.bytes_uploaded += len(raw)
+            if self.down:
+                status, body = 503, {"message": "Service Unavailable"}
+            elif "/contents/" in path:
+                status, body = self._contents(method, path.split("/contents/", 1)[1], payload)
+            elif "/git/" in path:
+                status, body = self._git(method, path.split("/git/", 1)[1], payload)
+            else:
+                status, body = 404, {"message": "Not Found"}
+            headers = {}
+            if method == "GET" and "/git/ref/" in path and status == 200:
+                # ETag ref = sha HEAD, seperti GitHub: 304 kalau belum berubah
+                headers["ETag"] = f'"{self.head}"'
+                if handler.headers.get("If-None-Match") == headers["ETag"]:
+                    status, body = 304, None
+                    self.not_modified += 1
+        self._reply(handler, status, body, headers)
+
+    # ═══ CONTENTS API ═══
+    def _contents(self, method: str, path: str, payload):
+        if method == "GET":
+            if path in self.files:
+                text = self.files[path]
+                return 200, {"content": base64.b64encode(text.encode()).decode(),
+                             "sha": git_sha(text), "path": path}
+            listing = [{"name": p.rsplit("/", 1)[-1], "path": p, "sha": git_sha(t), "type": "file"}
+                       for p, t in self.files.items() if p.startswith(path + "/")]
+            if listing:
+                return 200, listing
+            return 404, {"message": "Not Found"}
+
+        # PUT: 1 file = 1 commit
+        current = self.files.get(path)
+        if current is not None and payload.get("sha") != git_sha(current):
+            return 409, {"message": "sha mismatch"}
+        text = base64.b64decode(payload["content"]).decode()
+        self._commit({**self.files, path: text}, [self.head] if self.head else [])
+        return (201 if current is None else 200), {"content": {"sha": git_sha(text)}}
+
+    def _commit(self, files: dict, parents: list) -> str:
+        for text in files.values():
+            self.blobs[blob_sha(text)] = text
+        tree_sha = git_sha(json.dumps(files, sort_keys=True))
+        self.trees[tree_sha] = files
+        commit_sha = git_sha(f"{tree_sha}{parents}{len(self.commit_objs)}")
+        self.commit_objs[commit_sha] = {"tree": tree_sha, "parents": parents}
+        self.head = commit_sha
+        self.files = files
+        self.commits += 1
+        return commit_sha
+
+    # ═══ GIT DATA API ═══
+    def _git(self, method: str, path: str, payload):
+        if method == "GET" and path.startswith("ref/heads/"):
+            if self.head is None:
+                return 404, {"message": "Not Found"}
+            return 200, {"object": {"sha": self.head, "type": "commit"}}
+
+        if method == "GET" and path.startswith("commits/"):
+            commit = self.commit_objs.get(path.split("/", 1)[1])
+            if commit is None:
+                return 404, {"message": "Not Found"}
+            return 200, {"sha": path.split("/", 1)[1], "tree": {"sha": commit["tree"]}}
+
+        if method == "GET" and path.startswith("trees/"):
+            files = self.trees.get(path.split("/", 1)[1])
+            if files is None:
+                return 404, {"message": "Not Found"}
+            entries = [{"path": p, "type": "blob", "sha": blob_sha(t)} for p, t in files.items()]
+            return 200, {"tree": entries, "truncated": False}
+
+        if method == "GET" and path.startswith("blobs/"):
+            text = self.blobs.get(path.split("/", 1)[1])
+            if text is None:
+                return 404, {"message": "Not Found"}
+            return 200, {"content": base64.b64encode(text.encode()).decode(), "encoding": "base64"}
+
+        if method == "POST" and path == "trees":
+            files = dict(self.trees.get(payload.get("base_tree"), {}))
+            for entry in payload["tree"]:
+                if entry.get("sha", "") is None:
+                    files.pop(entry["path"], None)
+                else:
+                    files[entry["path"]] = entry["content"]
+                    self.blobs[blob_sha(entry["content"])] = entry["content"]
+            tree_sha = git_sha(json.dumps(files, sort_keys=True))
+            self.trees[tree_sha] = files
+            return 201, {"sha": tree_sha}
+
+        if method == "POST" and path == "commits":
+            sha = git_sha(f"{payload['tree']}{payload['parents']}{len(self.commit_objs)}")
+            self.commit_objs[sha] = {"tree": payload["tree"], "parents": payload["parents"]}
+            return 201, {"sha": sha}
+
+        if method in ("PATCH", "POST") and path.startswith("refs"):
+            commit = self.commit_objs[payload["sha"]]
+            # Hanya fast-forward: parent commit baru harus HEAD sekarang
+            if self.head is not None and commit["parents"] != [self.head]:
+                self.conflicts += 1
+                return 422, {"message": "Update is not a fast forward"}
+            self.head = payload["sha"]
+            self.files = self.trees[commit["tree"]]
+            self.commits += 1
+            return 200, {"object": {"sha": self.head}}
+
+        return 404, {"message": "Not Found"}
+
+    # ═══ HELPER ═══
+    def read_json(self, path: str) -> dict:
+        """Decode isi file di HEAD"""
+        with self.lock:
+            return json.loads(self.files[path])
+
+    def read_keys(self, directory: str = database.GITHUB_DIR) -> dict:
+        """Gabungan semua shard key di HEAD"""
+        with self.lock:
+            paths = [p for p in self.files if p.startswith(directory + "/shard-")]
+        keys = {}
+        for path in paths:
+            keys.update(self.read_json(path))
+        return keys
+
+# ═══════════════════════════════════════════════════════════
+# FAKE WORK.INK API
+# ═══════════════════════════════════════════════════════════
+class FakeWorkink:
+    """Tiruan API Work.ink (aiohttp) dengan latency & error yang bisa diatur"""
+
+    def __init__(self):
+        self.delay = 0.0
+        self.fail_rate = 0.0  # Peluang balas 503
+        self.batch = True     # False: endpoint batch balas 404
+        self.requests = 0
+        self.connections = set()
+        self.rng = random.Random(0)
+        self.runner = None
+        self.url = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self._handle)
+        app.router.add_post("/{tail:.*}", self._handle_batch)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def _handle(self, request):
+        self.requests += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(self.delay)
+        if self.rng.random() < self.fail_rate:
+            return web.json_response({"error": "unavailable"}, status=503)
+        if request.path.endswith("/stats"):
+            return web.json_response({"views": 10, "completions": 4})
+        return web.json_response({"completed": self.completed(request.query.get("token", ""))})
+
+    async def _handle_batch(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        if not self.batch:
+            return web.json_response({"message": "Not Found"}, status=404)
+        tokens = (await request.json())["tokens"]
+        return web.json_response({"completions": {t: self.completed(t) for t in tokens}})
+
+    @staticmethod
+    def completed(token: str) -> bool:
+        return token == "done" or token.endswith("-ok")
+
+# ═══════════════════════════════════════════════════════════
+# FAKE DISCORD
+# ═══════════════════════════════════════════════════════════
+class FakeUser:
+    """ctx.author tiruan: DM cuma dicatat"""
+
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.name = self.display_name = f"user{user_id}"
+        self.mention = f"<@{user_id}>"
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append((content, kwargs))
+
+class FakeContext:
+    """commands.Context tiruan secukupnya untuk callback command di main.py"""
+
+    def __init__(self, user_id: int, guild: bool = True):
+        self.author = FakeUser(user_id)
+        self.guild = object() if guild else None
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append((content, kwargs))
+
+class FakeResponse:
+    """aiohttp response tiruan secukupnya untuk discord.HTTPException"""
+
+    def __init__(self, status: int, reason: str, headers: dict = None):
+        self.status = status
+        self.reason = reason
+        self.headers = headers or {}
+
+class FakeMessenger:
+    """
+    Sink DM tiruan dengan rate limit ala Discord
+
+    - per user: `user_limit` DM per `window` detik, lebih dari itu 429 + Retry-After
+    - global: `global_limit` DM per `window` detik, 429 + X-RateLimit-Global
+    - user di `closed`: 403 (DM tertutup)
+    Tiap DM makan `latency` detik seperti request asli. Isi yang diterima
+    dicatat per baris (pesan yang digabung dispatcher dipisah lagi), dan
+    request yang datang sebelum Retry-After route-nya lewat dihitung.
+    """
+
+    def __init__(self, user_limit: int = 5, global_limit: int = 50, window: float = 1.0,
+                 latency: float = 0.005, closed: set = ()):
+        self.user_limit = user_limit
+        self.global_limit = global_limit
+        self.window = window
+        self.latency = latency
+        self.closed = set(closed)
+        self.windows = {}  # route -> [awal window, jumlah DM]
+        self.delivered = {}  # user_id -> jumlah pesan Discord yang diterima
+        self.received = {}   # user_id -> baris isi pesan yang diterima
+        self.retry_at = {}   # route -> waktu Retry-After terakhir berakhir
+        self.early_retries = 0
+        self.requests = 0
+        self.limited = {"user": 0, "global": 0}
+        self.forbidden = 0
+
+    async def resolve(self, user_id: int):
+        return FakeRecipient(self, user_id)
+
+    def _take(self, route, limit: int) -> float:
+        """Hitung 1 DM di window route, return Retry-After (0 kalau boleh)"""
+        now = time.monotonic()
+        window = self.windows.get(route)
+        if window is None or now - window[0] >= self.window:
+            window = self.windows[route] = [now, 0]
+        if window[1] >= limit:
+            return window[0] + self.window - now
+        window[1] += 1
+        return 0
+
+    async def deliver(self, user_id: int, kwargs: dict):
+        self.requests += 1
+        # Toleransi 1 ms: Retry-After dikirim dengan 3 desimal
+        if time.monotonic() < max(self.retry_at.get(None, 0.0), self.retry_at.get(user_id, 0.0)) - 0.001:
+            self.early_retries += 1
+        await asyncio.sleep(self.latency)
+        retry_after = self._take(None, self.global_limit)
+        if retry_after:
+            self.limited["global"] += 1
+            self.retry_at[None] = time.monotonic() + retry_after
+            raise discord.HTTPException(FakeResponse(429, "Too Many Requests", {
+                "Retry-After": f"{retry_after:.3f}", "X-RateLimit-Global": "true"}), "global")
+        retry_after = self._take(user_id, self.user_limit)
+        if retry_after:
+            self.limited["user"] += 1
+            self.retry_at[user_id] = time.monotonic() + retry_after
+            raise discord.HTTPException(FakeResponse(429, "Too Many Requests", {
+                "Retry-After": f"{retry_after:.3f}"}), "user")
+        if user_id in self.closed:
+            self.forbidden += 1
+            raise discord.Forbidden(FakeResponse(403, "Forbidden"), "Cannot send messages to this user")
+        self.delivered[user_id] = self.delivered.get(user_id, 0) + 1
+        if kwargs.get("content"):
+            self.received.setdefault(user_id, []).extend(kwargs["content"].split("\n"))
+
+    def all_received(self) -> list:
+        return sorted(line for lines in self.received.values() for line in lines)
+
+class FakeRecipient:
+    def __init__(self, messenger: FakeMessenger, user_id: int):
+        self.messenger = messenger
+        self.id = user_id
+
+    async def send(self, content=None, **kwargs):
+        await self.messenger.deliver(self.id, dict(kwargs, content=content))
+
+def load_bot():
+    """
+    Import main.py tanpa efek samping ke folder repo
+
+    Database bawaan main dibuat di folder sementara (print-nya ke stderr,
+    stdout khusus JSON), lalu diganti oleh skenario.
+    """
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="keybot-bench-"))
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            return importlib.import_module("main")
+    finally:
+        os.chdir(cwd)
+
+# ═══════════════════════════════════════════════════════════
+# HELPER
+# ═══════════════════════════════════════════════════════════
+def open_db(fake: FakeGitHub, data_dir: str = None) -> Database:
+    """Database yang backup ke fake GitHub dengan journal di folder sementara"""
+    if data_dir is None:
+        data_dir = tempfile.mkdtemp(prefix="keybot-bench-")
+    return Database(github_api=fake.url, data_dir=data_dir)
+
+def synthetic_store(size: int, now: float, expired_ratio: float = 0.3) -> dict:
+    """Store layout JSON berisi `size` key, sebagian sudah expired"""
+    rng = random.Random(size)
+    keys = {}
+    for i in range(size):
+        created = now - rng.uniform(0, 2 * 86400) if rng.random() < expired_ratio else now
+        keys[f"KEY-{i:08X}-SYNT"] = {
+            "user_id": rng.randrange(max(size // 10, 1)),
+            "created_at": created,
+            "expires_at": created + 86400 if created == now else now - rng.uniform(1, 86400),
+            "is_admin": False,
+            "used": False
+        }
+    return {"keys": keys, "users": {}, "pending": {}}
+
+def percentiles(latencies: list) -> dict:
+    """p50/p95/p99/max dalam ms"""
+    latencies = sorted(latencies)
+    pick = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+    return {
+        "p50_ms": round(pick(0.50) * 1e3, 3),
+        "p95_ms": round(pick(0.95) * 1e3, 3),
+        "p99_ms": round(pick(0.99) * 1e3, 3),
+        "max_ms": round(latencies[-1] * 1e3, 3),
+    }
+
+def timed(fn, repeat: int) -> float:
+    """Rata-rata waktu per panggilan (detik)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+# ═══════════════════════════════════════════════════════════
+# SKENARIO
+# ═══════════════════════════════════════════════════════════
+async def bench_save_in_flight() -> dict:
+    """Command lain harus tetap dilayani selama save ke GitHub berjalan"""
+    delay = 0.5
+    fake = FakeGitHub(delay=delay).start()
+    db = open_db(fake)
+
+    stop = asyncio.Event()
+    lags = []
+    served = 0
+
+    async def ticker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - start - 0.005)
+
+    async def other_users():
+        # Simulasi !cekkey dari user lain
+        nonlocal served
+        while not stop.is_set():
+            db.validate_key("KEY-AAAA-BBBB-CCCC-DDDD")
+            served += 1
+            await asyncio.sleep(0.001)
+
+    tasks = [asyncio.create_task(ticker()), asyncio.create_task(other_users())]
+    start = time.perf_counter()
+    await db.add_key("KEY-BENCH-0000-0000-0001", 1)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await asyncio.gather(*tasks)
+    fake.stop()
+
+    max_lag = max(lags) if lags else 0.0
+    loop_blocked = max_lag > delay / 2
+    assert not loop_blocked, f"event loop macet {max_lag * 1000:.0f} ms selama save"
+    assert served > 0, "tidak ada command yang dilayani selama save"
+    return {
+        "github_delay_s": delay,
+        "save_s": round(elapsed, 4),
+        "max_loop_lag_ms": round(max_lag * 1000, 2),
+        "commands_served_during_save": served,
+        "loop_blocked": loop_blocked,
+    }
+
+async def bench_write_behind() -> dict:
+    """Jumlah commit GitHub untuk burst mutasi: langsung vs write-behind"""
+    mutations = 100
+    result = {"mutations": mutations}
+
+    for mode in ("direct", "write_behind"):
+        fake = FakeGitHub(delay=0.01).start()
+        db = open_db(fake)
+        if mode == "write_behind":
+            db.start_flusher()
+
+        start = time.perf_counter()
+        for i in range(mutations):
+            await db.add_key(f"KEY-BENCH-{i:04d}-0000-0000", i)
+        await db.close()
+        elapsed = time.perf_counter() - start
+
+        stored = fake.read_keys()
+        result[mode] = {
+            "commits": fake.commits,
+            "bytes_uploaded": fake.bytes_uploaded,
+            "seconds": round(elapsed, 4),
+            "keys_persisted": len(stored),
+        }
+        fake.stop()
+
+    behind, direct = result["write_behind"], result["direct"]
+    assert behind["keys_persisted"] == mutations, f"{mutations - behind['keys_persisted']} key tidak ter-backup"
+    assert behind["commits"] * 10 <= direct["commits"], \
+        f"write-behind {behind['commits']} commit vs langsung {direct['commits']}"
+
+    # Save langsung (WRITE_BEHIND=False) gagal: flusher / close() harus mencoba lagi,
+    # dan journal tidak boleh di-compact selama shard-nya belum ter-backup
+    database.WRITE_BEHIND = False
+    for recovered in (True, False):
+        fake = FakeGitHub().start()
+        data_dir = tempfile.mkdtemp(prefix="keybot-bench-")
+        db = open_db(fake, data_dir)
+        await db.refresh()
+        db.start_flusher()
+        fake.down = True
+        await db.add_key("KEY-BENCH-FAILED-SAVE", 1)
+        fake.down = not recovered
+        await db.close()
+        if recovered:
+            persisted = "KEY-BENCH-FAILED-SAVE" in fake.read_keys()
+            assert persisted, "save yang gagal tidak dicoba lagi"
+            result["failed_direct_save"] = {"retried_and_persisted": persisted}
+        else:
+            reopened = open_db(fake, data_dir)
+            unsynced = database.shard_of("KEY-BENCH-FAILED-SAVE") in reopened.dirty_shards
+            assert unsynced, "shard yang gagal di-backup hilang dari journal setelah close()"
+            result["failed_direct_save"]["still_unsynced_after_restart"] = unsynced
+        fake.stop()
+    database.WRITE_BEHIND = True
+
+    return result
+
+async def bench_journal() -> dict:
+    """Latency tulis journal lokal + replay setelah crash (tanpa close)"""
+    mutations = 2000
+    result = {"mutations": mutations}
+
+    for fsync in (True, False):
+        database.JOURNAL_FSYNC = fsync
+        fake = FakeGitHub().start()
+        data_dir = tempfile.mkdtemp(prefix="keybot-bench-")
+        db = open_db(fake, data_dir)
+        db.start_flusher()
+
+        timings = []
+        for i in range(mutations):
+            start = time.perf_counter()
+            await db.add_key(f"KEY-J{int(fsync)}-{i:06d}", i)
+            timings.append(time.perf_counter() - start)
+
+        # Simulasi crash: buka ulang tanpa close(), data harus kembali dari journal
+        start = time.perf_counter()
+        reopened = open_db(fake, data_dir)
+        replay = time.perf_counter() - start
+
+        timings.sort()
+        result["fsync" if fsync else "no_fsync"] = {
+            "p50_us": round(timings[len(timings) // 2] * 1e6, 1),
+            "p99_us": round(timings[int(len(timings) * 0.99)] * 1e6, 1),
+            "replay_ms": round(replay * 1000, 2),
+            "keys_recovered": reopened.get_stats()["total_keys"],
+        }
+        await db.close()
+        fake.stop()
+
+    # Compact store besar saat bot jalan: snapshot ditulis di thread, mutasi
+    # yang masuk selama itu tetap ada setelah crash
+    size = 300_000
+    fake = FakeGitHub().start()
+    data_dir = tempfile.mkdtemp(prefix="keybot-bench-")
+    db = open_db(fake, data_dir)
+    now = time.time()
+    db.backend.replace(synthetic_store(size, now, expired_ratio=0))
+    db.counters.rebuild(db.backend, now)
+    await db.add_key("KEY-COMPACT-BEFORE", 1)
+
+    stop = asyncio.Event()
+    lags = []
+    added = 0
+
+    async def ticker():
+        while not stop.is_set():
+            tick = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - tick - 0.005)
+
+    async def writer():
+        nonlocal added
+        while not stop.is_set():
+            await db.add_key(f"KEY-COMPACT-{added:06d}", added)
+            added += 1
+            await asyncio.sleep(0.001)
+
+    tasks = [asyncio.create_task(ticker()), asyncio.create_task(writer())]
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await db._maybe_compact(force=True)
+    compact = time.perf_counter() - start
+    stop.set()
+    await asyncio.gather(*tasks)
+    reopened = open_db(fake, data_dir)
+    recovered = reopened.get_stats()["total_keys"]
+    await db.close()
+    fake.stop()
+
+    max_lag = max(lags, default=0.0)
+    result["compact"] = {
+        "store_keys": size,
+        "compact_ms": round(compact * 1e3, 1),
+        "max_loop_lag_ms": round(max_lag * 1e3, 1),
+        "mutations_during_compact": added,
+        "keys_recovered": recovered,
+    }
+    assert recovered == size + 1 + added, f"{size + 1 + added - recovered} key hilang setelah compact"
+    assert max_lag < database.LAG_THRESHOLD, f"event loop macet {max_lag * 1e3:.0f} ms selama compact"
+
+    database.JOURNAL_FSYNC = True
+    return result
+
+async def bench_stats() -> dict:
+    """Biaya !stats dari counter vs full scan, plus cek konsistensi counter"""
+    result = {}
+    database.KEY_RETENTION = 0  # Sweep langsung menghapus key yang expired
+    fake = FakeGitHub().start()
+
+    for size in (1_000, 10_000, 100_000):
+        db = open_db(fake)
+        now = time.time()
+        db.backend.replace(synthetic_store(size, now))
+        db.counters.rebuild(db.backend, now)
+        db.start_flusher()
+
+        # Mutasi acak: tambah key, pending, hapus pending, key yang sudah lewat waktunya
+        rng = random.Random(size)
+        for i in range(500):
+            roll = rng.random()
+            if roll < 0.5:
+                await db.add_key(f"KEY-NEW-{i:06d}", rng.randrange(100))
+            elif roll < 0.8:
+                await db.add_pending(rng.randrange(200), f"tok{i}", "link")
+            else:
+                await db.remove_pending(rng.randrange(200))
+        db._put_key("KEY-SHORT-LIVED", {
+            "user_id": 1, "created_at": now, "expires_at": time.time() + 0.5,
+            "is_admin": False, "used": False
+        })
+        counted, recounted = db.get_stats(), db.recount_stats()
+        assert counted == recounted, f"setelah mutasi: {counted} != {recounted}"
+
+        # Key active -> expired tanpa event apapun
+        await asyncio.sleep(0.6)
+        counted, recounted = db.get_stats(), db.recount_stats()
+        assert counted == recounted, f"setelah key expire: {counted} != {recounted}"
+
+        while await db.sweep():
+            pass
+        swept = db.get_stats()
+        assert swept == db.recount_stats(), f"setelah sweep: {swept} != {db.recount_stats()}"
+        assert swept["expired_keys"] == 0
+
+        result[str(size)] = {
+            "counter_us": round(timed(db.get_stats, 1000) * 1e6, 2),
+            "full_scan_us": round(timed(db.recount_stats, 5) * 1e6, 2),
+            "swept_keys": counted["total_keys"] - swept["total_keys"],
+        }
+        await db.close()
+
+    fake.stop()
+    return result
+
+async def bench_shard_upload() -> dict:
+    """Byte yang di-upload per mutasi: 1 file penuh (lama) vs shard yang berubah"""
+    size = 20_000
+    mutations = 20
+    fake = FakeGitHub().start()
+    db = open_db(fake)
+    now = time.time()
+    db.backend.replace(synthetic_store(size, now))
+    db.counters.rebuild(db.backend, now)
+
+    # Upload awal semua shard, tidak dihitung
+    db.dirty_shards = set(range(database.GITHUB_SHARDS)) | {database.PENDING_SHARD}
+    await db.save_async()
+    baseline_commits, baseline_bytes = fake.commits, fake.bytes_uploaded
+
+    # Layout lama: seluruh store, indent=2, di setiap commit
+    legacy = base64.b64encode(json.dumps(db.backend.dump(), indent=2).encode())
+
+    for i in range(mutations):
+        await db.add_key(f"KEY-SHARD-{i:06d}", i)
+    await db.close()
+
+    commits = fake.commits - baseline_commits
+    uploaded = fake.bytes_uploaded - baseline_bytes
+    fake.stop()
+    return {
+        "store_keys": size,
+        "shards": database.GITHUB_SHARDS,
+        "legacy_bytes_per_mutation": len(legacy),
+        "sharded_bytes_per_mutation": uploaded // mutations,
+        "sharded_commits_per_mutation": round(commits / mutations, 2),
+        "reduction_x": round(len(legacy) / max(uploaded / mutations, 1), 1),
+    }
+
+async def bench_memory() -> dict:
+    """Memory & kecepatan scan: dict per key vs KeyTable kolumnar, 1 juta key"""
+    size = 1_000_000
+    now = time.time()
+    keys = synthetic_store(size, now)["keys"]
+
+    def measure(build):
+        tracemalloc.start()
+        obj = build()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return obj, current
+
+    # Key string sama-sama dipakai ulang, jadi yang terukur hanya strukturnya
+    as_dict, dict_bytes = measure(lambda: {k: dict(v) for k, v in keys.items()})
+    table, table_bytes = measure(lambda: KeyTable.from_dict(
+        keys, partition=database.shard_of, partitions=database.GITHUB_SHARDS))
+
+    def dict_count():
+        return sum(1 for v in as_dict.values() if now < v["expires_at"])
+
+    def dict_expire():
+        return [k for k, v in as_dict.items() if v["expires_at"] <= now]
+
+    assert dict_count() == table.count_active(now)
+    assert sorted(dict_expire()) == sorted(table.expire_before(now))
+    return {
+        "keys": size,
+        "dict_mb": round(dict_bytes / 2**20, 1),
+        "keytable_mb": round(table_bytes / 2**20, 1),
+        "dict_count_active_ms": round(timed(dict_count, 3) * 1e3, 1),
+        "keytable_count_active_ms": round(timed(lambda: table.count_active(now), 3) * 1e3, 1),
+        "dict_expire_before_ms": round(timed(dict_expire, 3) * 1e3, 1),
+        "keytable_expire_before_ms": round(timed(lambda: table.expire_before(now), 3) * 1e3, 1),
+    }
+
+async def bench_user_keys() -> dict:
+    """1 halaman !mykeys untuk user dengan 500 key, di store kecil vs besar"""
+    result = {}
+    fake = FakeGitHub().start()
+    for size in (10_000, 200_000):
+        db = open_db(fake)
+        now = time.time()
+        store = synthetic_store(size, now)
+        # Urutan masuk diacak: halaman tetap harus urut waktu dibuat
+        order = list(range(500))
+        random.Random(size).shuffle(order)
+        for i in order:
+            store["keys"][f"KEY-HEAVY-{i:06d}"] = {
+                "user_id": 424242, "created_at": now + i, "expires_at": now + 86400,
+                "is_admin": False, "used": False
+            }
+        db.backend.replace(store)
+        keys = db.backend.data["keys"]
+
+        def full_scan():
+            mine = [(v["created_at"], k) for k, v in keys.items() if v["user_id"] == 424242]
+            return [k for _, k in sorted(mine)][490:500]
+
+        def page():
+            return db.get_user_keys(424242, 490, 10)
+
+        assert [d["key"] for d in page()] == full_scan()
+        result[str(size)] = {
+            "page_us": round(timed(page, 1000) * 1e6, 2),
+            "full_scan_ms": round(timed(full_scan, 3) * 1e3, 2),
+        }
+
+        # Hapus & tambah key (baris dipakai ulang): urutan sama setelah restart dan di SQLite
+        for i in range(0, 500, 10):
+            db.backend.delete_key(f"KEY-HEAVY-{i:06d}")
+        for i in range(50):
+            db.backend.put_key(f"KEY-HEAVY-NEW-{i:03d}", {
+                "user_id": 424242, "created_at": now - i, "expires_at": now + 86400,
+                "is_admin": False, "used": False
+            })
+        live = [key for key, _ in db.backend.keys_for_user(424242)]
+        expected = [k for _, k in sorted((keys[k]["created_at"], k) for k in live)]
+        sqlite = database.SQLiteBackend(os.path.join(tempfile.mkdtemp(prefix="keybot-bench-"), "keys.db"))
+        sqlite.replace(db.backend.dump())
+        in_sqlite = [key for key, _ in sqlite.keys_for_user(424242)]
+        sqlite.close()
+        await db.close()
+        db = open_db(fake, db.data_dir)
+        reopened = [key for key, _ in db.backend.keys_for_user(424242)]
+        assert live == expected and reopened == live and in_sqlite == live, "urutan key user berubah"
+        await db.close()
+    fake.stop()
+    return result
+
+def instance_worker(github_url: str, name: str, count: int, result_queue):
+    """1 proses bot: tambah `count` key sambil flush sering ke GitHub yang sama"""
+    database.SAVE_MAX_CHANGES = 5
+    database.SAVE_INTERVAL = 0.05
+
+    async def run():
+        db = Database(github_api=github_url, data_dir=tempfile.mkdtemp(prefix=f"keybot-{name}-"))
+        db.start_flusher()
+        rng = random.Random(name)
+        keys = []
+        for i in range(count):
+            key = f"KEY-{name}-{i:05d}"
+            await db.add_key(key, i)
+            keys.append(key)
+            await asyncio.sleep(rng.uniform(0, 0.004))
+        await db.close()
+        return keys, len(db.backend.dump()["keys"])
+
+    # Proses anak punya stdout sendiri: print bot tetap ke stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        keys, local_total = asyncio.run(run())
+    result_queue.put((name, keys, local_total))
+
+async def bench_multi_instance() -> dict:
+    """Beberapa proses bot commit ke 1 repo bersamaan: tidak boleh ada key yang hilang"""
+    processes, per_process = 4, 300
+    fake = FakeGitHub(delay=0.002).start()
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    workers = [ctx.Process(target=instance_worker,
+                           args=(fake.url, f"I{n}", per_process, result_queue))
+               for n in range(processes)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    results = [result_queue.get(timeout=300) for _ in workers]
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    expected = {key for _, keys, _ in results for key in keys}
+    remote = fake.read_keys()
+    lost = expected - set(remote)
+    fake.stop()
+    assert not lost, f"{len(lost)} key hilang"
+
+    # Pending yang dihapus A tidak boleh di-upload balik oleh B yang masih punya salinan lama
+    github = FakeGitHub().start()
+    a, b = open_db(github), open_db(github)
+    await a.refresh()
+    await a.add_pending(5, "tok", "https://work.ink/x")
+    await b.refresh()
+    await a.remove_pending(5)
+    await b.add_key("KEY-AFTER-VERIFY", 5)
+    await a.refresh()
+    pending_remote = github.read_json(a.shard_path(database.PENDING_SHARD)).get("pending", {})
+    github.stop()
+    resurrected = [db.find_pending_token("tok") for db in (a, b)]
+    assert resurrected == [None, None] and "5" not in pending_remote, "pending yang dihapus muncul lagi"
+    assert a.key_exists("KEY-AFTER-VERIFY"), "key dari instance lain tidak ter-merge"
+    return {
+        "processes": processes,
+        "keys_written": len(expected),
+        "keys_on_github": len(remote),
+        "lost_keys": len(lost),
+        "commits": fake.commits,
+        "conflicts_merged": fake.conflicts,
+        # Instance terakhir yang merge melihat key instance lain juga
+        "max_keys_seen_locally": max(total for _, _, total in results),
+        "deleted_pending_resurrected": sum(r is not None for r in resurrected),
+        "elapsed_s": round(elapsed, 2),
+    }
+
+async def bench_workink() -> dict:
+    """Client Work.ink: keep-alive, timeout, retry, dan circuit breaker"""
+    workink.WORKINK_TIMEOUT = 0.2
+    workink.WORKINK_BACKOFF = 0.02
+    workink.WORKINK_BREAKER_RESET = 0.5
+    fake = await FakeWorkink().start()
+    client = workink.WorkinkAPI(base_url=fake.url)
+    result = {}
+
+    async def timed_call(coro):
+        start = time.perf_counter()
+        value = await coro
+        return value, (time.perf_counter() - start) * 1e3
+
+    async def stats_uncached():
+        try:
+            return await client._get("/links/x/stats")
+        except workink.WorkinkError:
+            return None
+
+    # Normal: semua request lewat 1 koneksi
+    latencies = [(await timed_call(stats_uncached()))[1] for _ in range(50)]
+    result["healthy"] = {
+        "calls": 50,
+        "tcp_connections": len(fake.connections),
+        "p50_ms": round(sorted(latencies)[25], 2),
+    }
+
+    # Server lambat: dibatasi timeout, jatuh ke fallback
+    fake.delay = 5.0
+    value, elapsed = await timed_call(client.verify_completion(1, "done"))
+    result["slow_server"] = {"fallback": value, "elapsed_ms": round(elapsed, 1)}
+    # Budget: timeout per percobaan + backoff maksimal di antaranya (+ sedikit overhead)
+    attempts = workink.WORKINK_RETRIES + 1
+    budget = (attempts * workink.WORKINK_TIMEOUT
+              + sum(workink.WORKINK_BACKOFF * 2 ** a for a in range(1, attempts)))
+    assert value is True, "fallback tidak dipakai"
+    assert elapsed < (budget + 0.1) * 1e3, f"fallback {elapsed:.0f} ms, budget {budget * 1e3:.0f} ms"
+    fake.delay = 0.0
+    client.breaker.success()
+
+    # Server error 50%: retry menutupi sebagian besar error
+    fake.fail_rate = 0.5
+    stats = [await stats_uncached() for _ in range(100)]
+    result["flaky_server"] = {
+        "calls": 100,
+        "succeeded": sum(1 for s in stats if s is not None),
+    }
+    client.breaker.success()
+
+    # Server mati: setelah breaker terbuka, request tidak dikirim lagi
+    fake.fail_rate = 1.0
+    for _ in range(workink.WORKINK_BREAKER_FAILURES):
+        await stats_uncached()
+    sent = fake.requests
+    _, open_ms = await timed_call(stats_uncached())
+    result["outage"] = {
+        "breaker": client.breaker.state,
+        "fast_fail_ms": round(open_ms, 3),
+        "requests_while_open": fake.requests - sent,
+    }
+    assert client.breaker.state == "open"
+    assert fake.requests == sent, "request terkirim saat breaker terbuka"
+
+    # Request percobaan (half-open) dibatalkan di tengah jalan: probe berikutnya tetap boleh lewat
+    await asyncio.sleep(workink.WORKINK_BREAKER_RESET)
+    fake.delay = 5.0
+    probe = asyncio.create_task(stats_uncached())
+    await asyncio.sleep(0.05)
+    probe.cancel()
+    await asyncio.gather(probe, return_exceptions=True)
+    fake.delay = 0.0
+
+    # Server pulih: 1 request percobaan (half-open) menutup breaker lagi
+    fake.fail_rate = 0.0
+    recovered = await stats_uncached()
+    assert recovered is not None and client.breaker.state == "closed", "breaker tidak tertutup lagi"
+    result["recovery"] = {"breaker": client.breaker.state, "views": recovered["views"]}
+
+    await client.close()
+    await fake.stop()
+    return result
+
+async def bench_stats_cache() -> dict:
+    """Banyak admin polling !stats: API Work.ink dipanggil maksimal 1x per TTL"""
+    workink.WORKINK_STATS_TTL = 0.3
+    fake = await FakeWorkink().start()
+    fake.delay = 0.1
+    client = workink.WorkinkAPI(base_url=fake.url)
+
+    # 20 admin sekaligus saat cache masih kosong: cuma 1 request
+    start = time.perf_counter()
+    await asyncio.gather(*(client.get_stats() for _ in range(20)))
+    cold_ms = (time.perf_counter() - start) * 1e3
+    cold_requests = fake.requests
+
+    # Polling 1.5 detik: selalu dari memory, refresh di background
+    latencies = []
+    warm_start = time.perf_counter()
+    end = warm_start + 1.5
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        await client.get_stats()
+        latencies.append((time.perf_counter() - start) * 1e6)
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.2)
+    warm_elapsed = time.perf_counter() - warm_start
+    warm_requests = fake.requests - cold_requests
+
+    assert cold_requests == 1, "request cold tidak digabung"
+    # Maksimal 1 refresh per TTL (+1 untuk refresh yang sedang jalan di ujung window)
+    assert 1 <= warm_requests <= warm_elapsed / workink.WORKINK_STATS_TTL + 1, "refresh melebihi TTL"
+    result = {
+        "cold_concurrent_calls": 20,
+        "cold_requests": cold_requests,
+        "cold_ms": round(cold_ms, 1),
+        "warm_calls": len(latencies),
+        "warm_requests": warm_requests,
+        "warm_max_us": round(max(latencies), 1),
+        "age_s": round(client.stats_age(), 2),
+    }
+    await client.close()
+    await fake.stop()
+    return result
+
+async def bench_callbacks() -> dict:
+    """Load test endpoint callback Work.ink: tanda tangan, dedupe, antrian"""
+    users, duplicates, forged = 5_000, 2, 500
+    fake = FakeGitHub().start()
+    db = open_db(fake)
+    await db.refresh()  # Startup pertama: store siap setelah download (kosong)
+    db.start_flusher()
+    for user_id in range(users):
+        await db.add_pending(user_id, f"tok-{user_id:06d}", "link")
+
+    completions = asyncio.Queue(maxsize=database.CALLBACK_QUEUE_SIZE)
+    server = await keep_alive.keep_alive(db, completions, port=0)
+    url = f"http://127.0.0.1:{server.addresses[0][1]}/callback/workink"
+
+    # Secret masih placeholder: tanda tangan "valid" sekalipun tidak boleh diterima
+    keep_alive.WEBHOOK_SECRET = "ISI_DISINI"
+    body = json.dumps({"token": "tok-000000"}).encode()
+    timestamp = str(int(time.time()))
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, data=body, headers={
+                "X-Signature": keep_alive.sign(body, timestamp),
+                "X-Signature-Timestamp": timestamp}) as response:
+            assert response.status == 503 and completions.empty(), "callback palsu diterima"
+    keep_alive.WEBHOOK_SECRET = "bench-secret"
+
+    # Consumer sama seperti completion_worker di main.py, tanpa DM
+    issued = {}
+
+    async def consumer():
+        while True:
+            user_id = await completions.get()
+            if await db.remove_pending(user_id):
+                key = f"KEY-CB-{user_id:06d}"
+                await db.add_key(key, user_id)
+                issued[user_id] = issued.get(user_id, 0) + 1
+
+    worker = asyncio.create_task(consumer())
+
+    requests_ = []
+    for user_id in range(users):
+        body = json.dumps({"token": f"tok-{user_id:06d}"}).encode()
+        requests_ += [(body, True)] * duplicates
+    requests_ += [(json.dumps({"token": f"tok-{i:06d}"}).encode(), False) for i in range(forged)]
+    random.Random(0).shuffle(requests_)
+
+    statuses = {}
+    latencies = []
+    # 100 koneksi paralel; latency diukur tanpa waktu antri di sisi client
+    limit = asyncio.Semaphore(100)
+    session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=100))
+
+    async def send(body: bytes, valid: bool):
+        timestamp = str(int(time.time()))
+        signature = keep_alive.sign(body, timestamp) if valid else "0" * 64
+        headers = {"X-Signature": signature, "X-Signature-Timestamp": timestamp,
+                   "Content-Type": "application/json"}
+        async with limit:
+            start = time.perf_counter()
+            async with session.post(url, data=body, headers=headers) as response:
+                status = (await response.json())["status"]
+            latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(body, valid) for body, valid in requests_))
+    elapsed = time.perf_counter() - start
+    while not completions.empty():
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+
+    worker.cancel()
+    await session.close()
+    await server.cleanup()
+    await db.close()
+    fake.stop()
+
+    assert len(issued) == users and set(issued.values()) == {1}, "key dobel / hilang"
+    assert statuses.get("invalid signature") == forged
+    latencies.sort()
+    return {
+        "callbacks": len(requests_),
+        "requests_per_s": round(len(requests_) / elapsed),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1e3, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1e3, 2),
+        "statuses": statuses,
+        "keys_issued": sum(issued.values()),
+        "pending_left": db.counters.pending,
+    }
+
+async def bench_verify_batch() -> dict:
+    """p99 !verify saat banyak user verify bersamaan: serial per user vs scheduler"""
+    fake = await FakeWorkink().start()
+    fake.delay = 0.05
+    result = {}
+
+    async def run(verify, count: int) -> dict:
+        tokens = [f"tok{i}-ok" if i % 2 else f"tok{i}" for i in range(count)]
+        latencies = []
+
+        async def one(i: int, token: str):
+            start = time.perf_counter()
+            value = await verify(i, token)
+            latencies.append(time.perf_counter() - start)
+            assert value == fake.completed(token)
+
+        sent = fake.requests
+        await asyncio.gather(*(one(i, t) for i, t in enumerate(tokens)))
+        latencies.sort()
+        return {"p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1e3, 1),
+                "requests": fake.requests - sent}
+
+    for count in (10, 100, 1000):
+        client = workink.WorkinkAPI(base_url=fake.url)
+        row = {"direct": await run(client.verify_completion, count)}
+        workink.VERIFY_BATCH_API = True
+        row["batched"] = await run(workink.VerifyScheduler(client).verify, count)
+        fake.batch = False
+        row["batch_404_fallback"] = await run(workink.VerifyScheduler(client).verify, count)
+        fake.batch = True
+        # Default: endpoint batch tidak pernah dicoba
+        workink.VERIFY_BATCH_API = False
+        row["bounded_no_batch"] = await run(workink.VerifyScheduler(client).verify, count)
+        assert row["bounded_no_batch"]["requests"] == count, "endpoint batch dipakai padahal mati"
+        # 1 request per window (window ditutup lebih awal tiap VERIFY_BATCH_MAX token)
+        windows = -(-count // workink.VERIFY_BATCH_MAX)
+        assert row["batched"]["requests"] == windows, "lebih dari 1 request batch per window"
+        result[str(count)] = row
+        await client.close()
+
+    # p99 batched datar: window + 1 round trip, tidak ikut naik dengan jumlah user
+    limit_ms = 3 * (workink.VERIFY_BATCH_WINDOW + fake.delay) * 1e3
+    batched = [result[str(count)]["batched"]["p99_ms"] for count in (10, 100, 1000)]
+    assert max(batched) <= limit_ms, f"p99 batched naik: {batched}"
+
+    await fake.stop()
+    return result
+
+def validate_server(size: int, ready_queue, stop_event):
+    """Proses terpisah (1 core): web server bot dengan `size` key di store"""
+    async def run():
+        fake = FakeGitHub().start()
+        db = open_db(fake)
+        await db.refresh()  # Startup pertama: store siap setelah download (kosong)
+        db.backend.replace(synthetic_store(size, time.time()))
+        server = await keep_alive.keep_alive(db, asyncio.Queue(), port=0)
+        ready_queue.put(server.addresses[0][1])
+        cpu_start = time.process_time()
+        while not stop_event.is_set():
+            await asyncio.sleep(0.1)
+        # CPU yang dipakai server saja (client bisa berbagi core yang sama)
+        ready_queue.put(time.process_time() - cpu_start)
+        await server.cleanup()
+        fake.stop()
+
+    asyncio.run(run())
+
+async def bench_validate_http() -> dict:
+    """Load generator untuk GET /validate (server di proses sendiri)"""
+    size, seconds, connections = 100_000, 5.0, 64
+    ctx = multiprocessing.get_context("spawn")
+    ready_queue, stop_event = ctx.Queue(), ctx.Event()
+    server = ctx.Process(target=validate_server, args=(size, ready_queue, stop_event))
+    server.start()
+    port = ready_queue.get(timeout=120)
+    url = f"http://127.0.0.1:{port}/validate"
+
+    # 80% key yang ada (valid / expired), 20% key acak
+    rng = random.Random(0)
+    keys = [f"KEY-{rng.randrange(size):08X}-SYNT" if rng.random() < 0.8 else f"KEY-MISSING-{i}"
+            for i in range(10_000)]
+    latencies = []
+    outcomes = {}
+    session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=connections))
+    deadline = time.perf_counter() + seconds
+
+    async def client(n: int):
+        i = n
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            async with session.get(url, params={"key": keys[i % len(keys)]}) as response:
+                valid = (await response.json())["valid"]
+            latencies.append(time.perf_counter() - start)
+            outcomes[valid] = outcomes.get(valid, 0) + 1
+            i += connections
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(connections)))
+    elapsed = time.perf_counter() - start
+    await session.close()
+    stop_event.set()
+    server_cpu = ready_queue.get(timeout=30)
+    server.join()
+
+    latencies.sort()
+    return {
+        "store_keys": size,
+        "connections": connections,
+        "requests": len(latencies),
+        "requests_per_s": round(len(latencies) / elapsed),
+        "server_requests_per_cpu_s": round(len(latencies) / server_cpu),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1e3, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1e3, 2),
+        "valid": outcomes.get(True, 0),
+        "invalid": outcomes.get(False, 0),
+    }
+
+async def bench_validate_probe() -> dict:
+    """Biaya validate_key untuk probe key acak & key valid berulang, per backend"""
+    size = 100_000
+    result = {}
+    fake = FakeGitHub().start()
+    rng = random.Random(1)
+    missing = [f"KEY-{rng.getrandbits(64):016X}" for _ in range(20_000)]
+
+    for backend in ("journal", "sqlite"):
+        db = Database(github_api=fake.url, backend=backend,
+                      data_dir=tempfile.mkdtemp(prefix="keybot-bench-"))
+        now = time.time()
+        db.backend.replace(synthetic_store(size, now, expired_ratio=0.0))
+        valid = [k for k, _ in zip(db.backend.dump()["keys"], range(100))]
+
+        def probe_old():
+            # Jalur lama: lookup ke store + dict hasil baru setiap kali
+            for key in missing:
+                if db.backend.get_key(key) is None:
+                    {"valid": False, "reason": "Key tidak ditemukan"}
+
+        def probe_new():
+            for key in missing:
+                db.validate_key(key)
+
+        def repeat_uncached():
+            for key in valid:
+                db._validate_cache.clear()
+                db.validate_key(key)
+
+        def repeat_cached():
+            for key in valid:
+                db.validate_key(key)
+
+        false_positive = sum(1 for key in missing if db.backend.might_contain(key))
+        tracemalloc.start()
+        probe_new()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result[backend] = {
+            "miss_old_us": round(timed(probe_old, 3) / len(missing) * 1e6, 3),
+            "miss_new_us": round(timed(probe_new, 3) / len(missing) * 1e6, 3),
+            "miss_peak_alloc_bytes": peak,
+            "false_positives": false_positive,
+            "hit_uncached_us": round(timed(repeat_uncached, 20) / len(valid) * 1e6, 3),
+            "hit_cached_us": round(timed(repeat_cached, 20) / len(valid) * 1e6, 3),
+        }
+        await db.close()
+
+    fake.stop()
+    return result
+
+async def bench_ratelimit() -> dict:
+    """Token bucket: spam 1 user, biaya per cek, dan memory setelah user idle"""
+    clock = [0.0]
+    limiter = RateLimiter(rate=0.2, burst=5, clock=lambda: clock[0])
+
+    # 1 user spam 100 command dalam 10 detik
+    allowed = 0
+    for i in range(100):
+        clock[0] = i * 0.1
+        allowed += limiter.acquire("spammer") == 0
+    retry_after = limiter.acquire("spammer")
+
+    # 100k user berbeda masing-masing 1 command
+    start = time.perf_counter()
+    for user_id in range(100_000):
+        limiter.acquire(user_id)
+    per_call_us = (time.perf_counter() - start) / 100_000 * 1e6
+    active = len(limiter)
+
+    # Setelah idle burst/rate detik semua bucket penuh lagi -> dibuang
+    clock[0] += limiter.idle_after
+    limiter.acquire("late")
+    result = {
+        "spam_allowed_of_100": allowed,
+        "spam_retry_after_s": round(retry_after, 2),
+        "acquire_us": round(per_call_us, 3),
+        "buckets_while_active": active,
+        "buckets_after_idle": len(limiter),
+    }
+
+    # Budget tulis global main.py: command yang berhenti sebelum menulis tidak dihitung
+    bot = load_bot()
+    admin_id = 1
+    bot.ADMIN_IDS = [admin_id]
+    fake = FakeGitHub().start()
+    bot.db = open_db(fake)
+    bot.db.backend.replace(synthetic_store(1_000, time.time()))
+    bot.dispatcher = Dispatcher(FakeMessenger().resolve)
+    bot.dispatcher.start()
+    clock = [0.0]
+    bot.write_limiter = RateLimiter(bot.WRITE_RATE, bot.WRITE_BURST, clock=lambda: clock[0])
+
+    async def run(command, user_id: int, *args) -> str:
+        ctx = FakeContext(user_id)
+        ctx.command = command
+        ctx.args = [ctx, *args]
+        bot.user_limiter = RateLimiter(bot.USER_RATE, bot.USER_BURST)
+        try:
+            await bot.rate_limit(ctx)
+            await command.callback(ctx, *args)
+        except bot.RateLimited:
+            return "limited"
+        finally:
+            await bot.record_latency(ctx)
+        return "ok"
+
+    # Member spam !genkey (bukan admin) & !verify tanpa !getkey: tidak menulis apa pun
+    early = [await run(bot.genkey, 50_000_000 + i, 10) for i in range(100)]
+    early += [await run(bot.verify, 60_000_000 + i) for i in range(100)]
+    assert early == ["ok"] * 200
+    # Budget masih penuh: admin tetap bisa !genkey 10 (biaya 10) sebanyak WRITE_BURST / 10
+    admin = [await run(bot.genkey, admin_id, 10) for _ in range(bot.WRITE_BURST // 10 + 1)]
+    assert admin == ["ok"] * (bot.WRITE_BURST // 10) + ["limited"], admin
+    result["write_budget"] = {"early_exit_calls": len(early), "admin_genkey": admin}
+
+    await bot.dispatcher.close()
+    await bot.db.close()
+    fake.stop()
+    return result
+
+async def bench_bulk_genkey() -> dict:
+    """!genkey besar: generate CSPRNG + simpan sekaligus vs per key, per backend"""
+    amount = 50_000
+    sample = 500  # Jalur lama diukur dengan sample lalu diekstrapolasi
+    result = {"keys": amount}
+
+    start = time.perf_counter()
+    keys = keygen.generate_keys(amount, lambda key: False)
+    elapsed = time.perf_counter() - start
+    result["generate_keys_per_s"] = round(amount / elapsed)
+    result["generate_unique"] = len(set(keys)) == amount
+
+    for backend in ("journal", "sqlite"):
+        fake = FakeGitHub(delay=0.01).start()
+        db = Database(github_api=fake.url, backend=backend,
+                      data_dir=tempfile.mkdtemp(prefix="keybot-bench-"))
+        db.backend.replace(synthetic_store(100_000, time.time(), expired_ratio=0.0))
+        db.start_flusher()
+
+        start = time.perf_counter()
+        for _ in range(sample):
+            await db.add_key(keygen.generate_key(), 1, is_admin=True)
+        per_key = (time.perf_counter() - start) / sample
+        await db.flush()
+        commits_before = fake.commits
+
+        # Sama seperti !genkey: generate & simpan per batch, sambil ukur lag event loop
+        lags = []
+        stop = asyncio.Event()
+
+        async def ticker():
+            while not stop.is_set():
+                tick = time.perf_counter()
+                await asyncio.sleep(0.005)
+                lags.append(time.perf_counter() - tick - 0.005)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        keys = []
+        for batch in keygen.generate_key_batches(amount, db.key_exists, database.GENKEY_BATCH):
+            keys += batch
+            await asyncio.sleep(0)
+        await db.add_keys(keys, 1, is_admin=True)
+        bulk = time.perf_counter() - start
+        stop.set()
+        await task
+        await db.close()
+        stored = fake.read_keys()
+
+        result[backend] = {
+            "per_key_total_s_est": round(per_key * amount, 2),
+            "bulk_total_s": round(bulk, 3),
+            "bulk_keys_per_s": round(amount / bulk),
+            "bulk_max_loop_lag_ms": round(max(lags) * 1e3, 1),
+            "bulk_github_commits": fake.commits - commits_before,
+            "keys_persisted": sum(1 for key in keys if key in stored),
+        }
+        fake.stop()
+
+    return result
+
+async def bench_commands() -> dict:
+    """
+    Callback command asli main.py lewat ctx tiruan, per ukuran store
+
+    Hook before_invoke/after_invoke (rate limit, histogram latency) ikut
+    terukur, dengan limit dilonggarkan. GitHub diberi latency 20 ms dan
+    flusher write-behind jalan selama semua command, jadi commit/detik &
+    byte terukur seperti di produksi.
+    """
+    bot = load_bot()
+    calls, concurrency = 200, 20
+    admin_id = 1
+    bot.ADMIN_IDS = [admin_id]
+    bot.VERIFY_API = True
+    result = {}
+
+    fake_workink = await FakeWorkink().start()
+    # Semua token yang dibuat !getkey dianggap sudah selesai
+    fake_workink.completed = lambda token: True
+    # DM command lewat dispatcher yang jalan (dispatcher bawaan main butuh login
+    # Discord). Limit dilonggarkan: yang diukur biaya command, bukan rate limit DM
+    dispatcher.DM_RATE, dispatcher.DM_BURST = 100_000, 100_000
+    messenger = FakeMessenger(user_limit=1_000, global_limit=100_000, latency=0.0)
+    bot.dispatcher = Dispatcher(messenger.resolve)
+    bot.dispatcher.start()
+    # Sama untuk rate limit command (admin menjalankan ratusan command)
+    bot.user_limiter = RateLimiter(1e9, 1e9)
+    bot.write_limiter = RateLimiter(1e9, 1e9)
+
+    for size in (1_000, 10_000, 100_000, 1_000_000):
+        fake = FakeGitHub(delay=0.02).start()
+        db = open_db(fake)
+        db.backend.replace(synthetic_store(size, time.time()))
+        db.counters.rebuild(db.backend, time.time())
+        db.start_flusher()
+        bot.db = db
+        bot.workink = workink.WorkinkAPI(base_url=fake_workink.url)
+        bot.verifier = workink.VerifyScheduler(bot.workink)
+        existing = [k for k, _ in zip(db.backend.dump()["keys"], range(calls))]
+
+        members = [10_000_000 + i for i in range(calls)]
+        plan = {
+            "getkey": [(bot.getkey, (FakeContext(u),)) for u in members],
+            "verify": [(bot.verify, (FakeContext(u),)) for u in members],
+            "cekkey": [(bot.cekkey, (FakeContext(u), existing[i % len(existing)]))
+                       for i, u in enumerate(members)],
+            "mykeys": [(bot.mykeys, (FakeContext(u),)) for u in members],
+            "myid": [(bot.myid, (FakeContext(u),)) for u in members],
+            "genkey": [(bot.genkey, (FakeContext(admin_id), 10)) for _ in range(calls)],
+            "stats": [(bot.stats, (FakeContext(admin_id),)) for _ in range(calls)],
+        }
+
+        async def invoke(command, args, latencies: list):
+            # Urutan sama seperti Command.invoke: before_invoke, callback, after_invoke
+            ctx = args[0]
+            ctx.command = command
+            ctx.args = list(args)
+            start = time.perf_counter()
+            await bot.rate_limit(ctx)
+            try:
+                await command.callback(*args)
+            finally:
+                await bot.record_latency(ctx)
+            latencies.append(time.perf_counter() - start)
+
+        row = {}
+        start = time.perf_counter()
+        for name, invocations in plan.items():
+            latencies = []
+            for i in range(0, len(invocations), concurrency):
+                await asyncio.gather(*(invoke(command, args, latencies)
+                                       for command, args in invocations[i:i + concurrency]))
+            row[name] = percentiles(latencies)
+        elapsed = time.perf_counter() - start
+        await db.close()
+        await bot.workink.close()
+
+        row["seconds"] = round(elapsed, 2)
+        row["github"] = {
+            "commits": fake.commits,
+            "commits_per_s": round(fake.commits / elapsed, 2),
+            "bytes_uploaded": fake.bytes_uploaded,
+            "bytes_per_commit": fake.bytes_uploaded // max(fake.commits, 1),
+        }
+        row["keys_issued"] = sum(1 for u in members if db.count_user_keys(u))
+        result[str(size)] = row
+        fake.stop()
+
+    await bot.dispatcher.close()
+    await fake_workink.stop()
+    return result
+
+async def bench_metrics() -> dict:
+    """Biaya mencatat metric di jalur panas + isi /metrics setelah traffic"""
+    histogram = metrics.Histogram("bench_seconds", "bench", ("command",))
+    counter = metrics.Counter("bench_total", "bench", ("endpoint", "status"))
+    metrics._METRICS.remove(histogram)
+    metrics._METRICS.remove(counter)
+    n = 200_000
+    observe_ns = timed(lambda: histogram.observe(0.0123, "verify"), n) * 1e9
+    inc_ns = timed(lambda: counter.inc("stats", "200"), n) * 1e9
+
+    # Traffic asli: GitHub (save) + Work.ink + store, lalu scrape /metrics
+    fake = FakeGitHub(delay=0.005).start()
+    fake_workink = await FakeWorkink().start()
+    db = open_db(fake)
+    for i in range(200):
+        await db.add_key(f"KEY-METR-{i:04d}-0000-0000", i)
+    await db.add_pending(1, "tok-ok", "https://example")
+    await db.flush()
+    client = workink.WorkinkAPI(base_url=fake_workink.url)
+    for _ in range(20):
+        await client.verify_completion(1, "tok-ok")
+
+    runner = web.AppRunner(keep_alive.create_app(db, asyncio.Queue()))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    async with aiohttp.ClientSession() as session:
+        start = time.perf_counter()
+        async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+            text = await response.text()
+            content_type = response.headers["Content-Type"]
+        scrape_ms = (time.perf_counter() - start) * 1e3
+
+    samples = dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+    await runner.cleanup()
+    await client.close()
+    await fake_workink.stop()
+    await db.close()
+    fake.stop()
+    return {
+        "histogram_observe_ns": round(observe_ns),
+        "counter_inc_ns": round(inc_ns),
+        "scrape_ms": round(scrape_ms, 2),
+        "content_type": content_type,
+        "series": len(samples),
+        "active_keys": float(samples['keybot_store_keys{state="active"}']),
+        "pending_users": float(samples["keybot_pending_users"]),
+        "github_commits_seen": sum(float(v) for k, v in samples.items()
+                                   if k.startswith('keybot_github_requests_total{method="POST",endpoint="git/commits"')),
+        "workink_requests_seen": float(samples['keybot_workink_requests_total{endpoint="completions",status="200"}']),
+    }
+
+async def bench_startup() -> dict:
+    """
+    Waktu startup: pertama kali (download dari GitHub) vs restart dari snapshot lokal
+
+    Constructor tidak lagi menyentuh network. Yang diukur: lama constructor
+    (dulu ikut menunggu download), lama sampai store siap, request GitHub
+    saat refresh, dan lag event loop selama refresh berjalan.
+    """
+    database.REFRESH_INTERVAL = 0  # _refresh_loop cukup 1x
+    result = {}
+    for size in (10_000, 100_000, 1_000_000):
+        fake = FakeGitHub(delay=0.05).start()
+        seed = open_db(fake)
+        seed.backend.replace(synthetic_store(size, time.time()))
+        seed.dirty_shards = set(range(database.GITHUB_SHARDS)) | {database.PENDING_SHARD}
+        await seed.save_async()
+        data_dir = tempfile.mkdtemp(prefix="keybot-bench-")
+        row = {}
+
+        for mode in ("first_run", "restart"):
+            lags = []
+            stop = asyncio.Event()
+
+            async def ticker():
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    await asyncio.sleep(0.005)
+                    lags.append(time.perf_counter() - start - 0.005)
+
+            start = time.perf_counter()
+            db = open_db(fake, data_dir)
+            constructor = time.perf_counter() - start
+            ready_at_construct = db.ready
+            sent, not_modified = fake.requests, fake.not_modified
+            task = asyncio.create_task(ticker())
+            db.start_refresh()
+            await db.wait_ready()
+            ready = time.perf_counter() - start
+            await db._refresher
+            stop.set()
+            await task
+            # Refresh berikutnya (interval) saat HEAD tidak berubah
+            sent_again = fake.requests
+            await db.refresh()
+
+            row[mode] = {
+                "constructor_ms": round(constructor * 1e3, 1),
+                "ready_at_construct": ready_at_construct,
+                "ready_ms": round(ready * 1e3, 1),
+                "refresh_requests": sent_again - sent,
+                "next_refresh_requests": fake.requests - sent_again,
+                "refresh_not_modified": fake.not_modified - not_modified,
+                "max_loop_lag_ms": round(max(lags, default=0.0) * 1e3, 1),
+                "keys": db.get_stats()["total_keys"],
+            }
+            if mode == "first_run":
+                # Sisa lag: GC + operasi C panjang di thread store yang memegang GIL
+                assert max(lags, default=0.0) < 1.0, "event loop macet saat download pertama"
+            await db.close()
+
+        # Instance lain commit: refresh berikutnya cuma mengambil shard yang berubah
+        await seed.add_key("KEY-BENCH-REMOTE-0001", 1)
+        db = open_db(fake, data_dir)
+        sent = fake.requests
+        await db.refresh()
+        row["remote_change"] = {
+            "refresh_requests": fake.requests - sent,
+            "merged": db.backend.get_key("KEY-BENCH-REMOTE-0001") is not None,
+        }
+        await db.close()
+        await seed.close()
+        fake.stop()
+        result[str(size)] = row
+
+    return result
+
+async def bench_dispatch() -> dict:
+    """DM lewat dispatcher vs gather langsung, ke sink yang menegakkan rate limit"""
+    result = {}
+    # Dispatcher di bawah limit global fake (50/s), cukup cepat untuk benchmark
+    dispatcher.DM_RATE, dispatcher.DM_BURST = 40, 40
+    users, per_user = 100, 3
+
+    # Naive: tiap pesan 1 request, semua sekaligus, tanpa retry
+    fake = FakeMessenger()
+
+    async def naive(user_id: int) -> bool:
+        try:
+            await (await fake.resolve(user_id)).send(f"pesan ke {user_id}")
+            return True
+        except discord.HTTPException:
+            return False
+
+    start = time.perf_counter()
+    sent = await asyncio.gather(*(naive(u) for u in range(users) for _ in range(per_user)))
+    result["naive"] = {
+        "messages": len(sent),
+        "delivered": sum(sent),
+        "requests": fake.requests,
+        "rate_limited": fake.limited,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+    # Dispatcher: pesan ke user yang sama digabung, 429 ditunggu lalu dicoba lagi
+    fake = FakeMessenger()
+    dm = Dispatcher(fake.resolve)
+    dm.start()
+    start = time.perf_counter()
+    messages = [(u, f"pesan {n} ke {u}") for u in range(users) for n in range(per_user)]
+    futures = [await dm.enqueue(u, text) for u, text in messages]
+    sent = await asyncio.gather(*futures)
+    result["dispatcher"] = {
+        "messages": len(sent),
+        "delivered": sum(sent),
+        "requests": fake.requests,
+        "rate_limited": fake.limited,
+        "early_retries": fake.early_retries,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    await dm.close()
+    # Tiap pesan sampai tepat 1x, dan tiap 429 ditunggu sampai Retry-After lewat
+    assert all(sent) and fake.all_received() == sorted(text for _, text in messages), \
+        "pesan hilang / terkirim dobel"
+    assert fake.early_retries == 0, f"{fake.early_retries} request sebelum Retry-After lewat"
+
+    # 1 user, DM berurutan (tidak bisa digabung): limit per user 5/s -> 429 + retry
+    fake = FakeMessenger()
+    dm = Dispatcher(fake.resolve)
+    dm.start()
+    start = time.perf_counter()
+    sent = [await dm.send(1, f"pesan {i}") for i in range(12)]
+    result["single_user_retry"] = {
+        "messages": len(sent),
+        "delivered": sum(sent),
+        "rate_limited": fake.limited,
+        "early_retries": fake.early_retries,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    await dm.close()
+    assert fake.received[1] == [f"pesan {i}" for i in range(12)], "pesan hilang / terkirim dobel"
+    assert fake.limited["user"] and fake.early_retries == 0, "429 tidak ditunggu sampai Retry-After"
+
+    # DM command saat broadcast masih antre: tidak menunggu di belakang broadcast
+    fake = FakeMessenger()
+    dm = Dispatcher(fake.resolve)
+    dm.start()
+    queued = [await dm.enqueue(u, "📣 tes", bulk=True) for u in range(200)]
+    await asyncio.sleep(0.1)
+    start = time.perf_counter()
+    interactive_sent = await dm.send(10_000, "🔑 key kamu")
+    interactive = time.perf_counter() - start
+    broadcast_sent = await asyncio.gather(*queued)
+    result["interactive_during_broadcast"] = {
+        "broadcast_queued": len(queued),
+        "interactive_ms": round(interactive * 1e3, 1),
+        "broadcast_fifo_ms": round(len(queued) / dispatcher.DM_RATE * 1e3),
+        "broadcast_delivered": sum(broadcast_sent),
+    }
+    await dm.close()
+    assert interactive_sent and interactive < 0.5, f"DM interaktif menunggu {interactive:.1f}s di belakang broadcast"
+    assert all(broadcast_sent), "broadcast tidak terkirim semua"
+    assert fake.all_received() == sorted(["📣 tes"] * len(queued) + ["🔑 key kamu"]), \
+        "pesan hilang / terkirim dobel"
+    assert fake.early_retries == 0, f"{fake.early_retries} request sebelum Retry-After lewat"
+
+    # Broadcast lewat command bot: penerima di-stream dari store, 5% DM tertutup
+    bot = load_bot()
+    size = 5_000
+    github = FakeGitHub().start()
+    db = open_db(github)
+    db.backend.replace(synthetic_store(size, time.time()))
+    recipients = {user_id for user_id, _ in db.key_holders()}
+    holders = sum(1 for _ in db.key_holders())
+    fake = FakeMessenger(closed=set(range(0, size // 10, 20)))
+    bot.db, bot.dispatcher = db, Dispatcher(fake.resolve)
+    bot.dispatcher.start()
+    ctx = FakeContext(1)
+    start = time.perf_counter()
+    await bot.dm_holders(ctx, db.key_holders(), lambda expires_at: "📣 tes", "Broadcast")
+    result["broadcast"] = {
+        "keys": size,
+        "recipients": holders,
+        "delivered": sum(fake.delivered.values()),
+        "forbidden": fake.forbidden,
+        "rate_limited": fake.limited,
+        "report": ctx.sent[-1][0],
+        "early_retries": fake.early_retries,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    await bot.dispatcher.close()
+    await db.close()
+    github.stop()
+    # Tiap holder yang DM-nya terbuka menerima broadcast tepat 1x
+    assert fake.received == {u: ["📣 tes"] for u in recipients - fake.closed}, \
+        "broadcast hilang / terkirim dobel"
+    assert fake.early_retries == 0, f"{fake.early_retries} request sebelum Retry-After lewat"
+    return result
+
+def blocking_github_call():
+    """Request sync yang tidak sengaja dipanggil di event loop"""
+    time.sleep(0.5)
+
+async def bench_loop_lag() -> dict:
+    """Watchdog: lag loop saat idle, dan stack yang tertangkap saat loop diblokir"""
+    watchdog = profiler.LoopWatchdog(interval=0.05, threshold=0.1)
+    watchdog.start()
+    lags = []
+    # Idle: lag yang terukur = overhead scheduling loop
+    for _ in range(40):
+        start = time.monotonic()
+        await asyncio.sleep(0.05)
+        lags.append(max(time.monotonic() - start - 0.05, 0.0))
+    stalls_before = sum(metrics.LOOP_STALLS.values.values())
+    with contextlib.redirect_stdout(sys.stderr):
+        blocking_github_call()
+        await asyncio.sleep(0.2)
+    watchdog.stop()
+    stack = watchdog.last_stall or ""
+    return {
+        "idle_lag": percentiles(lags),
+        "stalls_reported": sum(metrics.LOOP_STALLS.values.values()) - stalls_before,
+        "culprit_in_stack": "blocking_github_call" in stack,
+        "stack_top": stack.strip().splitlines()[-2].strip() if stack else None,
+    }
+
+async def bench_profiler() -> dict:
+    """!profile lewat hook asli main.py: overhead per command + isi laporan"""
+    bot = load_bot()
+    admin_id = 1
+    bot.ADMIN_IDS = [admin_id]
+    github = FakeGitHub().start()
+    db = open_db(github)
+    db.backend.replace(synthetic_store(100_000, time.time()))
+    db.counters.rebuild(db.backend, time.time())
+    bot.db = db
+    messenger = FakeMessenger()
+    reports = []
+
+    async def resolve(user_id: int):
+        recipient = await messenger.resolve(user_id)
+        send = recipient.send
+
+        async def capture(content=None, **kwargs):
+            reports.extend(f.fp.read() for f in kwargs.get("files", ()))
+            await send(content, **kwargs)
+        recipient.send = capture
+        return recipient
+
+    bot.dispatcher = Dispatcher(resolve)
+    bot.dispatcher.start()
+    existing = [k for k, _ in zip(db.backend.dump()["keys"], range(100))]
+    plan = [(bot.cekkey, (existing[i % 100],)) for i in range(60)]
+    plan += [(bot.mykeys, ()) for _ in range(20)]
+    plan += [(bot.genkey, (5,)) for _ in range(20)]
+
+    async def run(user_base: int) -> list:
+        latencies = []
+        for i, (command, args) in enumerate(plan):
+            user_id = admin_id if command is bot.genkey else user_base + i
+            ctx = FakeContext(user_id)
+            ctx.command = command
+            ctx.args = [ctx, *args]
+            await bot.rate_limit(ctx)
+            await command.callback(ctx, *args)
+            await bot.record_latency(ctx)
+            latencies.append(time.perf_counter() - ctx.started_at)
+            bot.user_limiter = RateLimiter(bot.USER_RATE, bot.USER_BURST)
+            bot.write_limiter = RateLimiter(bot.WRITE_RATE, bot.WRITE_BURST)
+        return latencies
+
+    result = {"off": percentiles(await run(20_000_000))}
+    for mode in profiler.CommandProfiler.MODES:
+        bot.profiler.start(FakeContext(admin_id), len(plan), mode)
+        latencies = await run(30_000_000)
+        await bot.dispatcher.drain()
+        report = reports.pop().decode() if reports else ""
+        result[mode] = {
+            **percentiles(latencies),
+            "report_bytes": len(report),
+            "report_head": report.splitlines()[:6],
+        }
+    await bot.dispatcher.close()
+    await db.close()
+    github.stop()
+    return result
+
+def node_database(path: str, size: int, now: float):
+    """database.json tiruan bot Node: `size` user, masing-masing 1 key + HWID"""
+    iso = lambda t: time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(t))
+    with open(path, "w", encoding="utf-8") as f:
+        users = {str(10**17 + i): {"odiscordId": str(10**17 + i), "username": f"user{i}",
+                                   "hwid": f"HWID{i:012d}", "lastRequest": iso(now),
+                                   "requestCount": 1} for i in range(size)}
+        # Setengah key tanpa hwid: importer harus mengambilnya dari users
+        keys = {str(10**17 + i): {"key": f"NODE-{i:010d}-KEY", "validatedAt": iso(now - 3600),
+                                  "expiresAt": iso(now + (-1 if i % 4 == 0 else 1) * 7200),
+                                  "isAdmin": False, **({"hwid": f"HWID{i:012d}"} if i % 2 else {})}
+                for i in range(size)}
+        json.dump({"users": users, "keys": keys, "stats": {"totalKeys": size, "totalUsers": size}},
+                  f, indent=2)
+
+async def bench_hwid() -> dict:
+    """Validasi key+HWID lewat index vs scan ala bot Node, dan import database.json besar"""
+    result = {}
+    size = 200_000
+    now = time.time()
+    store = synthetic_store(size, now)
+    for i, record in enumerate(store["keys"].values()):
+        record["hwid"] = f"HWID{i:012d}"
+    probes = [(k, store["keys"][k]["hwid"]) for k in random.Random(1).sample(list(store["keys"]), 1000)]
+
+    fake = FakeGitHub().start()
+    answers = {}
+    for backend in ("journal", "sqlite"):
+        db = Database(github_api=fake.url, backend=backend,
+                      data_dir=tempfile.mkdtemp(prefix="keybot-bench-"))
+        db.backend.replace(store)
+
+        def match():
+            for key, hwid in probes:
+                db._validate_cache.clear()
+                db.validate_key(key, hwid)
+
+        def mismatch():
+            for key, _ in probes:
+                db._validate_cache.clear()
+                db.validate_key(key, "HWID-LAIN")
+
+        def by_hwid():
+            for _, hwid in probes:
+                db.key_for_hwid(hwid)
+
+        answers[backend] = ([db.validate_key(k, h) for k, h in probes],
+                            [db.validate_key(k, "HWID-LAIN") for k, _ in probes],
+                            [db.key_for_hwid(h) for _, h in probes])
+        result[backend] = {
+            "validate_match_us": round(timed(match, 3) / len(probes) * 1e6, 2),
+            "validate_mismatch_us": round(timed(mismatch, 3) / len(probes) * 1e6, 2),
+            "key_for_hwid_us": round(timed(by_hwid, 3) / len(probes) * 1e6, 2),
+        }
+        await db.close()
+    assert answers["journal"][1:] == answers["sqlite"][1:]
+    assert all(r is database.KEY_HWID_MISMATCH or not r["valid"] for r in answers["journal"][1])
+    assert answers["journal"][2] == [k for k, _ in probes]
+
+    # Bot Node: cari key dengan scan semua record
+    node_keys = {str(i): {"key": k, "hwid": v["hwid"]} for i, (k, v) in enumerate(store["keys"].items())}
+    def node_scan():
+        for key, hwid in probes[:50]:
+            next(d for d in node_keys.values() if d["key"] == key)["hwid"] == hwid
+    result["node_scan_us"] = round(timed(node_scan, 1) / 50 * 1e6, 2)
+
+    # Import database.json Node: streaming vs json.load, lalu 1 put_keys
+    path = os.path.join(tempfile.mkdtemp(prefix="keybot-bench-"), "database.json")
+    node_database(path, size, now)
+    tracemalloc.start()
+    with open(path, encoding="utf-8") as f:
+        entries = sum(1 for _ in database.iter_json_sections(f, {"users", "keys"}))
+    _, stream_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    with open(path, encoding="utf-8") as f:
+        json.load(f)
+    _, load_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result["import"] = {
+        "file_mb": round(os.path.getsize(path) / 2**20, 1),
+        "entries": entries,
+        "stream_parse_peak_mb": round(stream_peak / 2**20, 1),
+        "json_load_peak_mb": round(load_peak / 2**20, 1),
+    }
+    for backend in ("journal", "sqlite"):
+        target = database.open_backend(backend, tempfile.mkdtemp(prefix="keybot-bench-"))
+        start = time.perf_counter()
+        imported = database.import_node_json(path, target)
+        elapsed = time.perf_counter() - start
+        assert target.key_for_hwid("HWID000000000002") == "NODE-0000000002-KEY"
+        assert target.get_key("NODE-0000000002-KEY")["hwid"] == "HWID000000000002"
+        target.close(synced=False)
+        result["import"][backend] = {**imported, "seconds": round(elapsed, 2)}
+    fake.stop()
+    return result
+
+class FakeAttachment:
+    """discord.Attachment tiruan: isi file dari bytes"""
+
+    def __init__(self, filename: str, data: bytes):
+        self.filename = filename
+        self.data = data
+
+    async def read(self) -> bytes:
+        return self.data
+
+async def bench_jsonl() -> dict:
+    """Export/import JSONL: memory konstan vs dump() utuh, per backend, plus !export/!importkeys"""
+    result = {}
+    size = 500_000
+    now = time.time()
+    store = synthetic_store(size, now)
+    for i, record in enumerate(islice(store["keys"].values(), 0, None, 3)):
+        record["hwid"] = f"HWID{i:012d}"
+    store["pending"] = {str(i): {"token": f"tok{i}", "link": "https://example", "created_at": now,
+                                 "expires_at": now + 600} for i in range(1000)}
+    directory = tempfile.mkdtemp(prefix="keybot-bench-")
+
+    for backend in ("journal", "sqlite"):
+        source = database.open_backend(backend, tempfile.mkdtemp(prefix="keybot-bench-"))
+        source.replace(store)
+        row = {}
+        for name in ("keys.jsonl", "keys.jsonl.gz"):
+            path = os.path.join(directory, f"{backend}-{name}")
+            start = time.perf_counter()
+            counts = database.export_jsonl(source, path)
+            row[name] = {"export_s": round(time.perf_counter() - start, 2),
+                         "mb": round(os.path.getsize(path) / 2**20, 1)}
+            target = database.open_backend(backend, tempfile.mkdtemp(prefix="keybot-bench-"))
+            start = time.perf_counter()
+            imported = database.import_jsonl(target, path)
+            row[name]["import_s"] = round(time.perf_counter() - start, 2)
+            assert counts == {"key": size, "pending": 1000}
+            assert imported == {"key": size, "pending": 1000, "skipped": 0}
+            assert target.dump() == source.dump()
+            target.close()
+
+        # Memory: export streaming vs dump() + json.dumps, import streaming (1 batch di memory)
+        path = os.path.join(directory, f"{backend}-keys.jsonl.gz")
+        tracemalloc.start()
+        database.export_jsonl(source, os.path.join(directory, "peak.jsonl.gz"))
+        _, export_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        json.dumps(source.dump())
+        _, dump_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        target = database.open_backend(backend, tempfile.mkdtemp(prefix="keybot-bench-"))
+        tracemalloc.start()
+        with database.open_jsonl(path, "r") as f:
+            for _ in database.import_batches(f):
+                pass
+        _, import_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        target.close()
+        row["export_peak_mb"] = round(export_peak / 2**20, 1)
+        row["dump_json_peak_mb"] = round(dump_peak / 2**20, 1)
+        row["import_parse_peak_mb"] = round(import_peak / 2**20, 1)
+        source.close()
+        result[backend] = row
+
+    # Lewat command bot: !export ke DM, lalu !importkeys file itu ke store kosong
+    bot = load_bot()
+    bot.ADMIN_IDS = [1]
+    bot.DATA_DIR = directory
+    github = FakeGitHub().start()
+    small = synthetic_store(20_000, now)
+    db = open_db(github)
+    db.backend.replace(small)
+    db.counters.rebuild(db.backend, time.time())
+    bot.db = db
+    messenger = FakeMessenger()
+    files = []
+
+    async def resolve(user_id: int):
+        recipient = await messenger.resolve(user_id)
+        send = recipient.send
+
+        async def capture(content=None, **kwargs):
+            files.extend((f.filename, f.fp.read()) for f in kwargs.get("files", ()))
+            await send(content, **kwargs)
+        recipient.send = capture
+        return recipient
+
+    bot.dispatcher = Dispatcher(resolve)
+    bot.dispatcher.start()
+    ctx = FakeContext(1)
+    start = time.perf_counter()
+    await bot.export_cmd.callback(ctx)
+    export_s = time.perf_counter() - start
+    filename, data = files[0]
+
+    restored = open_db(github)
+    bot.db = restored
+    ctx = FakeContext(1)
+    ctx.message = type("Message", (), {"attachments": [FakeAttachment(filename, data)]})()
+    start = time.perf_counter()
+    await bot.importkeys.callback(ctx)
+    import_s = time.perf_counter() - start
+    assert restored.backend.dump() == db.backend.dump()
+
+    result["commands"] = {
+        "keys": len(small["keys"]),
+        "export_s": round(export_s, 3),
+        "attachment_kb": round(len(data) / 1024, 1),
+        "import_s": round(import_s, 3),
+        "reply": ctx.sent[-1][0],
+        "stats_match": restored.get_stats() == db.get_stats(),
+    }
+
+    # Key yang sama 2x di 1 batch: dihitung sekali di counter dan di laporan import
+    line = json.dumps({"type": "key", "key": "KEY-DUP", "user_id": 1,
+                       "created_at": now, "expires_at": now + 3600}) + "\n"
+    with io.StringIO(line * 2) as f:
+        duplicate = await restored.import_jsonl(f)
+    assert duplicate["key"] == 1
+    assert restored.get_stats() == restored.recount_stats()
+    await bot.dispatcher.close()
+    await restored.close()
+    await db.close()
+    github.stop()
+    return result
+
+SCENARIOS = {
+    "save_in_flight": bench_save_in_flight,
+    "write_behind": bench_write_behind,
+    "journal": bench_journal,
+    "stats": bench_stats,
+    "shard_upload": bench_shard_upload,
+    "memory": bench_memory,
+    "user_keys": bench_user_keys,
+    "multi_instance": bench_multi_instance,
+    "workink": bench_workink,
+    "stats_cache": bench_stats_cache,
+    "callbacks": bench_callbacks,
+    "verify_batch": bench_verify_batch,
+    "validate_http": bench_validate_http,
+    "validate_probe": bench_validate_probe,
+    "ratelimit": bench_ratelimit,
+    "bulk_genkey": bench_bulk_genkey,
+    "commands": bench_commands,
+    "metrics": bench_metrics,
+    "startup": bench_startup,
+    "dispatch": bench_dispatch,
+    "loop_lag": bench_loop_lag,
+    "profiler": bench_profiler,
+    "hwid": bench_hwid,
+    "jsonl": bench_jsonl,
+}
+
+def main(argv: list) -> int:
+    names = argv or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        print(f"Skenario tidak dikenal: {', '.join(unknown)}", file=sys.stderr)
+        print(f"Tersedia: {', '.join(SCENARIOS)}", file=sys.stderr)
+        return 2
+
+    # 1 proses per skenario: konfigurasi yang diubah skenario tidak bocor ke skenario lain
+    ctx = multiprocessing.get_context("spawn")
+    results, failed = {}, False
+    for name in names:
+        result_queue = ctx.Queue()
+        process = ctx.Process(target=run_scenario, args=(name, result_queue))
+        process.start()
+        # Ambil hasil dulu baru join: proses anak baru bisa selesai setelah isi
+        # queue-nya terbaca (join duluan bisa deadlock kalau hasilnya besar)
+        result = None
+        while result is None and (process.is_alive() or not result_queue.empty()):
+            try:
+                result = result_queue.get(timeout=1)
+            except queue.Empty:
+                pass
+        process.join()
+        if process.exitcode == 0 and result is not None:
+            results[name] = result
+        else:
+            results[name] = {"error": f"exit code {process.exitcode}"}
+            failed = True
+    print(json.dumps(results, indent=2))
+    return 1 if failed else 0
+
+def run_scenario(name: str, result_queue):
+    # Print dari bot (mis. "Save conflict") ke stderr, stdout khusus JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        result_queue.put(asyncio.run(SCENARIOS[name]()))
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,44 @@
+import math
+
+class BloomFilter:
+    """
+    Bloom filter untuk cek "key ini pasti tidak ada" tanpa query ke store
+
+    False positive mungkin (dicek ulang ke store), false negative tidak.
+    Tidak bisa menghapus: key yang sudah dihapus tetap dianggap "mungkin ada"
+    sampai filter dibangun ulang. Pakai hash() bawaan Python (di-cache di
+    object str), jadi filter hanya berlaku di proses yang sama.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(capacity, 1024)
+        self.error_rate = error_rate
+        self.size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    # Double hashing: posisi ke-i = h1 + i*h2 (loop ditulis langsung, ini jalur panas)
+    def add(self, key: str):
+        h = hash(key)
+        pos, step, size, bits = h & 0xFFFFFFFF, (h >> 32) | 1, self.size, self.bits
+        for _ in range(self.hashes):
+            pos %= size
+            bits[pos >> 3] |= 1 << (pos & 7)
+            pos += step
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        h = hash(key)
+        pos, step, size, bits = h & 0xFFFFFFFF, (h >> 32) | 1, self.size, self.bits
+        for _ in range(self.hashes):
+            pos %= size
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+            pos += step
+        return True
+
+    @property
+    def full(self) -> bool:
+        """Sudah melebihi kapasitas: false positive naik, sebaiknya dibangun ulang"""
+        return self.count > self.capacity
@@ -23,3 +23,101 @@ GITHUB_TOKEN = "ghp_zf3EdnSjshsvsv"
 
 # 7. GITHUB REPO
 GITHUB_REPO = "https://github.com/luarmor-v4/bot-"
+
+# 8. GITHUB BRANCH
+GITHUB_BRANCH = "main"
+
+# 9. WORK.INK PUBLISHER ID
+WORKINK_PUBLISHER_ID = "pub_xxxxxx"
+
+# 10. KEY SETTINGS
+KEY_DURATION = 86400  # 24 jam dalam detik
+KEY_PREFIX = "KEY"    # Prefix key: KEY-XXXX-XXXX-XXXX
+
+# ═══ STORAGE ═══
+GITHUB_TIMEOUT = 15  # Timeout request ke GitHub (detik)
+SAVE_RETRIES = 5     # Maksimal percobaan commit kalau bentrok dengan instance lain
+SAVE_BACKOFF = 0.5   # Jeda awal antar percobaan (detik, dikali 2 tiap kali)
+
+# ═══ WRITE-BEHIND ═══
+WRITE_BEHIND = True    # Mutasi cukup ditandai dirty, flusher yang commit ke GitHub
+SAVE_INTERVAL = 10     # Maksimal 1 commit per N detik...
+SAVE_MAX_CHANGES = 50  # ...atau langsung commit setelah N perubahan
+
+# ═══ PENYIMPANAN LOKAL ═══
+STORAGE_BACKEND = "journal"   # "journal" (dict + journal) atau "sqlite"
+DATA_DIR = "data"             # Folder snapshot + journal / keys.db
+JOURNAL_FSYNC = True          # fsync setiap operasi (paling aman saat crash)
+JOURNAL_COMPACT_EVERY = 1000  # Tulis snapshot baru setiap N operasi
+GITHUB_BACKUP = True          # Backup async ke GitHub (store utama tetap lokal)
+GITHUB_DIR = "keys"           # Folder di repo GitHub untuk file shard
+GITHUB_SHARDS = 256           # Jumlah shard key (JANGAN diubah setelah ada data)
+
+# ═══ STARTUP ═══
+READY_TIMEOUT = 15      # Command yang butuh data menunggu store siap maksimal N detik
+REFRESH_INTERVAL = 300  # Cek perubahan di GitHub (instance lain) tiap N detik, 0 = hanya saat startup
+
+# ═══ EXPIRY SWEEPER ═══
+SWEEP_INTERVAL = 60        # Cek key/pending expired setiap N detik
+SWEEP_BATCH = 500          # Maksimal record dihapus per batch
+KEY_RETENTION = 7 * 86400  # Key expired masih disimpan N detik sebelum dihapus
+SWEEP_ARCHIVE = False      # True: simpan record yang dihapus ke data/archive.jsonl
+
+# ═══ WORK.INK CLIENT ═══
+WORKINK_TIMEOUT = 5            # Timeout per request ke Work.ink (detik)
+WORKINK_RETRIES = 2            # Retry tambahan untuk timeout / error 5xx
+WORKINK_BACKOFF = 0.3          # Jeda dasar antar retry (detik, dengan jitter)
+WORKINK_MAX_CONNECTIONS = 10   # Ukuran pool koneksi keep-alive
+WORKINK_BREAKER_FAILURES = 5   # Gagal beruntun sebelum circuit breaker terbuka
+WORKINK_BREAKER_RESET = 30     # Breaker dicoba lagi setelah N detik
+WORKINK_STATS_TTL = 60         # Statistik link di-refresh maksimal 1x per N detik
+VERIFY_API = False             # True: !verify cek ke API Work.ink dulu sebelum kasih key
+VERIFY_BATCH_API = False       # True: pakai endpoint batch (spekulatif, tidak ada di dokumentasi Work.ink)
+VERIFY_BATCH_WINDOW = 0.05     # !verify yang masuk dalam N detik dicek sekaligus
+VERIFY_BATCH_MAX = 100         # Maksimal token per batch
+VERIFY_CONCURRENCY = 10        # Maksimal request paralel kalau API tidak support batch
+
+# ═══ WEB SERVER & CALLBACK ═══
+WEB_PORT = 8080               # Port web server (keep alive + callback Work.ink)
+WEBHOOK_SECRET = "ISI_DISINI" # Secret HMAC untuk callback Work.ink
+CALLBACK_MAX_SKEW = 300       # Callback dengan timestamp lebih lama dari N detik ditolak
+CALLBACK_QUEUE_SIZE = 10000   # Maksimal callback yang menunggu diproses bot
+
+# ═══ VALIDASI KEY ═══
+VALIDATE_CACHE_SIZE = 10000  # Jumlah hasil validasi terakhir yang disimpan (LRU)
+BLOOM_ERROR_RATE = 0.001     # False positive Bloom filter (backend sqlite)
+HWID_MIN_LENGTH = 5          # Panjang HWID yang diterima (sama dengan bot Node)...
+HWID_MAX_LENGTH = 64         # ...sampai N karakter
+
+# ═══ RATE LIMIT ═══
+USER_RATE = 0.2      # Token command per user per detik (1 command / 5 detik)...
+USER_BURST = 5       # ...dengan maksimal 5 command beruntun
+WRITE_RATE = 2       # Budget global tulis ke store per detik (getkey/verify/genkey)...
+WRITE_BURST = 30     # ...dengan maksimal 30 beruntun
+# Biaya budget tulis per command (genkey: per key yang dibuat)
+WRITE_COMMANDS = {"getkey": 1, "verify": 1, "genkey": 1}
+
+# ═══ DM DISPATCHER ═══
+DM_CONCURRENCY = 5     # DM yang dikirim bersamaan
+DM_RATE = 5            # Maksimal DM per detik (semua user)...
+DM_BURST = 10          # ...dengan maksimal 10 beruntun
+DM_RETRIES = 3         # Percobaan ulang setelah kena 429
+DM_QUEUE_SIZE = 1000   # Antrian DM broadcast; broadcast menunggu kalau penuh
+REMIND_BEFORE = 3600   # !remind default: key yang expire dalam N detik
+
+# ═══ EXPORT / IMPORT ═══
+EXPORT_BATCH = 1000                # Record per batch (1 transaksi saat import)
+EXPORT_MAX_BYTES = 25 * 1024 * 1024  # Batas lampiran Discord; lebih besar -> pakai manage.py
+
+# ═══ MONITORING ═══
+LAG_INTERVAL = 0.5              # Watchdog mengukur lag event loop tiap N detik
+LAG_THRESHOLD = 0.25            # Lag/macet di atas N detik di-print beserta stack-nya
+PROFILE_MAX = 500               # !profile maksimal N command
+PROFILE_SAMPLE_INTERVAL = 0.005 # Mode wall: ambil stack loop tiap N detik
+PROFILE_TOP = 30                # Jumlah fungsi teratas di laporan
+
+# ═══ PERINTAH ═══
+MYKEYS_PER_PAGE = 10  # Jumlah key per halaman di !mykeys
+GENKEY_EMBED_MAX = 10  # !genkey sampai jumlah ini dikirim sebagai embed, di atasnya sebagai file
+GENKEY_MAX = 50000     # Maksimal key per !genkey
+GENKEY_BATCH = 1000    # !genkey besar dibuat & disimpan per N key, event loop jalan di sela batch
@@ -1,145 +1,1855 @@
+import gzip
+import io
 import json
+import os
+import heapq
+import hashlib
+import random
+import zlib
+import sqlite3
 import requests
 import base64
 import time
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from config import *
+from journal import Journal
+from keytable import KeyTable
+from bloom import BloomFilter
+import metrics
 
-class Database:
+PENDING_SHARD = -1  # Shard khusus untuk pending + users
+
+# Hasil validate_key yang selalu sama, dipakai bersama (jangan diubah caller)
+KEY_NOT_FOUND = {"valid": False, "reason": "Key tidak ditemukan"}
+KEY_EXPIRED = {"valid": False, "reason": "Key sudah expired"}
+KEY_HWID_MISMATCH = {"valid": False, "reason": "HWID tidak cocok"}
+
+def empty_store() -> dict:
+    return {"keys": {}, "users": {}, "pending": {}}
+
+def shard_of(key: str) -> int:
+    """Nomor shard GitHub untuk sebuah key"""
+    return zlib.crc32(key.encode()) % GITHUB_SHARDS
+
+def blob_sha(content: str) -> str:
+    """sha blob git untuk isi file (sama dengan yang dihitung GitHub)"""
+    raw = content.encode()
+    return hashlib.sha1(b"blob %d\0" % len(raw) + raw).hexdigest()
+
+# ═══════════════════════════════════════════════════════════
+# STORAGE BACKEND
+# ═══════════════════════════════════════════════════════════
+class StorageBackend:
+    """
+    Interface penyimpanan lokal yang dipakai Database
+
+    Record key/pending selalu berbentuk dict dengan field yang sama seperti
+    layout JSON lama ({"keys", "users", "pending"}), apapun backend-nya.
+    """
+    def exists(self) -> bool:
+        """Cek apakah sudah ada data lokal"""
+        raise NotImplementedError
+    
+    def open(self):
+        """Baca data lokal yang sudah ada"""
+        raise NotImplementedError
+    
+    def unsynced_shards(self) -> set:
+        """Shard yang mungkin belum ter-backup ke GitHub saat startup"""
+        return set()
+    
+    def replace(self, data: dict):
+        """Ganti seluruh isi store dengan layout JSON"""
+        raise NotImplementedError
+    
+    def dump(self) -> dict:
+        """Export seluruh isi store ke layout JSON"""
+        raise NotImplementedError
+    
+    def shard_keys(self, shard: int) -> dict:
+        """Semua key di satu shard GitHub"""
+        raise NotImplementedError
+    
+    def iter_keys(self):
+        """Generator (key, record) semua key, memory konstan (untuk export)"""
+        raise NotImplementedError
+    
+    def dump_pending(self) -> dict:
+        """Isi shard pending: {"pending": ..., "users": ...}"""
+        raise NotImplementedError
+    
+    def put_key(self, key: str, record: dict):
+        raise NotImplementedError
+    
+    def put_keys(self, items: list):
+        """Simpan banyak (key, record) sekaligus, atomic kalau backend mendukung"""
+        for key, record in items:
+            self.put_key(key, record)
+    
+    def get_key(self, key: str):
+        raise NotImplementedError
+    
+    def might_contain(self, key: str) -> bool:
+        """False = key pasti tidak ada (cek murah sebelum get_key)"""
+        return True
+    
+    def delete_key(self, key: str) -> bool:
+        raise NotImplementedError
+    
+    def keys_for_user(self, user_id: int, offset: int = 0, limit: int = None) -> list:
+        """List (key, record) milik user, urut waktu dibuat"""
+        raise NotImplementedError
+    
+    def count_user_keys(self, user_id: int) -> int:
+        raise NotImplementedError
+    
+    def key_holders(self, now: float, until: float = None):
+        """Generator (user_id, expires_at terakhir) user dengan key active, lihat KeyTable"""
+        raise NotImplementedError
+    
+    def key_for_hwid(self, hwid: str):
+        """Key terikat HWID ini yang expire paling akhir, None kalau tidak ada"""
+        raise NotImplementedError
+    
+    def count_keys(self, now: float) -> tuple:
+        """Return (total, active) — full scan/query, dipakai untuk recount"""
+        raise NotImplementedError
+    
+    def active_expiries(self, now: float) -> list:
+        """expires_at dari semua key yang masih active"""
+        raise NotImplementedError
+    
+    def put_pending(self, user_id: str, record: dict):
+        raise NotImplementedError
+    
+    def get_pending(self, user_id: str):
+        raise NotImplementedError
+    
+    def delete_pending(self, user_id: str) -> bool:
+        raise NotImplementedError
+    
+    def pending_by_token(self, token: str):
+        """user_id pending dengan token ini, None kalau tidak ada"""
+        raise NotImplementedError
+    
+    def count_pending(self) -> int:
+        raise NotImplementedError
+    
+    def expired_keys(self, before: float, limit: int) -> list:
+        """Maksimal `limit` key dengan expires_at <= before, paling lama dulu"""
+        raise NotImplementedError
+    
+    def expired_pending(self, before: float, limit: int) -> list:
+        """Maksimal `limit` user_id pending dengan expires_at <= before"""
+        raise NotImplementedError
+    
+    def begin_compact(self, force: bool = False):
+        """
+        Maintenance berkala (snapshot/checkpoint)
+        
+        Return fungsi tanpa argumen untuk bagian berat yang aman dijalankan di
+        thread lain (None kalau tidak ada), setelah itu panggil end_compact().
+        """
+        return None
+    
+    def end_compact(self):
+        pass
+    
+    def close(self, synced: bool = True):
+        """Tutup store; synced=False kalau masih ada yang belum ter-backup"""
+        pass
+
+class JournalBackend(StorageBackend):
+    """KeyTable kolumnar di memory + journal append-only dan snapshot di disk"""
+    
+    def __init__(self, directory: str):
+        self.journal = Journal(directory, fsync=JOURNAL_FSYNC)
+        self.data = self._from_layout(empty_store())
+        # Min-heap (expires_at, user_id) pending untuk sweeper; entry basi dibuang saat di-pop
+        self._pending_expiry = []
+        self._pending_tokens = {}  # token -> user_id, untuk callback Work.ink
+        self._unsynced = set()
+        self._compact_mark = None  # Posisi log saat snapshot yang sedang ditulis diambil
+    
+    @staticmethod
+    def _new_table(keys: dict = None) -> KeyTable:
+        return KeyTable.from_dict(keys or {}, partition=shard_of, partitions=GITHUB_SHARDS)
+    
+    def _from_layout(self, data: dict) -> dict:
+        """Layout JSON / snapshot -> struktur di memory"""
+        if "key_columns" in data:
+            keys = KeyTable.from_columns(data["key_columns"], partition=shard_of,
+                                         partitions=GITHUB_SHARDS)
+        else:
+            keys = self._new_table(data.get("keys"))
+        return {"keys": keys, "users": data.get("users", {}), "pending": data.get("pending", {})}
+    
+    def _snapshot(self) -> dict:
+        # Key disimpan per kolom: jauh lebih cepat di-dump/load daripada dict per key
+        return {
+            "key_columns": self.data["keys"].to_columns(),
+            "users": self.data["users"],
+            "pending": self.data["pending"]
+        }
+    
+    def exists(self) -> bool:
+        return self.journal.exists()
+    
+    def open(self):
+        data, ops = self.journal.load()
+        self.data = self._from_layout(data or empty_store())
+        for op, *args in ops:
+            self._apply(op, args)
+            # Journal hanya di-compact setelah backup sukses, jadi isinya = yang belum ter-backup
+            if op == "add_keys":
+                self._unsynced.update(shard_of(key) for key, _ in args[0])
+            else:
+                self._unsynced.add(PENDING_SHARD if op.endswith("_pending") else shard_of(args[0]))
+        self._build_indexes()
+    
+    def unsynced_shards(self) -> set:
+        return self._unsynced
+    
+    def replace(self, data: dict):
+        self.data = self._from_layout(data)
+        self.journal.compact(self._snapshot())
+        self._build_indexes()
+    
+    def _build_indexes(self):
+        self._pending_expiry = [(v["expires_at"], u) for u, v in self.data["pending"].items()]
+        heapq.heapify(self._pending_expiry)
+        self._pending_tokens = {v["token"]: u for u, v in self.data["pending"].items()}
+    
+    def dump(self) -> dict:
+        return {
+            "keys": self.data["keys"].to_dict(),
+            "users": self.data["users"],
+            "pending": self.data["pending"]
+        }
+    
+    def shard_keys(self, shard: int) -> dict:
+        return self.data["keys"].partition_items(shard)
+    
+    def iter_keys(self):
+        return self.data["keys"].iter_rows()
+    
+    def dump_pending(self) -> dict:
+        return {"pending": self.data["pending"], "users": self.data["users"]}
+    
+    def _commit(self, op: str, *args):
+        """Tulis operasi ke journal dulu, baru terapkan ke memory"""
+        self.journal.append(op, *args)
+        self._apply(op, args)
+    
+    def _apply(self, op: str, args):
+        if op == "add_key":
+            key, record = args
+            self.data["keys"][key] = record
+        elif op == "add_keys":
+            keys = self.data["keys"]
+            for key, record in args[0]:
+                keys[key] = record
+        elif op == "remove_key":
+            self.data["keys"].pop(args[0], None)
+        elif op == "add_pending":
+            user_id, record = args
+            old = self.data["pending"].get(user_id)
+            if old is not None:
+                self._pending_tokens.pop(old["token"], None)
+            self.data["pending"][user_id] = record
+            self._pending_tokens[record["token"]] = user_id
+            heapq.heappush(self._pending_expiry, (record["expires_at"], user_id))
+        elif op == "remove_pending":
+            old = self.data["pending"].pop(args[0], None)
+            if old is not None:
+                self._pending_tokens.pop(old["token"], None)
+        else:
+            print(f"Journal: operasi tidak dikenal {op}")
+    
+    def put_key(self, key: str, record: dict):
+        self._commit("add_key", key, record)
+    
+    def put_keys(self, items: list):
+        # 1 baris journal = 1 fsync, dan batch ter-replay utuh atau tidak sama sekali
+        self._commit("add_keys", items)
+    
+    def get_key(self, key: str):
+        return self.data["keys"].get(key)
+    
+    def might_contain(self, key: str) -> bool:
+        # Index KeyTable sudah membership yang pasti, tidak perlu Bloom filter
+        return key in self.data["keys"]
+    
+    def delete_key(self, key: str) -> bool:
+        if key not in self.data["keys"]:
+            return False
+        self._commit("remove_key", key)
+        return True
+    
+    def keys_for_user(self, user_id: int, offset: int = 0, limit: int = None) -> list:
+        keys = self.data["keys"]
+        return [(key, keys[key]) for key in keys.keys_for_user(user_id, offset, limit)]
+    
+    def count_user_keys(self, user_id: int) -> int:
+        return self.data["keys"].count_user(user_id)
+    
+    def key_holders(self, now: float, until: float = None):
+        return self.data["keys"].key_holders(now, until)
+    
+    def key_for_hwid(self, hwid: str):
+        return self.data["keys"].key_for_hwid(hwid)
+    
+    def count_keys(self, now: float) -> tuple:
+        keys = self.data["keys"]
+        return len(keys), keys.count_active(now)
+    
+    def active_expiries(self, now: float) -> list:
+        return self.data["keys"].active_expiries(now)
+    
+    def put_pending(self, user_id: str, record: dict):
+        self._commit("add_pending", user_id, record)
+    
+    def get_pending(self, user_id: str):
+        return self.data["pending"].get(user_id)
+    
+    def delete_pending(self, user_id: str) -> bool:
+        if user_id not in self.data["pending"]:
+            return False
+        self._commit("remove_pending", user_id)
+        return True
+    
+    def pending_by_token(self, token: str):
+        return self._pending_tokens.get(token)
+    
+    def count_pending(self) -> int:
+        return len(self.data["pending"])
+    
+    @staticmethod
+    def _pop_expired(heap: list, table: dict, before: float, limit: int) -> list:
+        result = []
+        while heap and heap[0][0] <= before and len(result) < limit:
+            expires_at, item = heapq.heappop(heap)
+            record = table.get(item)
+            # Entry basi: sudah dihapus atau diganti record baru
+            if record is not None and record["expires_at"] == expires_at:
+                result.append(item)
+        return result
+    
+    def expired_keys(self, before: float, limit: int) -> list:
+        return self.data["keys"].expired(before, limit)
+    
+    def expired_pending(self, before: float, limit: int) -> list:
+        return self._pop_expired(self._pending_expiry, self.data["pending"], before, limit)
+    
+    def begin_compact(self, force: bool = False):
+        if not self.journal.ops:
+            return None
+        # Ambang ikut ukuran store supaya biaya snapshot tetap O(1) per operasi
+        threshold = max(JOURNAL_COMPACT_EVERY, len(self.data["keys"]) // 10)
+        if not force and self.journal.ops < threshold:
+            return None
+        # Di sini cuma salin (murah); pack kolom, json.dump dan fsync di thread lain
+        columns = self.data["keys"].copy_columns()
+        users, pending = dict(self.data["users"]), dict(self.data["pending"])
+        self._compact_mark = self.journal.mark()
+        
+        def write():
+            self.journal.write_snapshot({
+                "key_columns": KeyTable.pack_columns(columns),
+                "users": users,
+                "pending": pending
+            })
+        return write
+    
+    def end_compact(self):
+        # Operasi yang masuk selama snapshot ditulis tetap di log
+        self.journal.truncate(self._compact_mark)
+    
+    def close(self, synced: bool = True):
+        self.journal.close()
+
+class SQLiteBackend(StorageBackend):
+    """SQLite (WAL) dengan index di user_id, expires_at dan token pending"""
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS keys (
+            key        TEXT PRIMARY KEY,
+            user_id    INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            is_admin   INTEGER NOT NULL DEFAULT 0,
+            used       INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_keys_user_created ON keys(user_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_keys_expires_at ON keys(expires_at);
+        
+        CREATE TABLE IF NOT EXISTS pending (
+            user_id    TEXT PRIMARY KEY,
+            token      TEXT NOT NULL,
+            link       TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_pending_token ON pending(token);
+        CREATE INDEX IF NOT EXISTS idx_pending_expires_at ON pending(expires_at);
+        
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            data    TEXT NOT NULL
+        );
+        
+        CREATE TABLE IF NOT EXISTS meta (
+            name  TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+    
+    # Kolom yang ditambahkan setelah schema awal: (tabel, nama, definisi, index)
+    MIGRATIONS = [
+        ("keys", "shard", "INTEGER NOT NULL DEFAULT 0", "CREATE INDEX idx_keys_shard ON keys(shard)"),
+        ("keys", "hwid", "TEXT", "CREATE INDEX idx_keys_hwid ON keys(hwid)"),
+        ("pending", "hwid", "TEXT", None),
+    ]
+    KEY_COLUMNS = "key, user_id, created_at, expires_at, is_admin, used, hwid, shard"
+    KEY_FIELDS = "user_id, created_at, expires_at, is_admin, used, hwid"  # Urutan _key_record
+    PENDING_COLUMNS = "user_id, token, link, created_at, expires_at, hwid"
+    
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._existed = os.path.exists(path)
+        # isolation_level=None: autocommit, transaksi besar pakai BEGIN manual.
+        # check_same_thread=False: replace() saat download pertama jalan di thread
+        # store Database (sebelum siap tidak ada yang memakai koneksi ini)
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self._migrate_schema()
+        self._unsynced = set()
+        self.bloom = None
+    
+    def _migrate_schema(self):
+        for table, name, definition, index in self.MIGRATIONS:
+            columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            if name not in columns:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+                if index:
+                    self.conn.execute(index)
+                if (table, name) == ("keys", "shard"):
+                    self.conn.create_function("shard_of", 1, shard_of)
+                    self.conn.execute("UPDATE keys SET shard = shard_of(key)")
+    
+    def exists(self) -> bool:
+        return self._existed
+    
+    def open(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'synced'").fetchone()
+        if row is None or row[0] != "1":
+            # Crash/shutdown sebelum backup selesai: tidak tahu shard mana, upload semua
+            self._unsynced = set(range(GITHUB_SHARDS)) | {PENDING_SHARD}
+        self._set_synced(False)
+        self._build_bloom()
+    
+    def _build_bloom(self):
+        """Bloom filter semua key, supaya probe key acak tidak perlu query SQLite"""
+        total = self.conn.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+        bloom = BloomFilter(total * 2, BLOOM_ERROR_RATE)
+        for (key,) in self.conn.execute("SELECT key FROM keys"):
+            bloom.add(key)
+        self.bloom = bloom
+    
+    def unsynced_shards(self) -> set:
+        return self._unsynced
+    
+    def _set_synced(self, synced: bool):
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('synced', ?)",
+                          ("1" if synced else "0",))
+    
+    @staticmethod
+    def _key_row(key: str, record: dict) -> tuple:
+        return (key, record["user_id"], record["created_at"], record["expires_at"],
+                int(record.get("is_admin", False)), int(record.get("used", False)),
+                record.get("hwid"), shard_of(key))
+    
+    @staticmethod
+    def _key_record(row) -> dict:
+        record = {
+            "user_id": row[0],
+            "created_at": row[1],
+            "expires_at": row[2],
+            "is_admin": bool(row[3]),
+            "used": bool(row[4])
+        }
+        # Sama dengan KeyTable: field hwid hanya ada kalau terikat
+        if row[5] is not None:
+            record["hwid"] = row[5]
+        return record
+    
+    @staticmethod
+    def _pending_row(user_id: str, record: dict) -> tuple:
+        return (user_id, record["token"], record["link"],
+                record["created_at"], record["expires_at"], record.get("hwid"))
+    
+    @staticmethod
+    def _pending_record(row) -> dict:
+        record = {"token": row[0], "link": row[1], "created_at": row[2], "expires_at": row[3]}
+        if row[4] is not None:
+            record["hwid"] = row[4]
+        return record
+    
+    def replace(self, data: dict):
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.execute("DELETE FROM keys")
+            self.conn.execute("DELETE FROM pending")
+            self.conn.execute("DELETE FROM users")
+            self.conn.executemany(
+                f"INSERT INTO keys ({self.KEY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key_row(k, v) for k, v in data.get("keys", {}).items()))
+            self.conn.executemany(
+                f"INSERT INTO pending ({self.PENDING_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                (self._pending_row(u, v) for u, v in data.get("pending", {}).items()))
+            self.conn.executemany(
+                "INSERT INTO users VALUES (?, ?)",
+                ((u, json.dumps(v)) for u, v in data.get("users", {}).items()))
+            self._set_synced(False)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self._build_bloom()
+    
+    def dump(self) -> dict:
+        data = {"keys": {}, **self.dump_pending()}
+        for row in self.conn.execute(f"SELECT key, {self.KEY_FIELDS} FROM keys"):
+            data["keys"][row[0]] = self._key_record(row[1:])
+        return data
+    
+    def dump_pending(self) -> dict:
+        data = {"pending": {}, "users": {}}
+        for row in self.conn.execute(f"SELECT {self.PENDING_COLUMNS} FROM pending"):
+            data["pending"][row[0]] = self._pending_record(row[1:])
+        for user_id, raw in self.conn.execute("SELECT user_id, data FROM users"):
+            data["users"][user_id] = json.loads(raw)
+        return data
+    
+    def shard_keys(self, shard: int) -> dict:
+        rows = self.conn.execute(
+            f"SELECT key, {self.KEY_FIELDS} FROM keys WHERE shard = ?", (shard,))
+        return {row[0]: self._key_record(row[1:]) for row in rows}
+    
+    def iter_keys(self, page: int = 1000):
+        # Keyset pagination per primary key: tidak ada cursor terbuka di sela halaman
+        after = ""
+        while True:
+            rows = self.conn.execute(
+                f"SELECT key, {self.KEY_FIELDS} FROM keys WHERE key > ? ORDER BY key LIMIT ?",
+                (after, page)).fetchall()
+            for row in rows:
+                yield row[0], self._key_record(row[1:])
+            if len(rows) < page:
+                return
+            after = rows[-1][0]
+    
+    def put_key(self, key: str, record: dict):
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO keys ({self.KEY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            self._key_row(key, record))
+        self._bloom_add([key])
+    
+    def put_keys(self, items: list):
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO keys ({self.KEY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key_row(key, record) for key, record in items))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self._bloom_add(key for key, _ in items)
+    
+    def _bloom_add(self, keys):
+        if self.bloom is None:
+            return
+        for key in keys:
+            self.bloom.add(key)
+        if self.bloom.full:
+            self._build_bloom()
+    
+    def might_contain(self, key: str) -> bool:
+        return self.bloom is None or key in self.bloom
+    
+    def get_key(self, key: str):
+        row = self.conn.execute(
+            f"SELECT {self.KEY_FIELDS} FROM keys WHERE key = ?", (key,)).fetchone()
+        return self._key_record(row) if row else None
+    
+    def delete_key(self, key: str) -> bool:
+        cursor = self.conn.execute("DELETE FROM keys WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+    
+    def keys_for_user(self, user_id: int, offset: int = 0, limit: int = None) -> list:
+        rows = self.conn.execute(
+            f"SELECT key, {self.KEY_FIELDS} "
+            "FROM keys WHERE user_id = ? ORDER BY created_at LIMIT ? OFFSET ?",
+            (user_id, -1 if limit is None else limit, offset))
+        return [(row[0], self._key_record(row[1:])) for row in rows]
+    
+    def count_user_keys(self, user_id: int) -> int:
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM keys WHERE user_id = ?", (user_id,)).fetchone()[0]
+    
+    def key_holders(self, now: float, until: float = None, page: int = 1000):
+        # Per halaman urut user_id (index idx_keys_user_created), tanpa cursor
+        # yang terbuka lama selama broadcast
+        after = -1  # user_id Discord selalu positif
+        while True:
+            rows = self.conn.execute(
+                "SELECT user_id, MAX(expires_at) FROM keys WHERE user_id > ? "
+                "GROUP BY user_id HAVING MAX(expires_at) > ? AND MAX(expires_at) <= ? "
+                "ORDER BY user_id LIMIT ?",
+                (after, now, float("inf") if until is None else until, page)).fetchall()
+            yield from rows
+            if len(rows) < page:
+                return
+            after = rows[-1][0]
+    
+    def key_for_hwid(self, hwid: str):
+        row = self.conn.execute(
+            "SELECT key FROM keys WHERE hwid = ? ORDER BY expires_at DESC LIMIT 1",
+            (hwid,)).fetchone()
+        return None if row is None else row[0]
+    
+    def count_keys(self, now: float) -> tuple:
+        total = self.conn.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+        active = self.conn.execute(
+            "SELECT COUNT(*) FROM keys WHERE expires_at > ?", (now,)).fetchone()[0]
+        return total, active
+    
+    def active_expiries(self, now: float) -> list:
+        rows = self.conn.execute("SELECT expires_at FROM keys WHERE expires_at > ?", (now,))
+        return [row[0] for row in rows]
+    
+    def put_pending(self, user_id: str, record: dict):
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO pending ({self.PENDING_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+            self._pending_row(user_id, record))
+    
+    def get_pending(self, user_id: str):
+        row = self.conn.execute(
+            "SELECT token, link, created_at, expires_at, hwid FROM pending WHERE user_id = ?",
+            (user_id,)).fetchone()
+        return None if row is None else self._pending_record(row)
+    
+    def delete_pending(self, user_id: str) -> bool:
+        cursor = self.conn.execute("DELETE FROM pending WHERE user_id = ?", (user_id,))
+        return cursor.rowcount > 0
+    
+    def pending_by_token(self, token: str):
+        row = self.conn.execute(
+            "SELECT user_id FROM pending WHERE token = ?", (token,)).fetchone()
+        return None if row is None else row[0]
+    
+    def count_pending(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+    
+    def expired_keys(self, before: float, limit: int) -> list:
+        rows = self.conn.execute(
+            "SELECT key FROM keys WHERE expires_at <= ? ORDER BY expires_at LIMIT ?",
+            (before, limit))
+        return [row[0] for row in rows]
+    
+    def expired_pending(self, before: float, limit: int) -> list:
+        rows = self.conn.execute(
+            "SELECT user_id FROM pending WHERE expires_at <= ? ORDER BY expires_at LIMIT ?",
+            (before, limit))
+        return [row[0] for row in rows]
+    
+    def begin_compact(self, force: bool = False):
+        if force:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return None
+    
+    def close(self, synced: bool = True):
+        self._set_synced(synced)
+        self.conn.close()
+
+def open_backend(kind: str, data_dir: str) -> StorageBackend:
+    """Buat backend sesuai STORAGE_BACKEND di config"""
+    if kind == "sqlite":
+        return SQLiteBackend(os.path.join(data_dir, "keys.db"))
+    if kind == "journal":
+        return JournalBackend(data_dir)
+    raise ValueError(f"STORAGE_BACKEND tidak dikenal: {kind}")
+
+def read_store(json_path: str) -> dict:
+    """Baca keys.json atau snapshot lokal ke layout JSON {"keys","users","pending"}"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if "key_columns" in data:
+        data["keys"] = KeyTable.from_columns(data.pop("key_columns")).to_dict()
+    return data
+
+def migrate_json_to_sqlite(json_path: str, sqlite_path: str) -> dict:
+    """Migrasi sekali jalan dari layout JSON lama ke SQLite"""
+    data = read_store(json_path)
+    
+    backend = SQLiteBackend(sqlite_path)
+    try:
+        backend.replace(data)
+        total, _ = backend.count_keys(time.time())
+        return {"keys": total, "pending": backend.count_pending()}
+    finally:
+        backend.close()
+
+def iter_json_sections(f, sections: set, chunk_size: int = 1 << 16):
+    """
+    Generator (section, nama, value) untuk setiap member object `sections`
+    di level teratas file JSON, dibaca per potongan `chunk_size`
+
+    Memory = buffer + 1 member, bukan seluruh file. Value level atas lain
+    (mis. "stats") di-decode utuh lalu dibuang.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    
+    def more() -> bool:
+        nonlocal buf, pos, eof
+        chunk = "" if eof else f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buf, pos = buf[pos:] + chunk, 0
+        return True
+    
+    def peek() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not more():
+                raise ValueError("JSON terpotong")
+    
+    def expect(char: str):
+        nonlocal pos
+        if peek() != char:
+            raise ValueError(f"JSON tidak valid: '{char}' diharapkan, dapat '{buf[pos]}'")
+        pos += 1
+    
+    def value():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                result, end = decoder.raw_decode(buf, pos)
+                # Angka di ujung buffer bisa saja masih berlanjut di potongan berikutnya
+                if end < len(buf) or eof:
+                    pos = end
+                    return result
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            more()
+    
+    expect("{")
+    while peek() != "}":
+        section = value()
+        expect(":")
+        if section in sections and peek() == "{":
+            pos += 1
+            while peek() != "}":
+                name = value()
+                expect(":")
+                yield section, name, value()
+                if peek() == ",":
+                    pos += 1
+            pos += 1
+        else:
+            value()
+        if peek() == ",":
+            pos += 1
+
+def parse_iso(value: str) -> float:
+    """Waktu ISO 8601 dari Node (Date.toISOString, akhiran Z) -> epoch detik"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+def import_node_json(json_path: str, backend: StorageBackend) -> dict:
+    """
+    Import database.json bot Node (index.js) ke store lokal dalam 1 put_keys
+
+    Node menyimpan 1 key per user: keys[user_id] = {key, hwid, validatedAt,
+    expiresAt, isAdmin}. Key tanpa hwid memakai users[user_id].hwid. Key yang
+    sudah ada di store tidak ditimpa.
+    """
+    items = {}
+    hwids = {}  # user_id -> hwid dari section users
+    skipped = 0
+    with open(json_path, "r", encoding="utf-8") as f:
+        for section, user_id, data in iter_json_sections(f, {"users", "keys"}):
+            if section == "users":
+                if data.get("hwid"):
+                    hwids[user_id] = data["hwid"]
+                continue
+            
+            key = data.get("key")
+            if not key or not data.get("expiresAt") or not user_id.isdigit():
+                skipped += 1
+                continue
+            if backend.might_contain(key) and backend.get_key(key) is not None:
+                skipped += 1
+                continue
+            expires_at = parse_iso(data["expiresAt"])
+            validated = data.get("validatedAt")
+            record = {
+                "user_id": int(user_id),
+                "created_at": parse_iso(validated) if validated else expires_at - KEY_DURATION,
+                "expires_at": expires_at,
+                "is_admin": bool(data.get("isAdmin", False)),
+                "used": False
+            }
+            if data.get("hwid"):
+                record["hwid"] = data["hwid"]
+            items[key] = record
+    
+    # Section users bisa saja ada setelah keys di file
+    for record in items.values():
+        hwid = hwids.get(str(record["user_id"]))
+        if "hwid" not in record and hwid:
+            record["hwid"] = hwid
+    
+    if items:
+        backend.put_keys(list(items.items()))
+    now = time.time()
+    return {
+        "keys": len(items),
+        "active": sum(1 for record in items.values() if record["expires_at"] > now),
+        "hwid": sum(1 for record in items.values() if "hwid" in record),
+        "skipped": skipped
+    }
+
+# ═══════════════════════════════════════════════════════════
+# EXPORT / IMPORT JSONL
+# ═══════════════════════════════════════════════════════════
+# 1 baris = 1 record, format sama dengan archive.jsonl:
+#   {"type": "key", "key": ..., "user_id": ..., "created_at": ..., ...}
+#   {"type": "pending", "user_id": ..., "token": ..., ...}
+def open_jsonl(path: str, mode: str, fileobj=None):
+    """Buka JSONL teks ("r"/"w"), gzip kalau nama berakhiran .gz; `fileobj`: file biner yang sudah terbuka"""
+    if path.endswith(".gz"):
+        return gzip.open(fileobj or path, mode + "t", encoding="utf-8")
+    if fileobj is not None:
+        return io.TextIOWrapper(fileobj, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def batched(iterable, size: int):
+    """Generator list berisi maksimal `size` item"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def store_records(backend: StorageBackend):
+    """Generator semua record store dalam format JSONL: key dulu, lalu pending"""
+    for key, record in backend.iter_keys():
+        yield {"type": "key", "key": key, **record}
+    for user_id, record in list(backend.dump_pending()["pending"].items()):
+        yield {"type": "pending", "user_id": user_id, **record}
+
+def export_batches(backend: StorageBackend, f, batch: int = EXPORT_BATCH):
+    """Tulis store ke `f` per batch; tiap langkah generator = 1 batch, yield {type: jumlah}"""
+    for records in batched(store_records(backend), batch):
+        f.write("".join(json.dumps(record) + "\n" for record in records))
+        counts = {"key": 0, "pending": 0}
+        for record in records:
+            counts[record["type"]] += 1
+        yield counts
+
+def parse_record(data) -> tuple:
+    """Record JSONL -> (type, key / user_id, record store), None kalau tidak valid"""
+    try:
+        if data["type"] == "key":
+            record = {
+                "user_id": int(data["user_id"]),
+                "created_at": float(data["created_at"]),
+                "expires_at": float(data["expires_at"]),
+                "is_admin": bool(data.get("is_admin", False)),
+                "used": bool(data.get("used", False))
+            }
+            name = str(data["key"])
+        elif data["type"] == "pending":
+            record = {
+                "token": str(data["token"]),
+                "link": str(data["link"]),
+                "created_at": float(data["created_at"]),
+                "expires_at": float(data["expires_at"])
+            }
+            name = str(data["user_id"])
+        else:
+            return None
+    except (KeyError, TypeError, ValueError):
+        return None
+    if data.get("hwid"):
+        record["hwid"] = str(data["hwid"])
+    return data["type"], name, record
+
+def import_batches(f, batch: int = EXPORT_BATCH):
+    """
+    Baca JSONL dari `f` per batch: yield (items key, items pending, jumlah dilewati)
+
+    Baris yang bukan JSON menghentikan import (ValueError dengan nomor baris);
+    record yang field-nya tidak lengkap cuma dilewati.
+    """
+    def records():
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield parse_record(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Baris {number} bukan JSON: {e}") from None
+    
+    for parsed in batched(records(), batch):
+        keys, pending, skipped = {}, [], 0
+        for item in parsed:
+            if item is None:
+                skipped += 1
+            elif item[0] == "key":
+                # Key dobel di 1 batch cukup 1 record (yang terakhir)
+                keys[item[1]] = item[2]
+            else:
+                pending.append(item[1:])
+        yield list(keys.items()), pending, skipped
+
+def export_jsonl(backend: StorageBackend, path: str) -> dict:
+    """Export store ke file JSONL (.gz = gzip), memory konstan"""
+    total = {"key": 0, "pending": 0}
+    with open_jsonl(path, "w") as f:
+        for counts in export_batches(backend, f):
+            total["key"] += counts["key"]
+            total["pending"] += counts["pending"]
+    return total
+
+def import_jsonl(backend: StorageBackend, path: str) -> dict:
+    """Import file JSONL ke backend, 1 put_keys per batch (key yang sama ditimpa)"""
+    total = {"key": 0, "pending": 0, "skipped": 0}
+    with open_jsonl(path, "r") as f:
+        for keys, pending, skipped in import_batches(f):
+            if keys:
+                backend.put_keys(keys)
+            for user_id, record in pending:
+                backend.put_pending(user_id, record)
+            total["key"] += len(keys)
+            total["pending"] += len(pending)
+            total["skipped"] += skipped
+    return total
+
+# ═══════════════════════════════════════════════════════════
+# COUNTERS
+# ═══════════════════════════════════════════════════════════
+class StoreCounters:
+    """
+    Counter total/active/pending yang di-update setiap mutasi
+
+    Key active → expired tidak punya event, jadi expires_at key active
+    disimpan di min-heap dan dikurangi saat snapshot() melewati waktunya.
+    Biaya snapshot sebanding dengan jumlah key yang baru expired.
+    """
+    
     def __init__(self):
-        self.github_api = "https://api.github.com"
+        self.total_keys = 0
+        self.active_keys = 0
+        self.pending = 0
+        self._active_expiry = []
+        # expires_at key active yang sudah dihapus (entry heap-nya diabaikan)
+        self._removed_active = {}
+    
+    def rebuild(self, backend: StorageBackend, now: float):
+        """Hitung ulang dari nol (saat startup / setelah replace)"""
+        # Hitung dulu baru dipasang sekaligus: boleh jalan di thread lain
+        heap = backend.active_expiries(now)
+        heapq.heapify(heap)
+        total, _ = backend.count_keys(now)
+        pending = backend.count_pending()
+        self._active_expiry, self._removed_active = heap, {}
+        self.total_keys, self.active_keys, self.pending = total, len(heap), pending
+    
+    def key_added(self, expires_at: float, now: float):
+        self.total_keys += 1
+        if expires_at > now:
+            self.active_keys += 1
+            heapq.heappush(self._active_expiry, expires_at)
+    
+    def key_removed(self, expires_at: float, now: float):
+        self.total_keys -= 1
+        if expires_at > now:
+            self.active_keys -= 1
+            self._removed_active[expires_at] = self._removed_active.get(expires_at, 0) + 1
+    
+    def snapshot(self, now: float) -> dict:
+        heap = self._active_expiry
+        while heap and heap[0] <= now:
+            expires_at = heapq.heappop(heap)
+            removed = self._removed_active.get(expires_at)
+            if removed:
+                # Sudah dikurangi waktu key-nya dihapus
+                if removed == 1:
+                    del self._removed_active[expires_at]
+                else:
+                    self._removed_active[expires_at] = removed - 1
+            else:
+                self.active_keys -= 1
+        
+        return {
+            "total_keys": self.total_keys,
+            "active_keys": self.active_keys,
+            "expired_keys": self.total_keys - self.active_keys,
+            "pending_users": self.pending
+        }
+
+class Database:
+    def __init__(self, github_api: str = "https://api.github.com", data_dir: str = DATA_DIR,
+                 backend: str = STORAGE_BACKEND):
+        self.github_api = github_api
         self.headers = {
             "Authorization": f"token {GITHUB_TOKEN}",
             "Accept": "application/vnd.github.v3+json"
         }
-        self.file_path = "keys.json"
-        self.data = self.load()
+        # Layout lama: 1 file berisi seluruh store (hanya dibaca untuk migrasi)
+        self.legacy_path = "keys.json"
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.hooks["response"].append(self._record_response)
+        # Cuma 1 worker: PUT ke GitHub harus berurutan karena butuh sha terakhir
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="github")
+        # Kerja berat store lokal (download pertama, snapshot) di luar event loop,
+        # tanpa antre di belakang request GitHub
+        self.store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store")
+        # Write-behind: jumlah mutasi & shard yang belum tersimpan ke GitHub
+        self.dirty = 0
+        self.dirty_shards = set()
+        # Key / pending yang diubah instance ini sejak sync terakhir (untuk merge)
+        self.dirty_keys = set()
+        self.dirty_pending = set()
+        self._save_lock = asyncio.Lock()
+        # LRU hasil validate_key: key -> (berlaku sampai, hasil)
+        self._validate_cache = OrderedDict()
+        self._wakeup = None
+        self._flusher = None
+        self._refresher = None
+        self._closing = False
+        # Di-set begitu store lokal berisi data (snapshot lokal, atau download pertama)
+        self._ready = asyncio.Event()
+        # (sha HEAD, ETag) response ref terakhir, untuk conditional GET
+        self._ref_etag = None
+        self.data_dir = data_dir
+        self.backend = open_backend(backend, data_dir)
+        # Commit GitHub terakhir yang sudah digabung ke store lokal
+        self.remote_path = os.path.join(data_dir, "remote.json")
+        self.remote = self._load_remote()
+        self._path_shard = {self.shard_path(s): s for s in range(GITHUB_SHARDS)}
+        self._path_shard[self.shard_path(PENDING_SHARD)] = PENDING_SHARD
+        self.counters = StoreCounters()
+        self.open()
+    
+    def open(self):
+        """Buka store lokal tanpa network; kalau belum ada, refresh() yang download dari GitHub"""
+        if not self.backend.exists():
+            # Pertama kali jalan: belum siap sampai download pertama selesai
+            return
+        self.backend.open()
+        # Operasi lokal belum tentu sudah ter-backup ke GitHub
+        if GITHUB_BACKUP:
+            self.dirty_shards = set(self.backend.unsynced_shards())
+            self.dirty = len(self.dirty_shards)
+        self.counters.rebuild(self.backend, time.time())
+        self._ready.set()
+    
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+    
+    async def wait_ready(self, timeout: float = None) -> bool:
+        """Tunggu store siap, return False kalau lewat timeout"""
+        if self._ready.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+    
+    # ═══════════════════════════════════════
+    # GITHUB (backup per shard)
+    # ═══════════════════════════════════════
+    def shard_path(self, shard: int) -> str:
+        if shard == PENDING_SHARD:
+            return f"{GITHUB_DIR}/pending.json"
+        return f"{GITHUB_DIR}/shard-{shard:02x}.json"
+    
+    def _url(self, path: str) -> str:
+        return f"{self.github_api}/repos/{GITHUB_REPO}/contents/{path}"
+    
+    def _git_url(self, path: str) -> str:
+        return f"{self.github_api}/repos/{GITHUB_REPO}/git/{path}"
+    
+    def _get_json(self, path: str):
+        """Download 1 file JSON dari GitHub, None kalau belum ada"""
+        response = self.session.get(self._url(path), timeout=GITHUB_TIMEOUT)
+        if response.status_code != 200:
+            return None
+        return json.loads(base64.b64decode(response.json()["content"]))
+    
+    def _record_response(self, response, *args, **kwargs):
+        """Hook requests: hitung setiap response GitHub untuk /metrics"""
+        request = response.request
+        path = request.path_url.split("?", 1)[0]
+        if "/git/" in path:
+            endpoint = "git/" + path.split("/git/", 1)[1].split("/", 1)[0]
+        elif "/contents/" in path:
+            endpoint = "contents"
+        else:
+            endpoint = "other"
+        metrics.GITHUB_REQUESTS.inc(request.method, endpoint, str(response.status_code))
+        metrics.GITHUB_SECONDS.observe(response.elapsed.total_seconds(), endpoint)
+        if request.body:
+            metrics.GITHUB_PAYLOAD_BYTES.observe(len(request.body), "upload")
+        metrics.GITHUB_PAYLOAD_BYTES.observe(len(response.content), "download")
     
     def load(self) -> dict:
-        """Load database dari GitHub"""
+        """Load database dari GitHub (semua shard, atau keys.json lama)"""
+        start = time.perf_counter()
+        result = "error"
         try:
-            url = f"{self.github_api}/repos/{GITHUB_REPO}/contents/{self.file_path}"
-            response = requests.get(url, headers=self.headers)
+            data = empty_store()
+            head, tree, blobs, contents, _ = self._fetch_remote({})
+            for path, content in contents.items():
+                if path == self.shard_path(PENDING_SHARD):
+                    data["pending"].update(content.get("pending", {}))
+                    data["users"].update(content.get("users", {}))
+                else:
+                    data["keys"].update(content)
+            self._set_remote(head, tree, blobs)
+            result = "ok"
+            if blobs:
+                return data
             
-            if response.status_code == 200:
-                content = response.json()
-                decoded = base64.b64decode(content["content"]).decode()
-                self.sha = content["sha"]
-                return json.loads(decoded)
-            else:
-                # File belum ada, buat baru
-                self.sha = None
-                return {"keys": {}, "users": {}, "pending": {}}
+            legacy = self._get_json(self.legacy_path)
+            if legacy is not None:
+                # Migrasi dari keys.json: semua shard perlu di-upload
+                self.dirty_shards = set(range(GITHUB_SHARDS)) | {PENDING_SHARD}
+                self.dirty = len(self.dirty_shards)
+                return legacy
+            
+            # File belum ada, buat baru
+            return empty_store()
         except Exception as e:
             print(f"Load error: {e}")
-            self.sha = None
-            return {"keys": {}, "users": {}, "pending": {}}
+            return empty_store()
+        finally:
+            metrics.GITHUB_SYNC_SECONDS.observe(time.perf_counter() - start, "load")
+            metrics.GITHUB_SYNC.inc("load", result)
+    
+    def shard_content(self, shard: int) -> dict:
+        """Salinan isi 1 shard, aman dibaca thread lain selagi store berubah"""
+        if shard == PENDING_SHARD:
+            content = self.backend.dump_pending()
+            return {"pending": dict(content["pending"]), "users": dict(content["users"])}
+        return self.backend.shard_keys(shard)
     
-    def save(self):
-        """Simpan database ke GitHub"""
+    async def copy_shards(self, paths) -> dict:
+        """{path: shard_content()}, event loop jalan lagi di sela tiap shard"""
+        contents = {}
+        for path in paths:
+            contents[path] = self.shard_content(self._path_shard[path])
+            await asyncio.sleep(0)
+        return contents
+    
+    @staticmethod
+    def encode_files(contents: dict) -> dict:
+        """Serialisasi tiap file ke JSON compact (dijalankan di executor)"""
+        return {path: json.dumps(content, separators=(",", ":"))
+                for path, content in contents.items()}
+    
+    def _load_remote(self) -> dict:
         try:
-            url = f"{self.github_api}/repos/{GITHUB_REPO}/contents/{self.file_path}"
-            
-            content = base64.b64encode(json.dumps(self.data, indent=2).encode()).decode()
-            
-            payload = {
-                "message": f"Update keys database - {time.strftime('%Y-%m-%d %H:%M:%S')}",
-                "content": content,
-                "branch": GITHUB_BRANCH
-            }
-            
-            if self.sha:
-                payload["sha"] = self.sha
-            
-            response = requests.put(url, headers=self.headers, json=payload)
-            
-            if response.status_code in [200, 201]:
-                self.sha = response.json()["content"]["sha"]
-                return True
+            with open(self.remote_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Belum pernah sync: sync pertama membandingkan semua shard
+            return {"head": None, "tree": None, "blobs": {}}
+    
+    def _set_remote(self, head: str, tree: str, blobs: dict):
+        """Catat commit GitHub yang sudah digabung (disimpan supaya restart tidak fetch ulang)"""
+        self.remote = {"head": head, "tree": tree, "blobs": blobs}
+        tmp_path = self.remote_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.remote, f, separators=(",", ":"))
+        os.replace(tmp_path, self.remote_path)
+    
+    def _get_blob(self, sha: str):
+        """Download & decode 1 blob JSON (blob tidak pernah berubah, cukup sha-nya)"""
+        response = self.session.get(self._git_url(f"blobs/{sha}"), timeout=GITHUB_TIMEOUT)
+        response.raise_for_status()
+        return json.loads(base64.b64decode(response.json()["content"]))
+    
+    def _fetch_remote(self, known: dict):
+        """
+        Baca HEAD branch di GitHub
+        
+        Return (sha commit, sha tree, {path: sha blob}, {path: isi}, {path: isi base}).
+        Isi hanya di-download untuk file yang sha-nya beda dari `known`, jadi
+        kalau HEAD tidak berubah cukup 1 request. Base = isi file itu di `known`
+        (versi yang terakhir digabung ke store lokal), untuk three-way merge.
+        """
+        headers = {}
+        if self._ref_etag and self._ref_etag[0] == known.get("head"):
+            # 304 tidak memotong rate limit GitHub
+            headers["If-None-Match"] = self._ref_etag[1]
+        response = self.session.get(self._git_url(f"ref/heads/{GITHUB_BRANCH}"),
+                                    headers=headers, timeout=GITHUB_TIMEOUT)
+        if response.status_code == 304:
+            return known["head"], known["tree"], known["blobs"], {}, {}
+        if response.status_code == 404:
+            return None, None, {}, {}, {}
+        response.raise_for_status()
+        head = response.json()["object"]["sha"]
+        etag = response.headers.get("ETag")
+        self._ref_etag = (head, etag) if etag else None
+        if head == known.get("head"):
+            return head, known["tree"], known["blobs"], {}, {}
+        
+        response = self.session.get(self._git_url(f"commits/{head}"), timeout=GITHUB_TIMEOUT)
+        response.raise_for_status()
+        tree = response.json()["tree"]["sha"]
+        response = self.session.get(self._git_url(f"trees/{tree}"), params={"recursive": "1"},
+                                    timeout=GITHUB_TIMEOUT)
+        response.raise_for_status()
+        blobs = {entry["path"]: entry["sha"] for entry in response.json()["tree"]
+                 if entry["type"] == "blob" and entry["path"] in self._path_shard}
+        
+        contents, bases = {}, {}
+        old_blobs = known.get("blobs", {})
+        for path, sha in blobs.items():
+            if old_blobs.get(path) == sha:
+                continue
+            contents[path] = self._get_blob(sha)
+            if path in old_blobs:
+                bases[path] = self._get_blob(old_blobs[path])
+        return head, tree, blobs, contents, bases
+    
+    def _commit_files(self, files: dict, head: str, tree: str, blobs: dict) -> bool:
+        """
+        Commit semua file sekaligus di atas `head` (1 commit, Git Data API)
+        
+        Return False kalau ref sudah dipindah instance lain (bukan fast-forward),
+        error lain di-raise.
+        """
+        payload = {"tree": [
+            {"path": path, "mode": "100644", "type": "blob", "content": content}
+            for path, content in files.items()
+        ]}
+        if tree:
+            payload["base_tree"] = tree
+        response = self.session.post(self._git_url("trees"), json=payload, timeout=GITHUB_TIMEOUT)
+        response.raise_for_status()
+        new_tree = response.json()["sha"]
+        
+        response = self.session.post(self._git_url("commits"), json={
+            "message": f"Update keys database - {time.strftime('%Y-%m-%d %H:%M:%S')}",
+            "tree": new_tree,
+            "parents": [head] if head else []
+        }, timeout=GITHUB_TIMEOUT)
+        response.raise_for_status()
+        commit_sha = response.json()["sha"]
+        
+        if head:
+            response = self.session.patch(self._git_url(f"refs/heads/{GITHUB_BRANCH}"),
+                                          json={"sha": commit_sha}, timeout=GITHUB_TIMEOUT)
+        else:
+            response = self.session.post(self._git_url("refs"), json={
+                "ref": f"refs/heads/{GITHUB_BRANCH}",
+                "sha": commit_sha
+            }, timeout=GITHUB_TIMEOUT)
+        
+        if response.status_code in [409, 422]:
+            return False
+        response.raise_for_status()
+        blobs = {**blobs, **{path: blob_sha(content) for path, content in files.items()}}
+        self._set_remote(commit_sha, new_tree, blobs)
+        return True
+    
+    # ═══════════════════════════════════════
+    # MERGE (beberapa instance, 1 repo GitHub)
+    # ═══════════════════════════════════════
+    @staticmethod
+    def _merge_map(base: dict, remote: dict, local: dict, changed: set) -> dict:
+        """
+        Three-way merge 1 map terhadap `base` (versi remote yang terakhir digabung)
+        
+        Yang kita ubah sendiri (`changed`) menang. Selain itu, sisi yang masih
+        sama dengan base dianggap tidak berubah dan sisi lain yang dipakai;
+        kalau keduanya berubah, remote menang. Penghapusan (tidak ada di map)
+        juga perubahan, jadi record yang dihapus instance lain tidak muncul lagi.
+        """
+        merged = {}
+        for name in base.keys() | remote.keys() | local.keys():
+            if name in changed or remote.get(name) == base.get(name):
+                record = local.get(name)
+            else:
+                record = remote.get(name)
+            if record is not None:
+                merged[name] = record
+        return merged
+    
+    def _merge_files(self, contents: dict, bases: dict, local: dict, changed: dict) -> dict:
+        """
+        Three-way merge per file (dijalankan di executor, cuma membaca salinan)
+        
+        Return {path: (record yang harus di-put, nama yang harus dihapus, harus upload)}.
+        """
+        diffs = {}
+        for path, remote in contents.items():
+            base, mine = bases.get(path, {}), local[path]
+            upload = False
+            if self._path_shard[path] == PENDING_SHARD:
+                upload = mine["users"] != remote.get("users", {})
+                base, remote, mine = base.get("pending", {}), remote.get("pending", {}), mine["pending"]
+            merged = self._merge_map(base, remote, mine, changed.get(path, ()))
+            puts = [(name, record) for name, record in merged.items() if mine.get(name) != record]
+            deletes = [name for name in mine if name not in merged]
+            diffs[path] = (puts, deletes, upload or merged != remote)
+        return diffs
+    
+    async def _merge_remote(self, contents: dict, bases: dict, keys: set, pending: set) -> set:
+        """
+        Gabungkan file remote yang berubah ke store lokal, return shard yang harus di-upload
+        
+        Shard lokal disalin di event loop, merge dihitung di executor, hasilnya
+        diterapkan di sini. Record yang berubah selama merge dihitung tidak
+        disentuh: perubahan lokal menang.
+        """
+        local = await self.copy_shards(contents)
+        changed = {self.shard_path(PENDING_SHARD): pending | self.dirty_pending}
+        for key in keys | self.dirty_keys:
+            changed.setdefault(self.shard_path(shard_of(key)), set()).add(key)
+        loop = asyncio.get_running_loop()
+        diffs = await loop.run_in_executor(self.executor, self._merge_files,
+                                           contents, bases, local, changed)
+        
+        upload = set()
+        for path, (puts, deletes, differs) in diffs.items():
+            shard = self._path_shard[path]
+            if differs:
+                upload.add(shard)
+            if shard == PENDING_SHARD:
+                for user_id in deletes:
+                    if user_id not in self.dirty_pending:
+                        self._delete_pending(user_id, track=False)
+                for user_id, record in puts:
+                    if user_id not in self.dirty_pending:
+                        self._put_pending(user_id, record, track=False)
             else:
-                print(f"Save error: {response.text}")
+                for key in deletes:
+                    if key not in self.dirty_keys:
+                        self._delete_key(key, track=False)
+                puts = [(key, record) for key, record in puts if key not in self.dirty_keys]
+                if puts:
+                    self._put_keys(puts, track=False)
+        return upload
+    
+    # ═══════════════════════════════════════
+    # ASYNC (dipanggil dari command Discord)
+    # ═══════════════════════════════════════
+    async def refresh(self) -> bool:
+        """
+        Ambil perubahan dari GitHub di background
+        
+        Startup pertama (belum ada data lokal): download semua, lalu store
+        siap. Setelah itu cukup conditional GET ke HEAD; shard yang berubah
+        digabung seperti saat save (perubahan lokal yang belum ter-upload menang).
+        """
+        loop = asyncio.get_running_loop()
+        if not self.ready:
+            # Bangun tabel/index + tulis snapshot di thread store: heartbeat tetap jalan.
+            # Hasil download sengaja tidak disimpan di variabel supaya referensi
+            # terakhirnya (jutaan dict) juga dibebaskan di thread itu
+            await loop.run_in_executor(self.store_executor, self._install,
+                                       await loop.run_in_executor(self.executor, self.load))
+            self._validate_cache.clear()
+            self._ready.set()
+            return True
+        if not GITHUB_BACKUP:
+            return True
+        
+        async with self._save_lock:
+            try:
+                head, tree, blobs, contents, bases = await loop.run_in_executor(
+                    self.executor, self._fetch_remote, self.remote)
+            except Exception as e:
+                print(f"Refresh error: {e}")
                 return False
+            if not contents:
+                return True
+            upload = await self._merge_remote(contents, bases, set(), set())
+            await loop.run_in_executor(self.executor, self._set_remote, head, tree, blobs)
+            if upload:
+                # Data lokal yang belum ada di remote ikut di-upload flush berikutnya
+                self.dirty_shards |= upload
+                self.mark_dirty()
+        return True
+    
+    def _install(self, data: dict):
+        """Isi store lokal dengan hasil download pertama (dijalankan di store_executor)"""
+        self.backend.replace(data)
+        self.counters.rebuild(self.backend, time.time())
+    
+    def start_refresh(self):
+        """refresh() sekarang lalu tiap REFRESH_INTERVAL detik (panggil dari dalam event loop)"""
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+    
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Refresh error: {e}")
+            if not REFRESH_INTERVAL:
+                return
+            await asyncio.sleep(REFRESH_INTERVAL)
+    
+    async def save_async(self) -> bool:
+        """Upload shard yang berubah tanpa memblokir event loop"""
+        async with self._save_lock:
+            return await self._sync()
+    
+    async def _sync(self) -> bool:
+        shards, self.dirty_shards = self.dirty_shards, set()
+        if not shards:
+            return True
+        keys, self.dirty_keys = self.dirty_keys, set()
+        pending, self.dirty_pending = self.dirty_pending, set()
+        
+        loop = asyncio.get_running_loop()
+        ok = False
+        start = time.perf_counter()
+        try:
+            for attempt in range(SAVE_RETRIES):
+                head, tree, blobs, contents, bases = await loop.run_in_executor(
+                    self.executor, self._fetch_remote, self.remote)
+                if contents:
+                    # Instance lain sudah commit: gabung dulu. Mutasi yang masuk
+                    # selama fetch juga termasuk perubahan lokal.
+                    shards |= await self._merge_remote(contents, bases, keys, pending)
+                    # Commit ini sudah digabung: jadi base kalau percobaan berikutnya bentrok lagi
+                    await loop.run_in_executor(self.executor, self._set_remote, head, tree, blobs)
+                
+                # Salin di event loop supaya data tidak berubah saat dibaca thread lain,
+                # encode JSON-nya di executor
+                rows = await self.copy_shards(self.shard_path(shard) for shard in shards)
+                files = await loop.run_in_executor(self.executor, self.encode_files, rows)
+                if await loop.run_in_executor(self.executor, self._commit_files,
+                                              files, head, tree, blobs):
+                    ok = True
+                    break
+                
+                delay = SAVE_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+                print(f"Save conflict, coba lagi dalam {delay:.2f}s")
+                await asyncio.sleep(delay)
         except Exception as e:
             print(f"Save exception: {e}")
+        metrics.GITHUB_SYNC_SECONDS.observe(time.perf_counter() - start, "save")
+        metrics.GITHUB_SYNC.inc("save", "ok" if ok else "error")
+        
+        if not ok:
+            # Dicoba lagi di flush berikutnya
+            self.dirty_shards |= shards
+            self.dirty_keys |= keys
+            self.dirty_pending |= pending
+        return ok
+    
+    # ═══════════════════════════════════════
+    # WRITE-BEHIND FLUSHER
+    # ═══════════════════════════════════════
+    def start_flusher(self):
+        """Jalankan background flusher (panggil dari dalam event loop)"""
+        if self._flusher is None:
+            self._closing = False
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+    
+    async def close(self):
+        """Hentikan flusher, lalu flush terakhir sebelum shutdown"""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+        if self._flusher is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._flusher
+            self._flusher = None
+        if not self.ready and not self.dirty_shards:
+            # Download pertama belum selesai: jangan simpan store kosong sebagai data lokal
+            return
+        await self.flush()
+        await self._maybe_compact(force=True)
+        self.backend.close(synced=not self.dirty_shards)
+    
+    def mark_dirty(self):
+        """Tandai ada perubahan yang belum disimpan"""
+        self.dirty += 1
+        if self._wakeup is not None and self.dirty >= SAVE_MAX_CHANGES:
+            self._wakeup.set()
+    
+    async def flush(self) -> bool:
+        """Simpan ke GitHub kalau ada perubahan"""
+        # dirty_shards juga: save langsung (tanpa write-behind) yang gagal cuma mengembalikan shard
+        if not self.dirty and not self.dirty_shards:
+            return True
+        
+        pending = self.dirty
+        self.dirty = 0
+        ok = await self.save_async()
+        if not ok:
+            # Gagal: biarkan dirty supaya dicoba lagi di flush berikutnya
+            self.dirty += pending
+        return ok
+    
+    async def _flush_loop(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=SAVE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            await self._maybe_compact()
+    
+    async def _persist(self):
+        """Backup ke GitHub: langsung, atau serahkan ke flusher (write-behind)"""
+        if not GITHUB_BACKUP:
+            return
+        if WRITE_BEHIND and self._flusher is not None:
+            self.mark_dirty()
+        else:
+            await self.save_async()
+    
+    async def _maybe_compact(self, force: bool = False):
+        # Jangan buang journal sebelum isinya ter-backup ke GitHub (termasuk save yang sedang jalan)
+        if GITHUB_BACKUP and (self.dirty or self.dirty_shards or self._save_lock.locked()):
+            return
+        write = self.backend.begin_compact(force)
+        if write is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.store_executor, write)
+        except Exception as e:
+            # Journal lama tetap utuh, dicoba lagi di compact berikutnya
+            print(f"Compact error: {e}")
+            return
+        self.backend.end_compact()
+    
+    # ═══════════════════════════════════════
+    # WRITE PATH (backend + counters)
+    # ═══════════════════════════════════════
+    def _put_key(self, key: str, record: dict, track: bool = True):
+        # track=False: record dari GitHub (hasil merge), tidak perlu di-upload balik
+        if track:
+            self.dirty_shards.add(shard_of(key))
+            self.dirty_keys.add(key)
+        self._validate_cache.pop(key, None)
+        now = time.time()
+        old = self.backend.get_key(key)
+        if old is not None:
+            self.counters.key_removed(old["expires_at"], now)
+        self.backend.put_key(key, record)
+        self.counters.key_added(record["expires_at"], now)
+    
+    def _put_keys(self, items: list, track: bool = True):
+        """Seperti _put_key untuk banyak (key, record): 1 transaksi di backend"""
+        # Key dobel di 1 batch: yang terakhir menang (sama dengan put_keys), dihitung sekali
+        items = list(dict(items).items())
+        now = time.time()
+        for key, record in items:
+            old = self.backend.get_key(key)
+            if old is not None:
+                self.counters.key_removed(old["expires_at"], now)
+            self.counters.key_added(record["expires_at"], now)
+            if track:
+                self.dirty_shards.add(shard_of(key))
+                self.dirty_keys.add(key)
+            self._validate_cache.pop(key, None)
+        self.backend.put_keys(items)
+    
+    def _delete_key(self, key: str, track: bool = True):
+        record = self.backend.get_key(key)
+        if record is not None:
+            if track:
+                self.dirty_shards.add(shard_of(key))
+                self.dirty_keys.add(key)
+            self._validate_cache.pop(key, None)
+            self.backend.delete_key(key)
+            self.counters.key_removed(record["expires_at"], time.time())
+    
+    def _put_pending(self, user_id: str, record: dict, track: bool = True):
+        if track:
+            self.dirty_shards.add(PENDING_SHARD)
+            self.dirty_pending.add(user_id)
+        if self.backend.get_pending(user_id) is None:
+            self.counters.pending += 1
+        self.backend.put_pending(user_id, record)
+    
+    def _delete_pending(self, user_id: str, track: bool = True) -> bool:
+        if not self.backend.delete_pending(user_id):
             return False
+        if track:
+            self.dirty_shards.add(PENDING_SHARD)
+            self.dirty_pending.add(user_id)
+        self.counters.pending -= 1
+        return True
     
     # ═══════════════════════════════════════
     # KEY OPERATIONS
     # ═══════════════════════════════════════
-    def add_key(self, key: str, user_id: int, is_admin: bool = False):
-        """Tambah key baru"""
-        self.data["keys"][key] = {
+    async def add_key(self, key: str, user_id: int, is_admin: bool = False, hwid: str = None):
+        """Tambah key baru, terikat ke `hwid` kalau diisi"""
+        record = {
             "user_id": user_id,
             "created_at": time.time(),
             "expires_at": time.time() + KEY_DURATION,
             "is_admin": is_admin,
             "used": False
         }
-        self.save()
+        if hwid:
+            record["hwid"] = hwid
+        self._put_key(key, record)
+        await self._persist()
     
-    def validate_key(self, key: str) -> dict:
-        """Validasi key"""
-        if key not in self.data["keys"]:
-            return {"valid": False, "reason": "Key tidak ditemukan"}
+    async def add_keys(self, keys: list, user_id: int, is_admin: bool = False):
+        """
+        Tambah banyak key sekaligus: 1 transaksi lokal per GENKEY_BATCH key, 1 commit GitHub
         
-        key_data = self.data["keys"][key]
+        Event loop jalan di sela batch, jadi heartbeat & command lain tidak
+        menunggu seluruh !genkey. Crash di tengah cuma menyisakan batch yang
+        sudah tersimpan (key yang belum pernah dikirim ke siapapun).
+        """
+        now = time.time()
+        for start in range(0, len(keys), GENKEY_BATCH):
+            self._put_keys([(key, {
+                "user_id": user_id,
+                "created_at": now,
+                "expires_at": now + KEY_DURATION,
+                "is_admin": is_admin,
+                "used": False
+            }) for key in keys[start:start + GENKEY_BATCH]])
+            await asyncio.sleep(0)
         
-        if time.time() > key_data["expires_at"]:
-            return {"valid": False, "reason": "Key sudah expired"}
+        # Satu !genkey = satu perubahan untuk write-behind
+        await self._persist()
+    
+    def key_exists(self, key: str) -> bool:
+        """Cek cepat untuk generator key (boleh false positive)"""
+        return self.backend.might_contain(key)
+    
+    def validate_key(self, key: str, hwid: str = None) -> dict:
+        """
+        Validasi key (hasil dipakai bersama, jangan diubah)
         
-        remaining = key_data["expires_at"] - time.time()
-        hours = int(remaining // 3600)
-        minutes = int((remaining % 3600) // 60)
+        Kalau `hwid` diisi dan key terikat ke HWID lain, hasilnya tidak valid.
+        Key yang tidak terikat HWID valid untuk HWID apapun.
+        """
+        cached = self._validate_cache.get(key)
+        if cached is None and not self.backend.might_contain(key):
+            # Probe key acak berhenti di sini, sebelum jam / tuple cache
+            return KEY_NOT_FOUND
         
-        return {
-            "valid": True,
-            "remaining": f"{hours}h {minutes}m",
-            "user_id": key_data["user_id"]
-        }
+        now = time.time()
+        if cached is not None and now < cached[0]:
+            self._validate_cache.move_to_end(key)
+            _, result, bound = cached
+        else:
+            result, bound = self._validate_uncached(key, now)
+        
+        if hwid and bound and hwid != bound and result["valid"]:
+            return KEY_HWID_MISMATCH
+        return result
+    
+    def _validate_uncached(self, key: str, now: float) -> tuple:
+        """Return (hasil, hwid terikat) dari store, lalu simpan di cache"""
+        key_data = self.backend.get_key(key)
+        if key_data is None:
+            result, refresh_at = KEY_NOT_FOUND, float("inf")
+        elif now > key_data["expires_at"]:
+            result, refresh_at = KEY_EXPIRED, float("inf")
+        else:
+            remaining = key_data["expires_at"] - now
+            hours = int(remaining // 3600)
+            minutes = int((remaining % 3600) // 60)
+            result = {
+                "valid": True,
+                "remaining": f"{hours}h {minutes}m",
+                "expires_at": key_data["expires_at"],
+                "user_id": key_data["user_id"]
+            }
+            # Teks "remaining" baru berubah saat menitnya berganti
+            refresh_at = now + remaining % 60
+        
+        bound = key_data.get("hwid") if key_data is not None else None
+        # Entry di-invalidate oleh _put_key/_delete_key
+        self._validate_cache[key] = (refresh_at, result, bound)
+        if len(self._validate_cache) > VALIDATE_CACHE_SIZE:
+            self._validate_cache.popitem(last=False)
+        return result, bound
+    
+    def get_user_keys(self, user_id: int, offset: int = 0, limit: int = None) -> list:
+        """Ambil key milik user (urut waktu dibuat), bisa per halaman"""
+        return [{"key": key, **data}
+                for key, data in self.backend.keys_for_user(user_id, offset, limit)]
     
-    def get_user_keys(self, user_id: int) -> list:
-        """Ambil semua key milik user"""
-        user_keys = []
-        for key, data in self.data["keys"].items():
-            if data["user_id"] == user_id:
-                user_keys.append({"key": key, **data})
-        return user_keys
+    def count_user_keys(self, user_id: int) -> int:
+        """Jumlah key milik user (termasuk yang expired tapi belum disapu)"""
+        return self.backend.count_user_keys(user_id)
+    
+    def key_for_hwid(self, hwid: str):
+        """Key terikat HWID ini yang expire paling akhir (lookup index), None kalau tidak ada"""
+        return self.backend.key_for_hwid(hwid)
+    
+    def key_holders(self, within: float = None):
+        """
+        Generator (user_id, expires_at) pemilik key active, untuk broadcast
+        
+        `within` (detik): hanya user yang semua key-nya expire dalam waktu ini.
+        """
+        now = time.time()
+        return self.backend.key_holders(now, None if within is None else now + within)
     
     # ═══════════════════════════════════════
     # PENDING VERIFICATION
     # ═══════════════════════════════════════
-    def add_pending(self, user_id: int, token: str, link: str):
-        """Tambah user ke pending verification"""
-        self.data["pending"][str(user_id)] = {
+    async def add_pending(self, user_id: int, token: str, link: str, hwid: str = None):
+        """Tambah user ke pending verification (`hwid`: diikat ke key setelah verifikasi)"""
+        record = {
             "token": token,
             "link": link,
             "created_at": time.time(),
             "expires_at": time.time() + 600  # 10 menit
         }
-        self.save()
+        if hwid:
+            record["hwid"] = hwid
+        self._put_pending(str(user_id), record)
+        await self._persist()
     
     def get_pending(self, user_id: int) -> dict:
         """Ambil data pending user"""
-        return self.data["pending"].get(str(user_id))
+        return self.backend.get_pending(str(user_id))
     
-    def remove_pending(self, user_id: int):
-        """Hapus pending setelah verifikasi"""
-        if str(user_id) in self.data["pending"]:
-            del self.data["pending"][str(user_id)]
-            self.save()
+    def find_pending_token(self, token: str):
+        """user_id (int) pemilik token pending, None kalau sudah diproses / tidak dikenal"""
+        user_id = self.backend.pending_by_token(token)
+        return None if user_id is None else int(user_id)
+    
+    async def remove_pending(self, user_id: int) -> bool:
+        """Hapus pending setelah verifikasi, False kalau memang tidak ada"""
+        if not self._delete_pending(str(user_id)):
+            return False
+        await self._persist()
+        return True
+    
+    # ═══════════════════════════════════════
+    # EXPIRY SWEEP
+    # ═══════════════════════════════════════
+    async def sweep(self, batch: int = SWEEP_BATCH) -> int:
+        """Hapus (atau arsipkan) maksimal `batch` key dan pending yang expired"""
+        now = time.time()
+        # Key expired disimpan dulu selama KEY_RETENTION supaya !cekkey masih bisa bilang "expired"
+        keys = self.backend.expired_keys(now - KEY_RETENTION, batch)
+        pending = self.backend.expired_pending(now, batch)
+        if not keys and not pending:
+            return 0
+        
+        if SWEEP_ARCHIVE:
+            self._archive(keys, pending)
+        for key in keys:
+            self._delete_key(key)
+        for user_id in pending:
+            self._delete_pending(user_id)
+        
+        # Satu batch = satu perubahan untuk write-behind
+        await self._persist()
+        return max(len(keys), len(pending))
+    
+    def _archive(self, keys: list, pending: list):
+        path = os.path.join(self.data_dir, "archive.jsonl")
+        with open(path, "a", encoding="utf-8") as f:
+            for key in keys:
+                record = self.backend.get_key(key)
+                f.write(json.dumps({"type": "key", "key": key, **record}) + "\n")
+            for user_id in pending:
+                record = self.backend.get_pending(user_id)
+                f.write(json.dumps({"type": "pending", "user_id": user_id, **record}) + "\n")
+    
+    # ═══════════════════════════════════════
+    # EXPORT / IMPORT JSONL
+    # ═══════════════════════════════════════
+    async def export_jsonl(self, path: str) -> dict:
+        """Export store ke file JSONL (.gz = gzip) per batch, event loop tetap jalan di sela batch"""
+        total = {"key": 0, "pending": 0}
+        with open_jsonl(path, "w") as f:
+            for counts in export_batches(self.backend, f):
+                total["key"] += counts["key"]
+                total["pending"] += counts["pending"]
+                await asyncio.sleep(0)
+        return total
+    
+    async def import_jsonl(self, f) -> dict:
+        """
+        Import JSONL dari file teks `f` (lihat open_jsonl)
+        
+        Tiap batch = 1 transaksi backend + 1 perubahan write-behind. Key yang
+        sudah ada ditimpa record dari file.
+        """
+        total = {"key": 0, "pending": 0, "skipped": 0}
+        for keys, pending, skipped in import_batches(f):
+            if keys:
+                self._put_keys(keys)
+            for user_id, record in pending:
+                self._put_pending(user_id, record)
+            total["key"] += len(keys)
+            total["pending"] += len(pending)
+            total["skipped"] += skipped
+            if keys or pending:
+                await self._persist()
+            await asyncio.sleep(0)
+        return total
     
     # ═══════════════════════════════════════
     # STATISTICS
     # ═══════════════════════════════════════
     def get_stats(self) -> dict:
-        """Statistik keseluruhan"""
-        total_keys = len(self.data["keys"])
-        active_keys = sum(1 for k, v in self.data["keys"].items() 
-                        if time.time() < v["expires_at"])
-        expired_keys = total_keys - active_keys
+        """Statistik keseluruhan (O(1), dari counter)"""
+        return self.counters.snapshot(time.time())
+    
+    def recount_stats(self) -> dict:
+        """Statistik dari full scan, untuk cek konsistensi counter"""
+        total_keys, active_keys = self.backend.count_keys(time.time())
         
         return {
             "total_keys": total_keys,
             "active_keys": active_keys,
-            "expired_keys": expired_keys,
-            "pending_users": len(self.data["pending"])
+            "expired_keys": total_keys - active_keys,
+            "pending_users": self.backend.count_pending()
         }
@@ -0,0 +1,212 @@
+import asyncio
+import io
+import itertools
+import time
+import discord
+from config import *
+from ratelimit import RateLimiter
+import metrics
+
+# Batas 1 pesan Discord
+MAX_CONTENT = 2000
+MAX_EMBEDS = 10
+MAX_FILES = 10
+
+class _Bundle:
+    """Pesan-pesan ke 1 user yang dikirim sebagai 1 pesan Discord"""
+
+    __slots__ = ("contents", "embeds", "files", "futures")
+
+    def __init__(self):
+        self.contents = []
+        self.embeds = []
+        self.files = []    # (nama file, bytes / path): discord.File dibuat ulang tiap percobaan
+        self.futures = []
+
+    def fits(self, content: str, embed, file) -> bool:
+        length = sum(len(c) + 1 for c in self.contents) + len(content or "")
+        return (length <= MAX_CONTENT
+                and len(self.embeds) + (embed is not None) <= MAX_EMBEDS
+                and len(self.files) + (file is not None) <= MAX_FILES)
+
+    def add(self, content: str, embed, file, future):
+        if content:
+            self.contents.append(content)
+        if embed is not None:
+            self.embeds.append(embed)
+        if file is not None:
+            self.files.append(file)
+        self.futures.append(future)
+
+    def kwargs(self) -> dict:
+        kwargs = {}
+        if self.contents:
+            kwargs["content"] = "\n".join(self.contents)
+        if self.embeds:
+            kwargs["embeds"] = self.embeds
+        if self.files:
+            kwargs["files"] = [discord.File(io.BytesIO(data) if isinstance(data, bytes) else data,
+                                           filename=name)
+                               for name, data in self.files]
+        return kwargs
+
+    def resolve(self, delivered: bool):
+        for future in self.futures:
+            if not future.done():
+                future.set_result(delivered)
+
+class Dispatcher:
+    """
+    Antrian DM keluar, dikirim worker dengan jumlah terbatas
+
+    - Maksimal DM_CONCURRENCY DM dikirim bersamaan, dan semuanya berbagi
+      token bucket DM_RATE/detik (di bawah limit global Discord).
+    - 429 menahan route-nya selama Retry-After: DM ke user itu saja, atau
+      semua DM kalau limitnya global. Lalu dicoba lagi, maksimal DM_RETRIES kali.
+    - Pesan ke user yang sama yang belum diambil worker digabung jadi 1
+      pesan (isi disambung, embed & file digabung sampai batas Discord).
+    - DM broadcast (`bulk=True`) jalur kedua: worker mengambil DM interaktif
+      dulu, dan broadcast melepas token rate limit selama ada DM interaktif
+      yang menunggu. Hanya broadcast yang dibatasi DM_QUEUE_SIZE (otomatis
+      menunggu worker), DM dari command tidak pernah antre di belakangnya.
+    """
+
+    GLOBAL = None  # Route untuk limit global
+
+    def __init__(self, resolve, clock=time.monotonic):
+        self.resolve = resolve  # async user_id -> object dengan .send() (discord.User)
+        self.clock = clock
+        self.limiter = RateLimiter(DM_RATE, DM_BURST, clock)
+        # (bulk, urutan, user_id, bundle): False < True, jadi DM interaktif diambil dulu
+        self._queue = asyncio.PriorityQueue()
+        self._order = itertools.count()
+        self._bulk_slots = asyncio.Semaphore(DM_QUEUE_SIZE)
+        self._bundles = {}  # (user_id, bulk) -> bundle yang masih di antrian (bisa ditambah)
+        self._blocked = {}  # route -> waktu (clock) sampai route boleh dipakai lagi
+        self._urgent = 0    # DM interaktif yang sedang menunggu token rate limit
+        self._workers = []
+
+    def start(self):
+        """Jalankan worker (panggil dari dalam event loop)"""
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(DM_CONCURRENCY)]
+
+    async def close(self):
+        """Hentikan worker; DM yang belum terkirim dianggap gagal"""
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        while not self._queue.empty():
+            bulk, _, _, bundle = self._queue.get_nowait()
+            if bulk:
+                self._bulk_slots.release()
+            self._queue.task_done()
+            bundle.resolve(False)
+        self._bundles.clear()
+
+    async def drain(self):
+        """Tunggu sampai semua DM di antrian selesai diproses"""
+        await self._queue.join()
+
+    # ═══════════════════════════════════════
+    # API
+    # ═══════════════════════════════════════
+    async def enqueue(self, user_id: int, content: str = None, *, embed=None, file: tuple = None,
+                      bulk: bool = False):
+        """
+        Masukkan DM ke antrian, return future -> True kalau terkirim
+
+        `file`: (nama file, isi bytes atau path). `bulk`: DM broadcast, dikirim
+        setelah DM interaktif dan menunggu kalau antrian broadcast penuh.
+        """
+        future = asyncio.get_running_loop().create_future()
+        bundle = self._bundles.get((user_id, bulk))
+        if bundle is not None and bundle.fits(content, embed, file):
+            bundle.add(content, embed, file, future)
+            metrics.DM_MESSAGES.inc("coalesced")
+            return future
+
+        bundle = _Bundle()
+        bundle.add(content, embed, file, future)
+        # Didaftarkan sebelum put: pesan lain selama menunggu antrian ikut digabung
+        self._bundles[(user_id, bulk)] = bundle
+        if bulk:
+            await self._bulk_slots.acquire()
+        self._queue.put_nowait((bulk, next(self._order), user_id, bundle))
+        return future
+
+    async def send(self, user_id: int, content: str = None, *, embed=None, file: tuple = None) -> bool:
+        """Seperti enqueue, tapi tunggu hasilnya (False: DM tertutup / gagal)"""
+        return await (await self.enqueue(user_id, content, embed=embed, file=file))
+
+    # ═══════════════════════════════════════
+    # WORKER
+    # ═══════════════════════════════════════
+    async def _worker(self):
+        while True:
+            bulk, _, user_id, bundle = await self._queue.get()
+            if bulk:
+                self._bulk_slots.release()
+            if self._bundles.get((user_id, bulk)) is bundle:
+                del self._bundles[(user_id, bulk)]
+            try:
+                delivered = await self._deliver(user_id, bundle, bulk)
+            except asyncio.CancelledError:
+                # close() saat DM ini sedang dikirim
+                bundle.resolve(False)
+                self._queue.task_done()
+                raise
+            except Exception as e:
+                print(f"DM error ({user_id}): {e}")
+                delivered = False
+            bundle.resolve(delivered)
+            metrics.DM_MESSAGES.inc("sent" if delivered else "failed")
+            self._queue.task_done()
+
+    async def _deliver(self, user_id: int, bundle: _Bundle, bulk: bool) -> bool:
+        for attempt in range(DM_RETRIES + 1):
+            await self._wait_turn(user_id, bulk)
+            try:
+                target = await self.resolve(user_id)
+                await target.send(**bundle.kwargs())
+                return True
+            except discord.RateLimited as e:
+                # discord.py menyerah menunggu (max_ratelimit_timeout)
+                self._block(user_id, e.retry_after, False)
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    # 403: DM tertutup / bot diblokir, percuma dicoba lagi
+                    return False
+                headers = getattr(e.response, "headers", {})
+                self._block(user_id, float(headers.get("Retry-After", 1)),
+                            headers.get("X-RateLimit-Global") == "true")
+        return False
+
+    def _block(self, route, retry_after: float, is_global: bool):
+        metrics.DM_MESSAGES.inc("rate_limited")
+        route = self.GLOBAL if is_global else route
+        until = self.clock() + retry_after
+        self._blocked[route] = max(self._blocked.get(route, 0.0), until)
+
+    async def _wait_turn(self, route, bulk: bool = False):
+        while True:
+            now = self.clock()
+            blocked = max(self._blocked.get(route, 0.0), self._blocked.get(self.GLOBAL, 0.0))
+            if blocked > now:
+                await asyncio.sleep(blocked - now)
+                continue
+            self._blocked.pop(route, None)
+            if bulk and self._urgent:
+                # Broadcast mengalah: token berikutnya untuk DM interaktif yang menunggu
+                await asyncio.sleep(1 / self.limiter.rate)
+                continue
+            wait = self.limiter.acquire()
+            if not wait:
+                return
+            if not bulk:
+                self._urgent += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                if not bulk:
+                    self._urgent -= 1
@@ -0,0 +1,117 @@
+import json
+import os
+
+class Journal:
+    """
+    Penyimpanan lokal: snapshot JSON + log operasi append-only
+
+    Setiap mutasi ditulis sebagai 1 baris JSON `[op, arg1, arg2, ...]` lalu
+    di-fsync. Saat startup snapshot dibaca dan log di-replay di atasnya.
+    compact() menulis snapshot baru (atomic rename) lalu mengosongkan log.
+    Versi bertahap: mark() -> write_snapshot() (boleh di thread lain, log
+    tetap bisa ditambah) -> truncate(mark) yang menyisakan operasi baru.
+    """
+
+    def __init__(self, directory: str, fsync: bool = True):
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, "snapshot.json")
+        self.log_path = os.path.join(directory, "journal.log")
+        self.fsync = fsync
+        self.ops = 0  # Jumlah operasi di log sejak snapshot terakhir
+        self._fp = None
+        os.makedirs(directory, exist_ok=True)
+
+    def exists(self) -> bool:
+        """Cek apakah sudah ada data lokal"""
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.log_path)
+
+    def load(self):
+        """Baca snapshot, return (data, list operasi di log)"""
+        data = None
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+        ops = []
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    try:
+                        ops.append(json.loads(line))
+                    except ValueError:
+                        # Baris terakhir terpotong (crash saat menulis), abaikan
+                        break
+        self.ops = len(ops)
+        return data, ops
+
+    def append(self, op: str, *args):
+        """Tulis 1 operasi ke log (durable setelah return)"""
+        if self._fp is None:
+            self._fp = open(self.log_path, "ab")
+        line = json.dumps([op, *args], separators=(",", ":")).encode() + b"\n"
+        self._fp.write(line)
+        self._fp.flush()
+        if self.fsync:
+            os.fsync(self._fp.fileno())
+        self.ops += 1
+
+    def compact(self, data: dict):
+        """Tulis snapshot baru lalu kosongkan log"""
+        self.write_snapshot(data)
+        self.truncate(self.mark())
+
+    def mark(self) -> tuple:
+        """Posisi akhir log sekarang: (byte, jumlah operasi)"""
+        size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        return size, self.ops
+
+    def write_snapshot(self, data: dict):
+        """Tulis snapshot baru (atomic rename), log tidak disentuh"""
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            # dump() ke file (bukan dumps()): encode per potongan, GIL dilepas berkala
+            # jadi event loop tetap jalan kalau ini dipanggil dari thread lain
+            json.dump(data, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._fsync_dir()
+
+    def truncate(self, mark: tuple):
+        """
+        Buang operasi log sampai `mark` (sudah ada di snapshot)
+
+        Operasi setelah mark disalin ke log baru. Kalau crash di tengah, log
+        lama masih utuh: replay ulang operasi yang sudah ada di snapshot
+        tidak mengubah hasil (tiap operasi set/hapus 1 record).
+        """
+        offset, ops = mark
+        self.close()
+        tail = b""
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                f.seek(offset)
+                tail = f.read()
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        self._fsync_dir()
+        self.ops -= ops
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def _fsync_dir(self):
+        # Supaya rename snapshot juga durable (tidak tersedia di Windows)
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
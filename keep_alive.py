@@ -1,11 +1,18 @@
-from flask import Flask
-from threading import Thread
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from aiohttp import web
+from config import *
+import metrics
 
-app = Flask('')
+DB = web.AppKey("db", object)
+COMPLETIONS = web.AppKey("completions", object)
+SEEN = web.AppKey("seen", dict)
 
-@app.route('/')
-def home():
-    return '''
+async def home(request):
+    return web.Response(content_type="text/html", text='''
     <html>
         <head><title>Key Bot</title></head>
         <body style="background:#1a1a2e;color:white;text-align:center;padding-top:100px;">
@@ -13,11 +20,119 @@ def home():
             <p>Discord Key System Bot</p>
         </body>
     </html>
-    '''
+    ''')
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
+# ═══════════════════════════════════════
+# CALLBACK WORK.INK
+# ═══════════════════════════════════════
+def callback_enabled() -> bool:
+    """Secret masih kosong / placeholder config: siapa pun bisa memalsukan tanda tangan"""
+    return bool(WEBHOOK_SECRET) and WEBHOOK_SECRET != "ISI_DISINI"
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+def sign(body: bytes, timestamp: str) -> str:
+    """HMAC-SHA256 dari "<timestamp>.<body>" dengan WEBHOOK_SECRET"""
+    message = timestamp.encode() + b"." + body
+    return hmac.new(WEBHOOK_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+def _verify_signature(request, body: bytes) -> bool:
+    timestamp = request.headers.get("X-Signature-Timestamp", "")
+    signature = request.headers.get("X-Signature", "")
+    try:
+        # Timestamp ikut ditandatangani, jadi callback lama tidak bisa diputar ulang
+        if abs(time.time() - int(timestamp)) > CALLBACK_MAX_SKEW:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(sign(body, timestamp), signature)
+
+async def workink_callback(request):
+    """
+    User selesai link Work.ink: masukkan ke antrian bot
+    
+    Cuma validasi + lookup O(1), kerja berat (generate key, DM) dilakukan
+    consumer di event loop bot. Token yang sama hanya diantrikan sekali.
+    """
+    if not callback_enabled():
+        return web.json_response({"status": "callback disabled"}, status=503)
+    body = await request.read()
+    if not _verify_signature(request, body):
+        return web.json_response({"status": "invalid signature"}, status=401)
+    try:
+        token = json.loads(body)["token"]
+    except (ValueError, KeyError, TypeError):
+        token = None
+    if not isinstance(token, str):
+        return web.json_response({"status": "invalid payload"}, status=400)
+    
+    if not request.app[DB].ready:
+        # Startup pertama, data belum ter-download: Work.ink akan mengirim ulang
+        return web.json_response({"status": "loading"}, status=503)
+    seen = request.app[SEEN]
+    if token in seen:
+        return web.json_response({"status": "duplicate"})
+    user_id = request.app[DB].find_pending_token(token)
+    if user_id is None:
+        # Sudah diproses (pending dihapus) atau token tidak dikenal
+        return web.json_response({"status": "unknown token"})
+    
+    try:
+        request.app[COMPLETIONS].put_nowait(user_id)
+    except asyncio.QueueFull:
+        # Work.ink akan mengirim ulang callback
+        return web.json_response({"status": "busy"}, status=503)
+    
+    seen[token] = None
+    if len(seen) > CALLBACK_QUEUE_SIZE:
+        # Cukup ingat token terbaru; yang lama sudah tidak ada di pending
+        del seen[next(iter(seen))]
+    return web.json_response({"status": "queued"}, status=202)
+
+# ═══════════════════════════════════════
+# VALIDASI KEY (dipakai client Lua)
+# ═══════════════════════════════════════
+async def validate(request):
+    """GET /validate?key=...&hwid=... — dijawab dari store lokal, tanpa request ke GitHub"""
+    key = request.query.get("key", "")
+    hwid = request.query.get("hwid") or None
+    if not key or len(key) > 64:
+        return web.json_response({"valid": False, "reason": "Key tidak valid"}, status=400)
+    if hwid is not None and len(hwid) > HWID_MAX_LENGTH:
+        return web.json_response({"valid": False, "reason": "HWID tidak valid"}, status=400)
+    if not request.app[DB].ready:
+        return web.json_response({"valid": False, "reason": "Server masih memuat data"}, status=503)
+    return web.json_response(request.app[DB].validate_key(key, hwid))
+
+# ═══════════════════════════════════════
+# METRICS (Prometheus)
+# ═══════════════════════════════════════
+async def metrics_route(request):
+    """GET /metrics — counter & histogram dari metrics.py, gauge store diisi di sini"""
+    db = request.app[DB]
+    stats = db.get_stats()  # O(1) dari counter
+    metrics.STORE_KEYS.set(stats["active_keys"], "active")
+    metrics.STORE_KEYS.set(stats["expired_keys"], "expired")
+    metrics.PENDING_USERS.set(stats["pending_users"])
+    metrics.DIRTY_SHARDS.set(len(db.dirty_shards))
+    return web.Response(body=metrics.render().encode(),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+# ═══════════════════════════════════════
+# SERVER
+# ═══════════════════════════════════════
+def create_app(db, completions) -> web.Application:
+    app = web.Application(client_max_size=64 * 1024)
+    app[DB] = db
+    app[COMPLETIONS] = completions
+    app[SEEN] = {}
+    app.router.add_get("/", home)
+    app.router.add_get("/validate", validate)
+    app.router.add_get("/metrics", metrics_route)
+    app.router.add_post("/callback/workink", workink_callback)
+    return app
+
+async def keep_alive(db, completions, port: int = WEB_PORT) -> web.AppRunner:
+    """Jalankan web server di event loop bot (panggil runner.cleanup() saat shutdown)"""
+    runner = web.AppRunner(create_app(db, completions), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    return runner
@@ -0,0 +1,60 @@
+import secrets
+import string
+from config import *
+
+KEY_CHARS = string.ascii_uppercase + string.digits
+# Byte >= batas ini dibuang supaya b % 36 tetap seragam (252 = 36 * 7)
+_BYTE_LIMIT = 256 - 256 % len(KEY_CHARS)
+_SEGMENTS, _SEGMENT_LEN = 4, 4
+
+def _format(chars: str) -> str:
+    segments = [chars[i:i + _SEGMENT_LEN] for i in range(0, len(chars), _SEGMENT_LEN)]
+    return f"{KEY_PREFIX}-{'-'.join(segments)}"
+
+def _random_chars(count: int) -> str:
+    """`count` karakter acak dari CSPRNG, diambil per blok byte"""
+    result = []
+    needed = count
+    while needed > 0:
+        # Sedikit lebih banyak dari yang dibutuhkan untuk menutup byte yang dibuang
+        block = secrets.token_bytes(needed + needed // 16 + 16)
+        chars = [KEY_CHARS[b % len(KEY_CHARS)] for b in block if b < _BYTE_LIMIT][:needed]
+        result.extend(chars)
+        needed -= len(chars)
+    return "".join(result)
+
+def generate_key() -> str:
+    """Generate random key dengan format PREFIX-XXXX-XXXX-XXXX-XXXX"""
+    return _format(_random_chars(_SEGMENTS * _SEGMENT_LEN))
+
+def generate_keys(count: int, exists) -> list:
+    """
+    Generate `count` key unik sekaligus
+
+    `exists(key)` dipakai untuk cek bentrok dengan key yang sudah ada di
+    store (boleh false positive, key itu cukup diganti). Bentrok di dalam
+    batch sendiri dicek dengan set.
+    """
+    length = _SEGMENTS * _SEGMENT_LEN
+    keys = set()
+    while len(keys) < count:
+        missing = count - len(keys)
+        chars = _random_chars(missing * length)
+        for i in range(0, len(chars), length):
+            key = _format(chars[i:i + length])
+            if key not in keys and not exists(key):
+                keys.add(key)
+    return list(keys)
+
+def generate_key_batches(count: int, exists, batch: int):
+    """
+    Seperti generate_keys, tapi per potongan `batch` key (generator list)
+
+    Caller bisa memberi jeda ke event loop di sela potongan. Key tetap unik
+    di semua potongan, walaupun potongan sebelumnya belum masuk store.
+    """
+    seen = set()
+    for start in range(0, count, batch):
+        keys = generate_keys(min(batch, count - start), lambda key: key in seen or exists(key))
+        seen.update(keys)
+        yield keys
@@ -0,0 +1,394 @@
+import heapq
+from array import array
+from bisect import bisect_left, insort
+from itertools import compress
+
+FLAG_ADMIN = 1
+FLAG_USED = 2
+
+class KeyTable:
+    """
+    Tabel key kolumnar: 1 baris per key, tiap field di array sendiri
+
+    Pengganti dict {key: {...}} yang jauh lebih hemat memory untuk jutaan
+    key. Baris yang dihapus masuk free list dan dipakai ulang. Dari luar
+    tetap terlihat seperti mapping key -> dict record dengan field yang sama
+    seperti layout JSON (user_id, created_at, expires_at, is_admin, used,
+    dan hwid kalau key terikat ke HWID).
+
+    Index tambahan (semuanya berisi nomor baris, entry basi dibuang saat dibaca):
+    - expiry wheel: bucket waktu expires_at -> baris, untuk sweeper
+    - partisi: nomor shard GitHub -> baris
+
+    Plus index user_id -> baris (urut waktu dibuat) dan hwid -> key yang
+    selalu up to date.
+    """
+    WHEEL_SECONDS = 60  # Lebar 1 bucket expiry wheel
+
+    def __init__(self, partition=None, partitions: int = 0):
+        self._index = {}  # key -> nomor baris
+        self._keys = []   # nomor baris -> key (None = baris kosong)
+        self.user_id = array("q")
+        self.created_at = array("d")
+        self.expires_at = array("d")
+        self.flags = bytearray()
+        self.hwid = []    # None = key tidak terikat HWID
+        self._free = []
+        self._by_user = {}  # user_id -> array baris urut (created_at, baris); 1 halaman = 1 slice
+        self._by_hwid = {}  # hwid -> {key: None}; biasanya cuma 1 key per HWID
+
+        self._partition = partition
+        self._parts = [array("I") for _ in range(partitions)]
+        self._wheel = {}
+        self._wheel_heap = []
+
+    # ═══════════════════════════════════════
+    # MAPPING
+    # ═══════════════════════════════════════
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __getitem__(self, key: str) -> dict:
+        return self._record(self._index[key])
+
+    def __setitem__(self, key: str, record: dict):
+        user_id = int(record["user_id"])
+        hwid = record.get("hwid")
+        row = self._index.get(key)
+        if row is None:
+            row = self._alloc(key)
+            old_expiry = None
+            reindex = True
+        else:
+            old_expiry = self.expires_at[row]
+            # Posisi di index user ikut created_at: dilepas selagi kolomnya masih nilai lama
+            reindex = self.user_id[row] != user_id or self.created_at[row] != record["created_at"]
+            if reindex:
+                self._user_remove(self.user_id[row], row)
+        if self.hwid[row] != hwid:
+            self._hwid_remove(self.hwid[row], key)
+            self._hwid_add(hwid, key)
+            self.hwid[row] = hwid
+        self.user_id[row] = user_id
+        self.created_at[row] = record["created_at"]
+        self.expires_at[row] = record["expires_at"]
+        self.flags[row] = ((FLAG_ADMIN if record.get("is_admin") else 0)
+                           | (FLAG_USED if record.get("used") else 0))
+        if reindex:
+            self._user_add(user_id, row)
+        if old_expiry is None or (int(old_expiry // self.WHEEL_SECONDS)
+                                  != int(record["expires_at"] // self.WHEEL_SECONDS)):
+            self._wheel_add(row)
+
+    def __delitem__(self, key: str):
+        row = self._index.pop(key)
+        self._user_remove(self.user_id[row], row)
+        self._hwid_remove(self.hwid[row], key)
+        self._keys[row] = None
+        self.hwid[row] = None
+        self.user_id[row] = 0
+        self.expires_at[row] = 0.0
+        self._free.append(row)
+
+    def get(self, key: str, default=None):
+        row = self._index.get(key)
+        return default if row is None else self._record(row)
+
+    def pop(self, key: str, default=None):
+        row = self._index.get(key)
+        if row is None:
+            return default
+        record = self._record(row)
+        del self[key]
+        return record
+
+    def keys(self):
+        return self._index.keys()
+
+    def items(self):
+        for key, row in self._index.items():
+            yield key, self._record(row)
+
+    def values(self):
+        for row in self._index.values():
+            yield self._record(row)
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+    def iter_rows(self):
+        """
+        Seperti items(), tapi aman kalau tabel berubah di sela iterasi
+
+        Jalan per nomor baris: key baru boleh ikut / tidak, key yang dihapus
+        dilewati. Tidak ada salinan daftar key.
+        """
+        row = 0
+        while row < len(self._keys):
+            key = self._keys[row]
+            if key is not None:
+                yield key, self._record(row)
+            row += 1
+
+    def _record(self, row: int) -> dict:
+        flags = self.flags[row]
+        record = {
+            "user_id": self.user_id[row],
+            "created_at": self.created_at[row],
+            "expires_at": self.expires_at[row],
+            "is_admin": bool(flags & FLAG_ADMIN),
+            "used": bool(flags & FLAG_USED)
+        }
+        # Field hwid hanya ada kalau terikat, supaya record lama tidak berubah
+        hwid = self.hwid[row]
+        if hwid is not None:
+            record["hwid"] = hwid
+        return record
+
+    def _alloc(self, key: str) -> int:
+        if self._free:
+            row = self._free.pop()
+            self._keys[row] = key
+        else:
+            row = len(self._keys)
+            self._keys.append(key)
+            self.user_id.append(0)
+            self.created_at.append(0.0)
+            self.expires_at.append(0.0)
+            self.flags.append(0)
+            self.hwid.append(None)
+        self._index[key] = row
+        if self._partition is not None:
+            self._parts[self._partition(key)].append(row)
+        return row
+
+    # ═══════════════════════════════════════
+    # OPERASI MASSAL (1 pass per kolom)
+    # ═══════════════════════════════════════
+    # Baris kosong punya expires_at = 0, jadi otomatis tidak dihitung active
+    def count_active(self, now: float) -> int:
+        return sum(map(now.__lt__, self.expires_at))
+
+    def active_expiries(self, now: float) -> list:
+        return list(filter(now.__lt__, self.expires_at))
+
+    def expire_before(self, before: float) -> list:
+        """Semua key dengan expires_at <= before"""
+        return [key for key in compress(self._keys, map(before.__ge__, self.expires_at))
+                if key is not None]
+
+    # ═══════════════════════════════════════
+    # INDEX USER
+    # ═══════════════════════════════════════
+    # Isinya nomor baris (4 byte), bukan referensi ke string key (8 byte + objek),
+    # urut (created_at, baris) supaya sama dengan ORDER BY created_at di SQLite
+    def _user_order(self, row: int) -> tuple:
+        return self.created_at[row], row
+
+    def _user_add(self, user_id: int, row: int):
+        rows = self._by_user.get(user_id)
+        if rows is None:
+            self._by_user[user_id] = array("I", (row,))
+        elif self._user_order(rows[-1]) < self._user_order(row):
+            # Key baru hampir selalu yang paling akhir dibuat
+            rows.append(row)
+        else:
+            insort(rows, row, key=self._user_order)
+
+    def _user_remove(self, user_id: int, row: int):
+        # Binary search + 1 memmove, bukan perbandingan satu per satu
+        rows = self._by_user.get(user_id)
+        if rows is None:
+            return
+        i = bisect_left(rows, self._user_order(row), key=self._user_order)
+        if i < len(rows) and rows[i] == row:
+            del rows[i]
+            if not rows:
+                del self._by_user[user_id]
+
+    def keys_for_user(self, user_id: int, offset: int = 0, limit: int = None) -> list:
+        """Key milik user, urut waktu dibuat; 1 halaman = 1 slice array"""
+        rows = self._by_user.get(user_id, ())
+        stop = None if limit is None else offset + limit
+        keys = self._keys
+        return [keys[row] for row in rows[offset:stop]]
+
+    def count_user(self, user_id: int) -> int:
+        return len(self._by_user.get(user_id, ()))
+
+    # ═══════════════════════════════════════
+    # INDEX HWID
+    # ═══════════════════════════════════════
+    def _hwid_add(self, hwid: str, key: str):
+        if hwid is not None:
+            self._by_hwid.setdefault(hwid, {})[key] = None
+
+    def _hwid_remove(self, hwid: str, key: str):
+        keys = self._by_hwid.get(hwid)
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self._by_hwid[hwid]
+
+    def key_for_hwid(self, hwid: str):
+        """Key terikat HWID ini yang expire paling akhir, None kalau tidak ada"""
+        keys = self._by_hwid.get(hwid)
+        if not keys:
+            return None
+        index, expires_at = self._index, self.expires_at
+        return max(keys, key=lambda key: expires_at[index[key]])
+
+    def key_holders(self, now: float, until: float = None):
+        """
+        Generator (user_id, expires_at terakhir) untuk user dengan key active
+
+        `until`: hanya user yang semua key active-nya expire sebelum waktu ini.
+        Cuma daftar user_id yang di-copy di awal; record dibaca saat giliran
+        user itu, jadi tabel boleh berubah di sela-sela iterasi.
+        """
+        expires_at = self.expires_at
+        for user_id in list(self._by_user):
+            rows = self._by_user.get(user_id)
+            if not rows:
+                continue
+            latest = max(map(expires_at.__getitem__, rows))
+            if latest > now and (until is None or latest <= until):
+                yield user_id, latest
+
+    # ═══════════════════════════════════════
+    # EXPIRY WHEEL
+    # ═══════════════════════════════════════
+    def _wheel_add(self, row: int):
+        bucket = int(self.expires_at[row] // self.WHEEL_SECONDS)
+        rows = self._wheel.get(bucket)
+        if rows is None:
+            rows = self._wheel[bucket] = array("I")
+            heapq.heappush(self._wheel_heap, bucket)
+        rows.append(row)
+
+    def expired(self, before: float, limit: int) -> list:
+        """
+        Maksimal `limit` key dengan expires_at <= before, bucket terlama dulu
+
+        Key yang dikembalikan dikeluarkan dari wheel (caller yang menghapus).
+        Biaya sebanding dengan jumlah baris di bucket yang sudah lewat.
+        """
+        result = []
+        cutoff = int(before // self.WHEEL_SECONDS)
+        while self._wheel_heap and self._wheel_heap[0] <= cutoff and len(result) < limit:
+            bucket = self._wheel_heap[0]
+            keep = array("I")
+            seen = set()
+            for row in self._wheel.pop(bucket):
+                key = self._keys[row]
+                expires_at = self.expires_at[row]
+                # Basi: baris sudah dihapus, dobel, atau expires_at-nya pindah bucket
+                if (key is None or row in seen
+                        or int(expires_at // self.WHEEL_SECONDS) != bucket):
+                    continue
+                seen.add(row)
+                if expires_at <= before and len(result) < limit:
+                    result.append(key)
+                else:
+                    keep.append(row)
+
+            if keep:
+                # Sisa bucket belum waktunya / limit tercapai
+                self._wheel[bucket] = keep
+                break
+            heapq.heappop(self._wheel_heap)
+        return result
+
+    # ═══════════════════════════════════════
+    # PARTISI (shard GitHub)
+    # ═══════════════════════════════════════
+    def partition_items(self, part: int) -> dict:
+        """Semua key di 1 partisi, sekaligus membersihkan entry basi"""
+        live = array("I")
+        seen = set()
+        result = {}
+        for row in self._parts[part]:
+            key = self._keys[row]
+            if key is None or row in seen or self._partition(key) != part:
+                continue
+            seen.add(row)
+            live.append(row)
+            result[key] = self._record(row)
+        self._parts[part] = live
+        return result
+
+    # ═══════════════════════════════════════
+    # SNAPSHOT
+    # ═══════════════════════════════════════
+    def to_columns(self) -> dict:
+        """Kolom siap di-json.dump (baris kosong tidak ikut)"""
+        return self.pack_columns(self.copy_columns())
+
+    def copy_columns(self) -> dict:
+        """
+        Salinan mentah semua kolom, termasuk baris kosong
+
+        Cuma copy array/list (tanpa loop Python), jadi murah di event loop;
+        pack_columns() yang berat bisa jalan di thread lain.
+        """
+        return {
+            "key": self._keys[:],
+            "user_id": self.user_id[:],
+            "created_at": self.created_at[:],
+            "expires_at": self.expires_at[:],
+            "flags": bytes(self.flags),
+            "hwid": self.hwid[:]
+        }
+
+    @staticmethod
+    def pack_columns(columns: dict) -> dict:
+        """Hasil copy_columns() tanpa baris kosong, sebagai list biasa"""
+        live = [key is not None for key in columns["key"]]
+        return {name: list(compress(values, live)) for name, values in columns.items()}
+
+    @classmethod
+    def from_columns(cls, columns: dict, partition=None, partitions: int = 0):
+        table = cls(partition, partitions)
+        keys = list(columns["key"])
+        table._keys = keys
+        table._index = {key: row for row, key in enumerate(keys)}
+        table.user_id = array("q", columns["user_id"])
+        table.created_at = array("d", columns["created_at"])
+        table.expires_at = array("d", columns["expires_at"])
+        table.flags = bytearray(columns["flags"])
+        # Snapshot sebelum ada HWID tidak punya kolom ini
+        table.hwid = list(columns.get("hwid") or [None] * len(keys))
+        table._rebuild_indexes()
+        return table
+
+    @classmethod
+    def from_dict(cls, keys: dict, partition=None, partitions: int = 0):
+        table = cls(partition, partitions)
+        for key, record in keys.items():
+            table[key] = record
+        return table
+
+    def _rebuild_indexes(self):
+        self._parts = [array("I") for _ in self._parts]
+        self._wheel = {}
+        self._wheel_heap = []
+        self._by_hwid = {}
+        by_user = {}
+        for row, key in enumerate(self._keys):
+            if key is None:
+                continue
+            by_user.setdefault(self.user_id[row], []).append(row)
+            self._hwid_add(self.hwid[row], key)
+            if self._partition is not None:
+                self._parts[self._partition(key)].append(row)
+            self._wheel_add(row)
+        # Sort stabil di atas baris yang sudah urut: hasilnya urut (created_at, baris)
+        created_at = self.created_at
+        self._by_user = {user_id: array("I", sorted(rows, key=created_at.__getitem__))
+                         for user_id, rows in by_user.items()}
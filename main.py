@@ -1,14 +1,22 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import random
-import string
+import io
+import os
 import time
 import asyncio
+import math
+import signal
 
 from config import *
-from database import Database
-from workink import WorkinkAPI
+from database import Database, open_jsonl
+from dispatcher import Dispatcher
+from keygen import generate_key, generate_key_batches
+from workink import WorkinkAPI, VerifyScheduler
+from keep_alive import callback_enabled, keep_alive
+from profiler import LoopWatchdog, CommandProfiler
+from ratelimit import RateLimiter
+import metrics
 
 # ═══════════════════════════════════════════════════════════
 # BOT SETUP
@@ -17,19 +25,41 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)  # Pakai !help sendiri
 db = Database()
 workink = WorkinkAPI()
+verifier = VerifyScheduler(workink)
+# user_id yang sudah selesai link Work.ink (diisi callback di keep_alive.py)
+completions = asyncio.Queue(maxsize=CALLBACK_QUEUE_SIZE)
+# Rate limit: per user untuk semua command, global untuk command yang menulis ke store
+user_limiter = RateLimiter(USER_RATE, USER_BURST)
+write_limiter = RateLimiter(WRITE_RATE, WRITE_BURST)
+
+async def resolve_user(user_id: int):
+    return bot.get_user(user_id) or await bot.fetch_user(user_id)
+
+# Semua DM lewat dispatcher: concurrency & rate limit DM dibatasi di 1 tempat
+dispatcher = Dispatcher(resolve_user)
+watchdog = LoopWatchdog()
+profiler = CommandProfiler()  # Dinyalakan admin lewat !profile
+
+class RateLimited(commands.CommandError):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited, coba lagi dalam {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+class DataNotReady(commands.CheckFailure):
+    pass
+
+async def data_ready(ctx) -> bool:
+    """Check untuk command yang butuh data: tunggu download pertama saat startup"""
+    if not await db.wait_ready(READY_TIMEOUT):
+        raise DataNotReady("Store belum siap")
+    return True
 
 # ═══════════════════════════════════════════════════════════
 # UTILITY FUNCTIONS
 # ═══════════════════════════════════════════════════════════
-def generate_key() -> str:
-    """Generate random key dengan format PREFIX-XXXX-XXXX-XXXX-XXXX"""
-    chars = string.ascii_uppercase + string.digits
-    segments = [''.join(random.choices(chars, k=4)) for _ in range(4)]
-    return f"{KEY_PREFIX}-{'-'.join(segments)}"
-
 def is_admin(user_id: int) -> bool:
     """Cek apakah user adalah admin"""
     return user_id in ADMIN_IDS
@@ -40,6 +70,116 @@ def format_time(seconds: float) -> str:
     minutes = int((seconds % 3600) // 60)
     return f"{hours}h {minutes}m"
 
+def valid_hwid(hwid: str) -> bool:
+    """HWID dari executor: panjang wajar, tanpa spasi"""
+    return HWID_MIN_LENGTH <= len(hwid) <= HWID_MAX_LENGTH and not any(c.isspace() for c in hwid)
+
+def verified_embed(key: str, hwid: str = None) -> discord.Embed:
+    """Embed key untuk member yang selesai verifikasi"""
+    embed = discord.Embed(
+        title="✅ VERIFIKASI BERHASIL!",
+        description="Terima kasih sudah menyelesaikan verifikasi!",
+        color=discord.Color.green(),
+        timestamp=discord.utils.utcnow()
+    )
+    
+    embed.add_field(
+        name="🔑 Key Kamu",
+        value=f"```{key}```",
+        inline=False
+    )
+    
+    embed.add_field(name="⏰ Durasi", value="24 Jam", inline=True)
+    embed.add_field(name="📋 Copy", value="Tap key diatas", inline=True)
+    if hwid:
+        embed.add_field(name="🖥️ HWID", value=f"`{hwid}`", inline=False)
+    
+    embed.set_footer(text="Simpan key ini dengan aman!")
+    return embed
+
+# ═══════════════════════════════════════════════════════════
+# BACKGROUND TASKS
+# ═══════════════════════════════════════════════════════════
+async def expiry_sweeper():
+    """Hapus key & pending expired secara berkala, per batch"""
+    await db.wait_ready()
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        try:
+            # Batch penuh = kemungkinan masih ada sisa, lanjut tanpa menunggu interval
+            while await db.sweep() >= SWEEP_BATCH:
+                await asyncio.sleep(0)
+        except Exception as e:
+            print(f"Sweep error: {e}")
+
+async def completion_worker():
+    """Generate key & DM begitu callback Work.ink masuk (tanpa !verify)"""
+    await db.wait_ready()
+    while True:
+        user_id = await completions.get()
+        try:
+            # Pending dihapus dulu: kalau !verify sudah memproses user ini, berhenti
+            pending = db.get_pending(user_id)
+            if pending is None or not await db.remove_pending(user_id):
+                continue
+            key = generate_key()
+            hwid = pending.get("hwid")
+            await db.add_key(key, user_id, is_admin=False, hwid=hwid)
+            
+            # Tidak ditunggu: DM tertutup -> key tetap tersimpan, bisa dilihat lewat !mykeys
+            await dispatcher.enqueue(user_id, embed=verified_embed(key, hwid))
+        except Exception as e:
+            print(f"Callback error ({user_id}): {e}")
+
+# ═══════════════════════════════════════════════════════════
+# RATE LIMIT & METRICS
+# ═══════════════════════════════════════════════════════════
+@bot.before_invoke
+async def rate_limit(ctx):
+    """Dipanggil sebelum setiap command (argumen sudah di-parse)"""
+    ctx.started_at = time.perf_counter()  # Untuk histogram latency di record_latency
+    retry_after = user_limiter.acquire(ctx.author.id)
+    if retry_after:
+        raise RateLimited(retry_after)
+    profiler.before(ctx)
+
+def charge_write(ctx, units: int = 1):
+    """
+    Potong budget tulis global, dipanggil command tepat sebelum menulis ke store
+    
+    Bukan di before_invoke: command yang berhenti lebih awal (bukan admin,
+    belum request, dsb.) tidak menulis apa pun jadi tidak ikut dihitung.
+    RateLimited adalah CommandError, jadi tetap sampai ke on_command_error.
+    """
+    retry_after = write_limiter.acquire(None, WRITE_COMMANDS.get(ctx.command.name, 1) * units)
+    if retry_after:
+        raise RateLimited(retry_after)
+
+@bot.after_invoke
+async def record_latency(ctx):
+    """Dipanggil setelah command selesai (termasuk yang error)"""
+    metrics.COMMAND_SECONDS.observe(time.perf_counter() - ctx.started_at, ctx.command.name)
+    done = profiler.after(ctx)
+    if done:
+        owner, filename, report = done
+        await send_profile(owner, filename, report)
+
+@bot.event
+async def on_command_error(ctx, error):
+    metrics.COMMAND_ERRORS.inc(ctx.command.name if ctx.command else "unknown", type(error).__name__)
+    if isinstance(error, RateLimited):
+        await ctx.send(
+            f"⏳ {ctx.author.mention} Terlalu cepat! Coba lagi dalam "
+            f"{math.ceil(error.retry_after)} detik.",
+            delete_after=10
+        )
+        return
+    if isinstance(error, DataNotReady):
+        await ctx.send(f"⏳ {ctx.author.mention} Bot masih memuat data, coba lagi sebentar lagi.")
+        return
+    # Error lain: perilaku bawaan discord.py (print traceback)
+    await commands.Bot.on_command_error(bot, ctx, error)
+
 # ═══════════════════════════════════════════════════════════
 # EVENTS
 # ═══════════════════════════════════════════════════════════
@@ -71,17 +211,24 @@ async def on_ready():
 
 # ═══ GET KEY ═══
 @bot.command(name="getkey")
-async def getkey(ctx):
-    """Dapatkan key - Admin langsung, Member lewat iklan"""
+@commands.check(data_ready)
+async def getkey(ctx, hwid: str = None):
+    """Dapatkan key - Admin langsung, Member lewat iklan (opsional terikat HWID)"""
     user_id = ctx.author.id
     username = ctx.author.display_name
     
+    if hwid is not None and not valid_hwid(hwid):
+        await ctx.send(f"⚠️ HWID harus {HWID_MIN_LENGTH}-{HWID_MAX_LENGTH} karakter tanpa spasi. "
+                       f"Format: `!getkey [hwid]`")
+        return
+    
     # ══════════════════════════════════
     # ADMIN - LANGSUNG GENERATE KEY
     # ══════════════════════════════════
     if is_admin(user_id):
+        charge_write(ctx)
         key = generate_key()
-        db.add_key(key, user_id, is_admin=True)
+        await db.add_key(key, user_id, is_admin=True, hwid=hwid)
         
         embed = discord.Embed(
             title="👑 ADMIN KEY GENERATOR",
@@ -96,13 +243,14 @@ async def getkey(ctx):
         )
         embed.add_field(name="⏰ Durasi", value="24 Jam", inline=True)
         embed.add_field(name="👤 Status", value="Admin", inline=True)
+        if hwid:
+            embed.add_field(name="🖥️ HWID", value=f"`{hwid}`", inline=False)
         embed.set_footer(text=f"Generated for {username}")
         
         # Kirim ke DM
-        try:
-            await ctx.author.send(embed=embed)
+        if await dispatcher.send(ctx.author.id, embed=embed):
             await ctx.send(f"✅ {ctx.author.mention} Key telah dikirim ke DM!")
-        except discord.Forbidden:
+        else:
             await ctx.send(embed=embed)
         
         return
@@ -121,9 +269,18 @@ async def getkey(ctx):
         )
         return
     
+    # 1 HWID tidak boleh dipakai untuk key active milik user lain
+    if hwid:
+        bound = db.key_for_hwid(hwid)
+        holder = db.validate_key(bound) if bound else None
+        if holder and holder["valid"] and holder["user_id"] != user_id:
+            await ctx.send(f"❌ {ctx.author.mention} HWID ini sudah terikat ke key aktif milik user lain!")
+            return
+    
     # Generate link Work.ink
+    charge_write(ctx)
     link_data = workink.generate_user_link(user_id)
-    db.add_pending(user_id, link_data["token"], link_data["link"])
+    await db.add_pending(user_id, link_data["token"], link_data["link"], hwid=hwid)
     
     embed = discord.Embed(
         title="🔐 GET YOUR KEY",
@@ -165,10 +322,9 @@ async def getkey(ctx):
     embed.set_footer(text="⚠️ Jangan share link ini ke orang lain!")
     
     # Kirim ke DM
-    try:
-        await ctx.author.send(embed=embed)
+    if await dispatcher.send(ctx.author.id, embed=embed):
         await ctx.send(f"📩 {ctx.author.mention} Cek DM untuk link verifikasi!")
-    except discord.Forbidden:
+    else:
         await ctx.send(
             f"{ctx.author.mention} DM kamu tertutup! Buka DM lalu coba lagi.",
             delete_after=10
@@ -176,6 +332,7 @@ async def getkey(ctx):
 
 # ═══ VERIFY ═══
 @bot.command(name="verify")
+@commands.check(data_ready)
 async def verify(ctx):
     """Verifikasi setelah menyelesaikan iklan"""
     user_id = ctx.author.id
@@ -194,44 +351,33 @@ async def verify(ctx):
     
     # Cek expired
     if time.time() > pending["expires_at"]:
-        db.remove_pending(user_id)
+        await db.remove_pending(user_id)
         await ctx.send(f"⏰ {ctx.author.mention} Link sudah expired! Gunakan `!getkey` lagi.")
         return
     
-    # Verifikasi dengan Work.ink API (opsional)
-    # is_completed = workink.verify_completion(user_id, pending["token"])
-    
-    # Untuk sekarang, langsung approve (bisa ditambah validasi)
-    is_completed = True
+    # Verifikasi dengan Work.ink API (opsional), digabung per batch saat ramai
+    if VERIFY_API:
+        is_completed = await verifier.verify(user_id, pending["token"])
+    else:
+        # Untuk sekarang, langsung approve (bisa ditambah validasi)
+        is_completed = True
     
     if is_completed:
-        # Generate key
-        key = generate_key()
-        db.add_key(key, user_id, is_admin=False)
-        db.remove_pending(user_id)
-        
-        embed = discord.Embed(
-            title="✅ VERIFIKASI BERHASIL!",
-            description="Terima kasih sudah menyelesaikan verifikasi!",
-            color=discord.Color.green(),
-            timestamp=discord.utils.utcnow()
-        )
+        charge_write(ctx)
+        # Pending dihapus dulu supaya callback Work.ink tidak membuat key kedua
+        if not await db.remove_pending(user_id):
+            await ctx.send(f"✅ {ctx.author.mention} Key kamu sudah dikirim ke DM! Cek `!mykeys`")
+            return
         
-        embed.add_field(
-            name="🔑 Key Kamu",
-            value=f"```{key}```",
-            inline=False
-        )
-        
-        embed.add_field(name="⏰ Durasi", value="24 Jam", inline=True)
-        embed.add_field(name="📋 Copy", value="Tap key diatas", inline=True)
-        
-        embed.set_footer(text="Simpan key ini dengan aman!")
+        # Generate key (terikat HWID dari !getkey kalau ada)
+        key = generate_key()
+        hwid = pending.get("hwid")
+        await db.add_key(key, user_id, is_admin=False, hwid=hwid)
+        embed = verified_embed(key, hwid)
         
-        try:
-            await ctx.author.send(embed=embed)
+        if await dispatcher.send(ctx.author.id, embed=embed):
             await ctx.send(f"✅ {ctx.author.mention} Key dikirim ke DM!")
-        except discord.Forbidden:
+        else:
             await ctx.send(embed=embed)
     else:
         await ctx.send(
@@ -241,13 +387,14 @@ async def verify(ctx):
 
 # ═══ CEK KEY ═══
 @bot.command(name="cekkey")
-async def cekkey(ctx, key: str = None):
-    """Cek validitas key"""
+@commands.check(data_ready)
+async def cekkey(ctx, key: str = None, hwid: str = None):
+    """Cek validitas key (dan kecocokan HWID kalau diisi)"""
     if not key:
-        await ctx.send("⚠️ Format: `!cekkey <key>`")
+        await ctx.send("⚠️ Format: `!cekkey <key> [hwid]`")
         return
     
-    result = db.validate_key(key)
+    result = db.validate_key(key, hwid)
     
     if result["valid"]:
         embed = discord.Embed(
@@ -266,6 +413,40 @@ async def cekkey(ctx, key: str = None):
     
     await ctx.send(embed=embed)
 
+# ═══ MY KEYS ═══
+@bot.command(name="mykeys")
+@commands.check(data_ready)
+async def mykeys(ctx, page: int = 1):
+    """Lihat key milik kamu, per halaman"""
+    total = db.count_user_keys(ctx.author.id)
+    if total == 0:
+        await ctx.send("📭 Kamu belum punya key. Gunakan `!getkey`")
+        return
+    
+    pages = (total + MYKEYS_PER_PAGE - 1) // MYKEYS_PER_PAGE
+    page = min(max(page, 1), pages)
+    keys = db.get_user_keys(ctx.author.id, (page - 1) * MYKEYS_PER_PAGE, MYKEYS_PER_PAGE)
+    
+    now = time.time()
+    lines = []
+    for data in keys:
+        remaining = data["expires_at"] - now
+        status = f"⏰ {format_time(remaining)}" if remaining > 0 else "❌ Expired"
+        lines.append(f"• `{data['key']}` — {status}")
+    
+    embed = discord.Embed(
+        title="🔑 KEY KAMU",
+        description="\n".join(lines),
+        color=discord.Color.blurple()
+    )
+    embed.set_footer(text=f"Halaman {page}/{pages} • Total {total} key • !mykeys <halaman>")
+    
+    if await dispatcher.send(ctx.author.id, embed=embed):
+        if ctx.guild:
+            await ctx.send("✅ Daftar key dikirim ke DM!")
+    else:
+        await ctx.send(embed=embed)
+
 # ═══ MY ID ═══
 @bot.command(name="myid")
 async def myid(ctx):
@@ -282,20 +463,32 @@ async def myid(ctx):
 
 # ═══ ADMIN COMMANDS ═══
 @bot.command(name="genkey")
-async def genkey(ctx, amount: int = 1):
+@commands.check(data_ready)
+async def genkey(ctx, amount: int = 1, fmt: str = "txt"):
     """[ADMIN] Generate multiple keys"""
     if not is_admin(ctx.author.id):
         await ctx.send("❌ Hanya admin!")
         return
     
-    if amount > 10:
-        amount = 10
+    amount = min(max(amount, 1), GENKEY_MAX)
+    fmt = fmt.lower()
+    if fmt not in ("txt", "csv"):
+        await ctx.send("❌ Format harus `txt` atau `csv`!")
+        return
+    
+    # Bulk tetap 1 transaksi, jadi biaya dibatasi seperti 10 key
+    charge_write(ctx, min(amount, 10))
     
+    # Dibuat per batch dengan jeda ke event loop, lalu 1 commit GitHub
     keys = []
-    for _ in range(amount):
-        key = generate_key()
-        db.add_key(key, ctx.author.id, is_admin=True)
-        keys.append(key)
+    for batch in generate_key_batches(amount, db.key_exists, GENKEY_BATCH):
+        keys += batch
+        await asyncio.sleep(0)
+    await db.add_keys(keys, ctx.author.id, is_admin=True)
+    
+    if amount > GENKEY_EMBED_MAX:
+        await send_key_file(ctx, keys, fmt)
+        return
     
     keys_text = "\n".join([f"• `{k}`" for k in keys])
     
@@ -305,13 +498,28 @@ async def genkey(ctx, amount: int = 1):
         color=discord.Color.gold()
     )
     
-    try:
-        await ctx.author.send(embed=embed)
+    if await dispatcher.send(ctx.author.id, embed=embed):
         await ctx.send(f"✅ {amount} keys dikirim ke DM!")
-    except:
+    else:
         await ctx.send(embed=embed)
 
+async def send_key_file(ctx, keys: list, fmt: str):
+    """Kirim key sebagai file lampiran (DM, fallback ke channel)"""
+    if fmt == "csv":
+        expires_at = int(time.time() + KEY_DURATION)
+        content = "key,expires_at\n" + "".join(f"{k},{expires_at}\n" for k in keys)
+    else:
+        content = "".join(f"{k}\n" for k in keys)
+    filename = f"keys-{int(time.time())}.{fmt}"
+    data = content.encode()
+    
+    if await dispatcher.send(ctx.author.id, f"👑 {len(keys)} keys:", file=(filename, data)):
+        await ctx.send(f"✅ {len(keys)} keys dikirim ke DM!")
+    else:
+        await ctx.send(f"👑 {len(keys)} keys:", file=discord.File(io.BytesIO(data), filename=filename))
+
 @bot.command(name="stats")
+@commands.check(data_ready)
 async def stats(ctx):
     """[ADMIN] Lihat statistik"""
     if not is_admin(ctx.author.id):
@@ -319,7 +527,7 @@ async def stats(ctx):
         return
     
     stats = db.get_stats()
-    workink_stats = workink.get_stats()
+    workink_stats = await workink.get_stats()
     
     embed = discord.Embed(
         title="📊 STATISTIK BOT",
@@ -334,6 +542,10 @@ async def stats(ctx):
     embed.add_field(name="👀 Link Views", value=workink_stats.get("views", "N/A"), inline=True)
     embed.add_field(name="✅ Completions", value=workink_stats.get("completions", "N/A"), inline=True)
     
+    age = workink.stats_age()
+    updated = "belum tersedia" if age is None else f"{int(age)} detik lalu"
+    embed.set_footer(text=f"Data Work.ink: {updated}")
+    
     await ctx.send(embed=embed)
 
 @bot.command(name="addadmin")
@@ -350,6 +562,145 @@ async def addadmin(ctx, user: discord.Member):
     ADMIN_IDS.append(user.id)
     await ctx.send(f"✅ {user.mention} ditambahkan sebagai admin!")
 
+# ═══ BROADCAST ═══
+broadcasts = set()  # Task broadcast yang berjalan (referensi supaya tidak di-GC)
+
+async def dm_holders(ctx, holders, message, title: str):
+    """DM setiap (user_id, expires_at) dari generator `holders` lewat dispatcher, lalu lapor hasilnya"""
+    result = {True: 0, False: 0}
+    
+    def count(future):
+        result[future.result()] += 1
+    
+    try:
+        # Generator dibaca sambil jalan: enqueue menunggu kalau antrian penuh,
+        # jadi daftar penerima tidak pernah dimuat sekaligus
+        for user_id, expires_at in holders:
+            future = await dispatcher.enqueue(user_id, message(expires_at), bulk=True)
+            future.add_done_callback(count)
+        await dispatcher.drain()
+    except Exception as e:
+        print(f"{title} error: {e}")
+    await ctx.send(f"📣 {title} selesai: {result[True]} terkirim, {result[False]} gagal")
+
+def start_broadcast(ctx, holders, message, title: str):
+    task = asyncio.create_task(dm_holders(ctx, holders, message, title))
+    broadcasts.add(task)
+    task.add_done_callback(broadcasts.discard)
+
+@bot.command(name="broadcast")
+@commands.check(data_ready)
+async def broadcast(ctx, *, message: str):
+    """[ADMIN] DM pesan ke semua user yang punya key active"""
+    if not is_admin(ctx.author.id):
+        await ctx.send("❌ Hanya admin!")
+        return
+    
+    text = f"📣 **Pengumuman**\n{message}"
+    start_broadcast(ctx, db.key_holders(), lambda expires_at: text, "Broadcast")
+    await ctx.send("📣 Broadcast dimulai, hasilnya dilaporkan di sini.")
+
+@bot.command(name="remind")
+@commands.check(data_ready)
+async def remind(ctx, minutes: int = REMIND_BEFORE // 60):
+    """[ADMIN] Ingatkan user yang semua key-nya expire dalam N menit"""
+    if not is_admin(ctx.author.id):
+        await ctx.send("❌ Hanya admin!")
+        return
+    
+    if minutes < 1:
+        await ctx.send("❌ Menit minimal 1!")
+        return
+    
+    def message(expires_at: float) -> str:
+        remaining = format_time(max(expires_at - time.time(), 0))
+        return f"⏰ Key kamu expired dalam {remaining}. Gunakan `!getkey` untuk key baru."
+    
+    start_broadcast(ctx, db.key_holders(within=minutes * 60), message, "Reminder")
+    await ctx.send(f"⏰ Reminder dikirim ke user yang key-nya expire dalam {minutes} menit.")
+
+# ═══ EXPORT / IMPORT ═══
+@bot.command(name="export")
+@commands.check(data_ready)
+async def export_cmd(ctx):
+    """[ADMIN] Export semua key & pending sebagai JSONL gzip"""
+    if not is_admin(ctx.author.id):
+        await ctx.send("❌ Hanya admin!")
+        return
+    
+    # Ditulis ke disk per batch dulu, bukan dirakit di memory
+    directory = os.path.join(DATA_DIR, "exports")
+    os.makedirs(directory, exist_ok=True)
+    filename = f"keys-{int(time.time())}.jsonl.gz"
+    path = os.path.join(directory, filename)
+    counts = await db.export_jsonl(path)
+    summary = f"📦 Export: {counts['key']} key, {counts['pending']} pending"
+    
+    size = os.path.getsize(path)
+    if size > EXPORT_MAX_BYTES:
+        await ctx.send(f"{summary}. File {size / 2**20:.1f} MB terlalu besar untuk Discord, "
+                       f"tersimpan di server: `{path}`")
+        return
+    
+    if await dispatcher.send(ctx.author.id, summary, file=(filename, path)):
+        await ctx.send("✅ Export dikirim ke DM!")
+    else:
+        await ctx.send(summary, file=discord.File(path, filename=filename))
+    os.remove(path)
+
+@bot.command(name="importkeys")
+@commands.check(data_ready)
+async def importkeys(ctx):
+    """[ADMIN] Import key & pending dari lampiran .jsonl / .jsonl.gz"""
+    if not is_admin(ctx.author.id):
+        await ctx.send("❌ Hanya admin!")
+        return
+    
+    attachments = ctx.message.attachments
+    if not attachments or not attachments[0].filename.endswith((".jsonl", ".jsonl.gz")):
+        await ctx.send("⚠️ Lampirkan file `.jsonl` / `.jsonl.gz` bersama `!importkeys`")
+        return
+    
+    attachment = attachments[0]
+    raw = io.BytesIO(await attachment.read())
+    try:
+        with open_jsonl(attachment.filename, "r", fileobj=raw) as f:
+            counts = await db.import_jsonl(f)
+    except (ValueError, OSError, EOFError) as e:
+        # File rusak di tengah: batch sebelumnya sudah tersimpan
+        await ctx.send(f"❌ Import berhenti: {e}")
+        return
+    
+    message = f"✅ Import: {counts['key']} key, {counts['pending']} pending"
+    if counts["skipped"]:
+        message += f", {counts['skipped']} record tidak lengkap dilewati"
+    await ctx.send(message)
+
+# ═══ PROFILER ═══
+@bot.command(name="profile")
+async def profile(ctx, count: int = 20, mode: str = "cpu"):
+    """[ADMIN] Profil N command berikutnya, laporan dikirim sebagai file (0 = batal)"""
+    if not is_admin(ctx.author.id):
+        await ctx.send("❌ Hanya admin!")
+        return
+    
+    if count <= 0:
+        profiler.cancel()
+        await ctx.send("⏹️ Profiler dimatikan.")
+        return
+    
+    if count > PROFILE_MAX or mode not in CommandProfiler.MODES:
+        await ctx.send(f"❌ Gunakan `!profile <1-{PROFILE_MAX}> [cpu|wall]`")
+        return
+    
+    profiler.start(ctx, count, mode)
+    await ctx.send(f"🔬 Profiler ({mode}) aktif untuk {count} command berikutnya.")
+
+async def send_profile(ctx, filename: str, report: bytes):
+    """Kirim laporan profiler ke admin yang menyalakannya (DM, fallback ke channel)"""
+    if not await dispatcher.send(ctx.author.id, "🔬 Laporan profiler:", file=(filename, report)):
+        await ctx.send("🔬 Laporan profiler:", file=discord.File(io.BytesIO(report), filename=filename))
+
 # ═══ HELP ═══
 @bot.command(name="help")
 async def help_cmd(ctx):
@@ -363,9 +714,10 @@ async def help_cmd(ctx):
     embed.add_field(
         name="👤 User Commands",
         value=(
-            "`!getkey` - Dapatkan key\n"
+            "`!getkey [hwid]` - Dapatkan key (opsional terikat HWID)\n"
             "`!verify` - Verifikasi setelah iklan\n"
-            "`!cekkey <key>` - Cek validitas key\n"
+            "`!cekkey <key> [hwid]` - Cek validitas key\n"
+            "`!mykeys [halaman]` - Lihat key kamu\n"
             "`!myid` - Lihat Discord ID"
         ),
         inline=False
@@ -375,8 +727,13 @@ async def help_cmd(ctx):
         embed.add_field(
             name="👑 Admin Commands",
             value=(
-                "`!genkey <jumlah>` - Generate multiple keys\n"
+                "`!genkey <jumlah> [txt|csv]` - Generate multiple keys (>10: file)\n"
                 "`!stats` - Lihat statistik\n"
+                "`!broadcast <pesan>` - DM semua pemegang key\n"
+                "`!remind [menit]` - Ingatkan key yang hampir expire\n"
+                "`!profile [jumlah] [cpu|wall]` - Profil command berikutnya\n"
+                "`!export` - Export key & pending (.jsonl.gz)\n"
+                "`!importkeys` + lampiran - Import .jsonl / .jsonl.gz\n"
                 "`!addadmin @user` - Tambah admin"
             ),
             inline=False
@@ -387,7 +744,37 @@ async def help_cmd(ctx):
 # ═══════════════════════════════════════════════════════════
 # RUN BOT
 # ═══════════════════════════════════════════════════════════
+async def run_bot():
+    """Jalankan bot + flusher database, dengan flush terakhir saat shutdown"""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, lambda: asyncio.create_task(bot.close()))
+        except NotImplementedError:
+            pass  # Windows tidak support signal handler di asyncio
+    
+    async with bot:
+        # Store lokal sudah terbuka saat import; data GitHub di-refresh di background
+        db.start_flusher()
+        db.start_refresh()
+        dispatcher.start()
+        watchdog.start()
+        server = await keep_alive(db, completions)
+        if not callback_enabled():
+            print("⚠️ WEBHOOK_SECRET belum diisi: callback Work.ink dimatikan (503)")
+        tasks = [asyncio.create_task(expiry_sweeper()),
+                 asyncio.create_task(completion_worker())]
+        try:
+            await bot.start(DISCORD_TOKEN)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await server.cleanup()
+            await dispatcher.close()
+            watchdog.stop()
+            profiler.cancel()
+            await workink.close()
+            await db.close()
+
 if __name__ == "__main__":
-    from keep_alive import keep_alive
-    keep_alive()
-    bot.run(DISCORD_TOKEN)
+    asyncio.run(run_bot())
@@ -0,0 +1,114 @@
+"""
+Perintah maintenance database (jalankan di luar bot).
+
+  python manage.py migrate-sqlite [keys.json] [data/keys.db]
+      Migrasi sekali jalan dari layout JSON ({"keys","users","pending"})
+      ke backend SQLite. Bisa pakai keys.json dari GitHub atau
+      data/snapshot.json (setelah bot dimatikan dengan normal).
+
+  python manage.py import-node [database.json]
+      Import key dari bot Node (index.js) ke store lokal (STORAGE_BACKEND
+      di DATA_DIR) dalam 1 batch, termasuk HWID. Matikan bot dulu; key
+      hasil import di-backup ke GitHub saat bot jalan lagi.
+
+  python manage.py export [keys.jsonl.gz]
+  python manage.py import <keys.jsonl[.gz]>
+      Export / import key + pending sebagai JSONL (1 record per baris,
+      gzip kalau berakhiran .gz), memory konstan. Import menulis per
+      EXPORT_BATCH record dan menimpa key yang sama. Matikan bot dulu.
+"""
+import argparse
+import os
+import sys
+import time
+
+from config import *
+from database import (migrate_json_to_sqlite, import_node_json, open_backend,
+                      export_jsonl, import_jsonl)
+
+def cmd_migrate_sqlite(args) -> int:
+    if os.path.exists(args.target):
+        print(f"❌ {args.target} sudah ada, hapus dulu kalau mau migrasi ulang")
+        return 1
+    
+    result = migrate_json_to_sqlite(args.source, args.target)
+    print(f"✅ {result['keys']} keys, {result['pending']} pending → {args.target}")
+    print('Set STORAGE_BACKEND = "sqlite" di config.py untuk memakainya')
+    return 0
+
+def cmd_import_node(args) -> int:
+    backend = open_backend(STORAGE_BACKEND, args.data_dir)
+    if backend.exists():
+        backend.open()
+    try:
+        result = import_node_json(args.source, backend)
+    finally:
+        # synced=False: bot meng-upload ulang store ini ke GitHub saat start
+        backend.close(synced=False)
+    
+    print(f"✅ {result['keys']} keys ({result['active']} active, {result['hwid']} dengan HWID) "
+          f"→ {args.data_dir}")
+    if result["skipped"]:
+        print(f"⚠️ {result['skipped']} entry dilewati (tidak lengkap / key sudah ada)")
+    return 0
+
+def cmd_export(args) -> int:
+    backend = open_backend(STORAGE_BACKEND, args.data_dir)
+    if not backend.exists():
+        print(f"❌ Tidak ada store lokal di {args.data_dir}")
+        return 1
+    backend.open()
+    try:
+        counts = export_jsonl(backend, args.target)
+    finally:
+        # Export tidak mengubah store, status backup tetap seperti sebelumnya
+        backend.close(synced=not backend.unsynced_shards())
+    print(f"✅ {counts['key']} keys, {counts['pending']} pending → {args.target}")
+    return 0
+
+def cmd_import(args) -> int:
+    backend = open_backend(STORAGE_BACKEND, args.data_dir)
+    if backend.exists():
+        backend.open()
+    try:
+        counts = import_jsonl(backend, args.source)
+    except ValueError as e:
+        print(f"❌ Import berhenti: {e} (batch sebelumnya sudah tersimpan)")
+        return 1
+    finally:
+        # synced=False: bot meng-upload ulang store ini ke GitHub saat start
+        backend.close(synced=False)
+    print(f"✅ {counts['key']} keys, {counts['pending']} pending → {args.data_dir}")
+    if counts["skipped"]:
+        print(f"⚠️ {counts['skipped']} record tidak lengkap dilewati")
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintenance database key bot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    migrate = sub.add_parser("migrate-sqlite", help="Migrasi keys.json ke SQLite")
+    migrate.add_argument("source", nargs="?", default="keys.json")
+    migrate.add_argument("target", nargs="?", default=os.path.join(DATA_DIR, "keys.db"))
+    migrate.set_defaults(func=cmd_migrate_sqlite)
+    
+    node = sub.add_parser("import-node", help="Import database.json bot Node (key + HWID)")
+    node.add_argument("source", nargs="?", default="database.json")
+    node.add_argument("--data-dir", default=DATA_DIR)
+    node.set_defaults(func=cmd_import_node)
+    
+    export = sub.add_parser("export", help="Export store ke JSONL (.gz = gzip)")
+    export.add_argument("target", nargs="?", default=f"keys-{int(time.time())}.jsonl.gz")
+    export.add_argument("--data-dir", default=DATA_DIR)
+    export.set_defaults(func=cmd_export)
+    
+    load = sub.add_parser("import", help="Import JSONL (.gz = gzip) ke store lokal")
+    load.add_argument("source")
+    load.add_argument("--data-dir", default=DATA_DIR)
+    load.set_defaults(func=cmd_import)
+    
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+from bisect import bisect_left
+
+# Batas bucket histogram (detik / byte)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_METRICS = []
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _number(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+class Counter:
+    """
+    Counter per kombinasi label (urutan label sama dengan `labels`)
+
+    Tanpa lock: dipanggil dari event loop atau 1 thread GitHub, dan
+    render() cuma membaca salinan dict.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        _METRICS.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        values = self.values
+        values[labels] = values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in list(self.values.items()):
+            yield self.name + _labels(self.labels, labels), value
+
+class Gauge(Counter):
+    """Nilai sesaat, diisi saat /metrics dibaca"""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        self.values[labels] = value
+
+class Histogram:
+    """
+    Histogram Prometheus dengan bucket tetap
+
+    observe() cuma bisect + 2 penjumlahan; bucket disimpan tidak kumulatif
+    dan baru dijumlahkan saat render.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}  # label -> [jumlah per bucket..., jumlah +Inf, total nilai]
+        _METRICS.append(self)
+
+    def observe(self, value: float, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        for labels, series in list(self.series.items()):
+            series = list(series)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(bound)
+                yield self.name + "_bucket" + _labels(self.labels, labels, f'le="{le}"'), cumulative
+            yield self.name + "_sum" + _labels(self.labels, labels), series[-1]
+            yield self.name + "_count" + _labels(self.labels, labels), cumulative
+
+def render() -> str:
+    """Semua metric dalam format teks Prometheus (0.0.4)"""
+    lines = []
+    for metric in _METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, value in metric.samples():
+            lines.append(f"{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+# ═══════════════════════════════════════
+# METRIC BOT
+# ═══════════════════════════════════════
+COMMAND_SECONDS = Histogram("keybot_command_seconds", "Latency command Discord", ("command",))
+COMMAND_ERRORS = Counter("keybot_command_errors_total", "Command yang gagal / ditolak",
+                         ("command", "error"))
+
+GITHUB_REQUESTS = Counter("keybot_github_requests_total", "Request ke GitHub API",
+                          ("method", "endpoint", "status"))
+GITHUB_SECONDS = Histogram("keybot_github_request_seconds",
+                           "Latency request GitHub sampai header diterima", ("endpoint",))
+GITHUB_PAYLOAD_BYTES = Histogram("keybot_github_payload_bytes", "Ukuran body request/response GitHub",
+                                 ("direction",), SIZE_BUCKETS)
+GITHUB_SYNC_SECONDS = Histogram("keybot_github_sync_seconds", "Durasi load / save ke GitHub",
+                                ("op",))
+GITHUB_SYNC = Counter("keybot_github_sync_total", "Hasil load / save ke GitHub", ("op", "result"))
+
+WORKINK_REQUESTS = Counter("keybot_workink_requests_total", "Request ke API Work.ink",
+                           ("endpoint", "status"))
+WORKINK_SECONDS = Histogram("keybot_workink_request_seconds", "Latency request Work.ink",
+                            ("endpoint",))
+
+DM_MESSAGES = Counter("keybot_dm_total", "DM lewat dispatcher (sent/failed/coalesced/rate_limited)",
+                      ("result",))
+
+LOOP_LAG = Histogram("keybot_loop_lag_seconds", "Keterlambatan event loop (watchdog)")
+LOOP_STALLS = Counter("keybot_loop_stalls_total", "Event loop macet di atas LAG_THRESHOLD")
+
+STORE_KEYS = Gauge("keybot_store_keys", "Jumlah key di store lokal", ("state",))
+PENDING_USERS = Gauge("keybot_pending_users", "User yang belum menyelesaikan verifikasi")
+DIRTY_SHARDS = Gauge("keybot_dirty_shards", "Shard yang belum ter-backup ke GitHub")
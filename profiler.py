@@ -0,0 +1,208 @@
+import asyncio
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import traceback
+from config import *
+import metrics
+
+class LoopWatchdog:
+    """
+    Ukur lag event loop dan catat stack penyebabnya
+
+    Task di loop tidur LAG_INTERVAL detik lalu mencatat seberapa telat ia
+    bangun (lag). Thread terpisah mengawasi detak task itu: kalau loop
+    macet lebih dari LAG_THRESHOLD, stack thread loop saat itu juga
+    (fungsi yang sedang memblokir) di-print, 1x per kemacetan.
+    """
+
+    def __init__(self, interval: float = LAG_INTERVAL, threshold: float = LAG_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.last_stall = None  # Stack kemacetan terakhir (teks)
+        self._beat = time.monotonic()
+        self._reported = None   # Detak yang kemacetannya sudah di-print
+        self._loop_thread = None
+        self._task = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Jalankan task + thread pengawas (panggil dari dalam event loop)"""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._measure())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _measure(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._beat = now = time.monotonic()
+            lag = max(now - start - self.interval, 0.0)
+            metrics.LOOP_LAG.observe(lag)
+            if lag >= self.threshold:
+                print(f"⚠️ Event loop lag {lag:.3f}s")
+
+    def _watch(self):
+        # Cek 4x per threshold: stack diambil selagi loop masih macet
+        while not self._stop.wait(self.threshold / 4):
+            beat = self._beat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled < self.threshold or self._reported == beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self._reported = beat
+            self.last_stall = "".join(traceback.format_stack(frame))
+            metrics.LOOP_STALLS.inc()
+            print(f"⚠️ Event loop macet >{stalled:.2f}s, stack:\n{self.last_stall}", end="")
+
+class CommandProfiler:
+    """
+    Profil N command berikutnya, dinyalakan admin lewat !profile
+
+    mode "cpu" : cProfile aktif dari command pertama sampai ke-N selesai.
+                 Ikut mencatat task lain yang jalan di loop selama itu.
+    mode "wall": thread sampler mengambil stack loop tiap
+                 PROFILE_SAMPLE_INTERVAL; waktu I/O yang memblokir ikut
+                 terhitung, waktu loop menganggur dicatat sebagai <idle>.
+
+    before()/after() dipanggil dari hook before_invoke/after_invoke.
+    """
+
+    MODES = ("cpu", "wall")
+
+    def __init__(self):
+        self.owner = None      # ctx !profile: penerima laporan
+        self.mode = None
+        self.remaining = 0
+        self._profile = None
+        self._sampler = None
+        self._samples = None
+        self._started_at = None
+        self._durations = {}   # command -> [detik, ...]
+        self._stop = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.remaining > 0
+
+    def start(self, owner, count: int, mode: str):
+        """Profil `count` command berikutnya (menggantikan profil yang sedang jalan)"""
+        self.cancel()
+        self.owner = owner
+        self.mode = mode
+        self.remaining = count
+        self._durations = {}
+
+    def cancel(self):
+        self.remaining = 0
+        self._finish()
+        self._profile = self._samples = None
+
+    def before(self, ctx):
+        if not self.active or ctx.command.name == "profile":
+            return
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+            if self.mode == "cpu":
+                self._profile = cProfile.Profile()
+                self._profile.enable()
+            else:
+                self._samples = {}
+                self._stop.clear()
+                self._sampler = threading.Thread(
+                    target=self._sample, args=(threading.get_ident(),),
+                    name="command-profiler", daemon=True)
+                self._sampler.start()
+        ctx.profiled = True
+
+    def after(self, ctx):
+        """Return (owner, nama file, isi laporan) setelah command ke-N selesai"""
+        if not getattr(ctx, "profiled", False) or not self.active:
+            return None
+        self._durations.setdefault(ctx.command.name, []).append(
+            time.perf_counter() - ctx.started_at)
+        self.remaining -= 1
+        if self.remaining:
+            return None
+
+        elapsed = time.perf_counter() - self._started_at
+        self._finish()
+        report = self._report(elapsed)
+        return self.owner, f"profile-{self.mode}-{int(time.time())}.txt", report.encode()
+
+    def _finish(self):
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        self._started_at = None
+
+    # ═══════════════════════════════════════
+    # SAMPLER (mode wall)
+    # ═══════════════════════════════════════
+    def _sample(self, loop_thread: int):
+        samples = self._samples
+        while not self._stop.wait(PROFILE_SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(loop_thread)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack and "selectors.py" in stack[0]:
+                stack = ["<idle>"]
+            # Disimpan per stack unik, dijumlahkan per fungsi saat laporan
+            key = tuple(stack)
+            samples[key] = samples.get(key, 0) + 1
+
+    # ═══════════════════════════════════════
+    # LAPORAN
+    # ═══════════════════════════════════════
+    def _report(self, elapsed: float) -> str:
+        count = sum(len(d) for d in self._durations.values())
+        out = io.StringIO()
+        out.write(f"Profil {count} command (mode {self.mode}) selama {elapsed:.3f}s\n\n")
+        out.write(f"{'command':<12}{'jumlah':>8}{'rata2 ms':>12}{'max ms':>12}\n")
+        for name, durations in sorted(self._durations.items()):
+            out.write(f"{name:<12}{len(durations):>8}"
+                      f"{sum(durations) / len(durations) * 1e3:>12.2f}{max(durations) * 1e3:>12.2f}\n")
+        out.write("\n")
+
+        if self.mode == "cpu":
+            stats = pstats.Stats(self._profile, stream=out)
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+            stats.sort_stats("tottime").print_stats(PROFILE_TOP)
+            self._profile = None
+            return out.getvalue()
+
+        samples, self._samples = self._samples, None
+        total = sum(samples.values()) or 1
+        own, inclusive = {}, {}
+        for stack, hits in samples.items():
+            own[stack[0]] = own.get(stack[0], 0) + hits
+            for function in set(stack):
+                inclusive[function] = inclusive.get(function, 0) + hits
+        out.write(f"{total} sampel @ {PROFILE_SAMPLE_INTERVAL * 1e3:g} ms\n")
+        for title, table in (("Self (fungsi paling atas di stack)", own),
+                             ("Inclusive (fungsi ada di stack)", inclusive)):
+            out.write(f"\n{title}\n")
+            for function, hits in sorted(table.items(), key=lambda item: -item[1])[:PROFILE_TOP]:
+                out.write(f"{hits / total * 100:6.1f}%  {hits:>7}  {function}\n")
+        return out.getvalue()
@@ -0,0 +1,49 @@
+import time
+from collections import OrderedDict
+
+class RateLimiter:
+    """
+    Token bucket per key (user, atau 1 key global)
+
+    Tiap key punya `burst` token yang terisi `rate` token/detik. Bucket yang
+    sudah penuh lagi sama saja dengan bucket baru, jadi langsung dibuang:
+    memory hanya untuk key yang aktif dalam `burst / rate` detik terakhir.
+    """
+
+    def __init__(self, rate: float, burst: float, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.idle_after = burst / rate
+        self._buckets = OrderedDict()  # key -> [token, waktu update], urut update terlama
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key=None, cost: float = 1) -> float:
+        """Ambil `cost` token; return 0 kalau boleh, atau detik yang harus ditunggu"""
+        now = self.clock()
+        self._evict(now)
+        cost = min(cost, self.burst)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+        if tokens < cost:
+            # Token tidak dipotong, cukup kabari kapan cukup
+            return (cost - tokens) / self.rate
+        self._buckets[key] = [tokens - cost, now]
+        self._buckets.move_to_end(key)
+        return 0.0
+
+    def _evict(self, now: float):
+        # Yang paling lama tidak di-update ada di depan
+        buckets = self._buckets
+        while buckets:
+            key, (tokens, updated) = next(iter(buckets.items()))
+            if now - updated < self.idle_after:
+                break
+            del buckets[key]
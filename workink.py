@@ -1,14 +1,159 @@
-import requests
+import aiohttp
+import asyncio
 import hashlib
+import random
 import time
 from config import *
+import metrics
+
+class WorkinkError(Exception):
+    """Request ke Work.ink gagal (timeout, error HTTP, atau circuit breaker terbuka)"""
+    
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+class CircuitBreaker:
+    """
+    Circuit breaker sederhana
+    
+    closed    : request jalan normal, kegagalan beruntun dihitung
+    open      : setelah `threshold` gagal beruntun, semua request langsung ditolak
+    half-open : setelah `reset_after` detik, 1 request percobaan boleh lewat;
+                sukses -> closed, gagal -> open lagi
+    """
+    
+    def __init__(self, threshold: int, reset_after: float):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+    
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+    
+    def end_probe(self):
+        """Request percobaan selesai tanpa success/failure (dibatalkan): probe berikutnya boleh lewat"""
+        self._probing = False
+    
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+    
+    def failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self._probing = False
 
 class WorkinkAPI:
-    def __init__(self):
+    def __init__(self, base_url: str = "https://work.ink/api/v1"):
         self.api_key = WORKINK_API_KEY
         self.publisher_id = WORKINK_PUBLISHER_ID
-        self.base_url = "https://work.ink/api/v1"
+        self.base_url = base_url
+        self.breaker = CircuitBreaker(WORKINK_BREAKER_FAILURES, WORKINK_BREAKER_RESET)
+        self._session = None
+        # Cache statistik: data terakhir, kapan berhasil diambil, kapan terakhir dicoba
+        self._stats = None
+        self._stats_at = None
+        self._stats_checked = float("-inf")
+        self._stats_task = None
+    
+    # ═══════════════════════════════════════
+    # HTTP (1 session keep-alive untuk semua request)
+    # ═══════════════════════════════════════
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Dibuat di dalam event loop saat pertama dipakai
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=aiohttp.ClientTimeout(total=WORKINK_TIMEOUT),
+                connector=aiohttp.TCPConnector(limit=WORKINK_MAX_CONNECTIONS, keepalive_timeout=60)
+            )
+        return self._session
+    
+    async def close(self):
+        """Tutup session (panggil saat shutdown)"""
+        if self._stats_task is not None:
+            self._stats_task.cancel()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    async def _get(self, path: str, params: dict = None) -> dict:
+        return await self._request("GET", path, params=params)
+    
+    async def _post(self, path: str, payload: dict) -> dict:
+        return await self._request("POST", path, json=payload)
+    
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        """
+        Request ke API Work.ink dengan retry + jitter
         
+        Raise WorkinkError kalau semua percobaan gagal atau breaker terbuka,
+        supaya caller bisa langsung pakai fallback.
+        """
+        # Label metric: bagian terakhir path (stats, completions, batch)
+        endpoint = path.rsplit("/", 1)[-1]
+        probe = self.breaker.state == "half-open"
+        if not self.breaker.allow():
+            metrics.WORKINK_REQUESTS.inc(endpoint, "breaker_open")
+            raise WorkinkError("circuit breaker terbuka")
+        
+        try:
+            return await self._attempts(method, path, endpoint, **kwargs)
+        finally:
+            if probe:
+                # Probe yang dibatalkan (CancelledError) tidak sampai ke success/failure
+                self.breaker.end_probe()
+    
+    async def _attempts(self, method: str, path: str, endpoint: str, **kwargs) -> dict:
+        """Percobaan + retry untuk _request (breaker sudah mengizinkan)"""
+        session = self._get_session()
+        error = None
+        for attempt in range(WORKINK_RETRIES + 1):
+            if attempt:
+                # Backoff eksponensial dengan full jitter
+                await asyncio.sleep(random.uniform(0, WORKINK_BACKOFF * 2 ** attempt))
+            start = time.perf_counter()
+            try:
+                async with session.request(method, f"{self.base_url}{path}", **kwargs) as response:
+                    metrics.WORKINK_SECONDS.observe(time.perf_counter() - start, endpoint)
+                    metrics.WORKINK_REQUESTS.inc(endpoint, str(response.status))
+                    if response.status < 500:
+                        # 4xx bukan masalah server, tidak perlu di-retry
+                        self.breaker.success()
+                        if response.status != 200:
+                            raise WorkinkError(f"HTTP {response.status}", response.status)
+                        return await response.json()
+                    error = WorkinkError(f"HTTP {response.status}", response.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metrics.WORKINK_SECONDS.observe(time.perf_counter() - start, endpoint)
+                metrics.WORKINK_REQUESTS.inc(endpoint, type(e).__name__)
+                error = WorkinkError(str(e) or type(e).__name__)
+        
+        self.breaker.failure()
+        raise error
+    
+    # ═══════════════════════════════════════
+    # API
+    # ═══════════════════════════════════════
     def generate_user_link(self, user_id: int) -> dict:
         """
         Generate link unik untuk setiap user
@@ -27,7 +172,7 @@ class WorkinkAPI:
             "expires_at": time.time() + 600  # 10 menit
         }
     
-    def verify_completion(self, user_id: int, token: str) -> bool:
+    async def verify_completion(self, user_id: int, token: str) -> bool:
         """
         Verifikasi apakah user sudah menyelesaikan iklan
         
@@ -38,22 +183,9 @@ class WorkinkAPI:
         
         # ═══ METHOD 1: API CHECK ═══
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.get(
-                f"{self.base_url}/links/{WORKINK_LINK_ID}/completions",
-                headers=headers,
-                params={"token": token}
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("completed", False)
-                
-        except Exception as e:
+            data = await self._get(f"/links/{WORKINK_LINK_ID}/completions", {"token": token})
+            return data.get("completed", False)
+        except WorkinkError as e:
             print(f"API Error: {e}")
         
         # ═══ METHOD 2: FALLBACK - Time-based ═══
@@ -61,23 +193,122 @@ class WorkinkAPI:
         # User minimal harus menunggu 30 detik setelah klik link
         return True  # Atau implementasi custom
     
-    def get_stats(self) -> dict:
+    async def verify_completion_batch(self, tokens: list) -> dict:
+        """
+        Cek banyak token dalam 1 request, return {token: completed}
+        
+        Spekulatif: endpoint ini tidak ada di dokumentasi Work.ink, jadi hanya
+        dipakai kalau VERIFY_BATCH_API = True. Raise WorkinkError (status
+        404/405 kalau endpoint batch tidak ada).
         """
-        Ambil statistik link dari Work.ink
+        data = await self._post(f"/links/{WORKINK_LINK_ID}/completions/batch", {"tokens": tokens})
+        completions = data.get("completions", {})
+        return {token: bool(completions.get(token, False)) for token in tokens}
+    
+    async def get_stats(self) -> dict:
         """
+        Ambil statistik link dari Work.ink (cache, stale-while-revalidate)
+        
+        Data yang sudah lewat WORKINK_STATS_TTL tetap langsung dikembalikan
+        sambil di-refresh di background, jadi API dipanggil maksimal 1x per
+        TTL. Hanya panggilan pertama yang menunggu API.
+        """
+        if (self._stats_task is None
+                and time.monotonic() - self._stats_checked >= WORKINK_STATS_TTL):
+            self._stats_checked = time.monotonic()
+            self._stats_task = asyncio.create_task(self._refresh_stats())
+        if self._stats is None and self._stats_task is not None:
+            # shield: command yang dibatalkan tidak ikut membatalkan refresh
+            await asyncio.shield(self._stats_task)
+        
+        return self._stats or {"views": 0, "completions": 0}
+    
+    def stats_age(self) -> float:
+        """Umur data statistik (detik), None kalau belum pernah berhasil diambil"""
+        if self._stats_at is None:
+            return None
+        return time.time() - self._stats_at
+    
+    async def _refresh_stats(self):
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            response = requests.get(
-                f"{self.base_url}/links/{WORKINK_LINK_ID}/stats",
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-        except:
-            pass
+            self._stats = await self._get(f"/links/{WORKINK_LINK_ID}/stats")
+            self._stats_at = time.time()
+        except WorkinkError as e:
+            # Data lama tetap dipakai, dicoba lagi setelah TTL berikutnya
+            print(f"Stats error: {e}")
+        finally:
+            self._stats_task = None
+
+class VerifyScheduler:
+    """
+    Kumpulkan !verify yang masuk bersamaan lalu cek sekaligus
+    
+    Token ditampung selama VERIFY_BATCH_WINDOW detik (atau sampai
+    VERIFY_BATCH_MAX), lalu dicek dengan 1 request batch kalau
+    VERIFY_BATCH_API aktif. Default (atau kalau API tidak punya endpoint
+    batch), token dicek satu-satu secara paralel dengan maksimal
+    VERIFY_CONCURRENCY request sekaligus. Hasilnya dibagikan ke setiap
+    command yang menunggu.
+    """
+    
+    def __init__(self, api: WorkinkAPI):
+        self.api = api
+        # Endpoint batch belum tentu ada: default mati, dimatikan juga saat 404/405
+        self.batch_supported = VERIFY_BATCH_API
+        self._waiting = {}  # token -> (user_id, future); token sama cukup dicek sekali
+        self._flush_handle = None
+        self._semaphore = None
+    
+    async def verify(self, user_id: int, token: str) -> bool:
+        """Sama seperti WorkinkAPI.verify_completion, tapi digabung dengan request lain"""
+        if token in self._waiting:
+            future = self._waiting[token][1]
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiting[token] = (user_id, future)
+            if len(self._waiting) >= VERIFY_BATCH_MAX:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(
+                    VERIFY_BATCH_WINDOW, self._flush)
+        # shield: command yang dibatalkan tidak membatalkan hasil untuk yang lain
+        return await asyncio.shield(future)
+    
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._waiting = self._waiting, {}
+        if batch:
+            asyncio.create_task(self._run(batch))
+    
+    async def _run(self, batch: dict):
+        try:
+            results = await self._check(batch)
+        except Exception as e:
+            print(f"Verify batch error: {e}")
+            results = {}
+        for token, (_, future) in batch.items():
+            if not future.done():
+                # Token tanpa hasil ikut fallback verify_completion (approve)
+                future.set_result(results.get(token, True))
+    
+    async def _check(self, batch: dict) -> dict:
+        if self.batch_supported:
+            try:
+                return await self.api.verify_completion_batch(list(batch))
+            except WorkinkError as e:
+                if e.status in (404, 405) and self.batch_supported:
+                    print("Work.ink tidak support batch, cek per token")
+                    self.batch_supported = False
+        
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(VERIFY_CONCURRENCY)
+        
+        async def check_one(token: str, user_id: int) -> bool:
+            async with self._semaphore:
+                return await self.api.verify_completion(user_id, token)
         
-        return {"views": 0, "completions": 0}
+        values = await asyncio.gather(*(check_one(token, user_id)
+                                        for token, (user_id, _) in batch.items()))
+        return dict(zip(batch, values))